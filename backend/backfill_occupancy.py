@@ -0,0 +1,63 @@
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+from datetime import datetime, timezone
+
+from occupancy import compute_month_occupancy, to_date
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+async def backfill_occupancy():
+    mongo_url = os.environ['MONGO_URL']
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ['DB_NAME']]
+    
+    # Ended rentals from before tanggal_selesai was recorded: assume the tenant
+    # stayed through the last billed month, or fall back to tanggal_mulai.
+    filled = 0
+    async for rental in db.rentals.find({"status": "selesai", "tanggal_selesai": None}, {"_id": 0}):
+        last_bill = await db.bills.find_one(
+            {"rental_id": rental['id']}, {"_id": 0, "bulan": 1, "tahun": 1},
+            sort=[("tahun", -1), ("bulan", -1)]
+        )
+        if last_bill:
+            tahun, bulan = last_bill['tahun'], last_bill['bulan'] + 1
+            if bulan > 12:
+                tahun, bulan = tahun + 1, 1
+            tanggal_selesai = datetime(tahun, bulan, 1, tzinfo=timezone.utc).isoformat()
+        else:
+            tanggal_selesai = rental['tanggal_mulai']
+        await db.rentals.update_one({"id": rental['id']}, {"$set": {"tanggal_selesai": tanggal_selesai}})
+        filled += 1
+    print(f"✓ Filled tanggal_selesai for {filled} ended rentals")
+    
+    await db.occupancy_monthly.delete_many({})
+    today = datetime.now(timezone.utc).date()
+    async for prop in db.properties.find({}, {"_id": 0, "id": 1}):
+        scope = {"property_id": prop['id']}
+        rentals = await db.rentals.find(scope, {"_id": 0, "room_id": 1, "tanggal_mulai": 1, "tanggal_selesai": 1}).to_list(None)
+        rooms = await db.rooms.find(scope, {"_id": 0, "id": 1, "nomor_kamar": 1, "created_at": 1}).to_list(None)
+        if not rentals:
+            continue
+        first = min(to_date(r['tanggal_mulai']) for r in rentals)
+        tahun, bulan = first.year, first.month
+        count = 0
+        # Precompute every closed month; the open month is always computed live
+        while (tahun, bulan) < (today.year, today.month):
+            result = compute_month_occupancy(rentals, rooms, tahun, bulan, today)
+            await db.occupancy_monthly.replace_one(
+                {**scope, "tahun": tahun, "bulan": bulan}, {**scope, **result}, upsert=True
+            )
+            count += 1
+            bulan += 1
+            if bulan > 12:
+                tahun, bulan = tahun + 1, 1
+        print(f"✓ Precomputed occupancy for {count} closed months of property '{prop['id']}'")
+    
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(backfill_occupancy())
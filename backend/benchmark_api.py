@@ -0,0 +1,309 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+from passlib.context import CryptContext
+
+ROOT_DIR = Path(__file__).parent
+RESULTS_DIR = ROOT_DIR / "benchmark_results"
+
+ADMIN_EMAIL = "bench@siskosan.com"
+ADMIN_PASSWORD = "bench12345"
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Relative weights of each scenario in the default mix
+DEFAULT_MIX = {
+    "login": 2,
+    "dashboard": 15,
+    "rooms": 15,
+    "tenants": 10,
+    "rentals": 8,
+    "bills": 15,
+    "transactions": 10,
+    "transaction_summary": 5,
+    "mark_paid": 8,
+    "kwitansi": 5,
+    "generate_monthly": 1,
+}
+
+class BenchState:
+    def __init__(self, token):
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.unpaid = []
+        self.paid = []
+
+def admin_document():
+    return {
+        "id": str(uuid.uuid4()),
+        "email": ADMIN_EMAIL,
+        "password": pwd_context.hash(ADMIN_PASSWORD),
+        "role": "super_admin",
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+
+async def seed_database(mongo_url, db_name):
+    client = AsyncIOMotorClient(mongo_url)
+    await client.drop_database(db_name)
+    await client[db_name].users.insert_one(admin_document())
+    client.close()
+
+async def seed_through_api(client, state, rooms, months):
+    """Create rooms, tenants and rentals through the API, plus unpaid bills for past months."""
+    last_year = datetime.now(timezone.utc).year - 1
+    rental_ids = []
+    for i in range(rooms):
+        room = (await client.post("/api/rooms", headers=state.headers, json={
+            "nomor_kamar": f"B{i + 1:04d}", "harga": 1000000 + i * 1000, "fasilitas": "AC, WiFi"
+        })).json()
+        rental = (await client.post("/api/rentals", headers=state.headers, json={
+            "room_id": room['id'],
+            "harga": room['harga'],
+            "tenant": {
+                "nama": f"Penghuni Bench {i}", "telepon": f"0812{i:08d}",
+                "ktp": f"3201{i:012d}", "alamat": "Jl. Benchmark"
+            }
+        })).json()
+        rental_ids.append(rental['id'])
+
+    for rental_id in rental_ids:
+        for bulan in range(1, months + 1):
+            bill = (await client.post("/api/bills", headers=state.headers, json={
+                "rental_id": rental_id, "bulan": bulan, "tahun": last_year, "jumlah": 1000000
+            })).json()
+            state.unpaid.append(bill['id'])
+    random.shuffle(state.unpaid)
+
+    # A few paid bills up front so kwitansi has something to render from the start
+    for _ in range(min(20, len(state.unpaid))):
+        bill_id = state.unpaid.pop()
+        await client.post(f"/api/bills/{bill_id}/mark-paid", headers=state.headers, params={"cara_bayar": "tunai"})
+        state.paid.append(bill_id)
+
+async def run_scenario(name, client, state):
+    """Issue one request for the scenario; returns the response, or None if it cannot run right now."""
+    h = state.headers
+    if name == "login":
+        return await client.post("/api/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+    if name in ("dashboard", "rooms", "tenants", "rentals", "bills", "transactions"):
+        return await client.get(f"/api/{name}", headers=h)
+    if name == "transaction_summary":
+        return await client.get("/api/transactions/summary", headers=h)
+    if name == "mark_paid":
+        if not state.unpaid:
+            return None
+        bill_id = state.unpaid.pop()
+        response = await client.post(f"/api/bills/{bill_id}/mark-paid", headers=h, params={"cara_bayar": "tunai"})
+        state.paid.append(bill_id)
+        return response
+    if name == "kwitansi":
+        if not state.paid:
+            return None
+        return await client.get(f"/api/bills/{random.choice(state.paid)}/kwitansi", headers=h)
+    if name == "generate_monthly":
+        return await client.post("/api/bills/generate-monthly", headers=h)
+    raise ValueError(f"Unknown scenario {name}")
+
+async def worker(client, state, mix, deadline, samples, record):
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    while time.perf_counter() < deadline:
+        name = random.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            response = await run_scenario(name, client, state)
+            if response is None:
+                continue
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        if record:
+            samples.setdefault(name, []).append((time.perf_counter() - started, ok))
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(samples, elapsed):
+    results = {}
+    for name, entries in sorted(samples.items()):
+        latencies = sorted(latency for latency, _ in entries)
+        results[name] = {
+            "count": len(entries),
+            "errors": sum(1 for _, ok in entries if not ok),
+            "rps": round(len(entries) / elapsed, 2),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        }
+    total = sum(len(entries) for entries in samples.values())
+    results["_total"] = {"count": total, "rps": round(total / elapsed, 2)}
+    return results
+
+def print_results(results, baseline=None):
+    header = f"{'endpoint':22s} {'count':>7s} {'err':>5s} {'req/s':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}"
+    if baseline:
+        header += f" {'p95 vs base':>12s}"
+    print(header)
+    for name, stats in results.items():
+        if name == "_total":
+            continue
+        line = (f"{name:22s} {stats['count']:7d} {stats['errors']:5d} {stats['rps']:8.2f} "
+                f"{stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f}")
+        base = (baseline or {}).get(name)
+        if base:
+            line += f" {(stats['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100:+11.1f}%"
+        print(line)
+    print(f"{'total':22s} {results['_total']['count']:7d} {'':5s} {results['_total']['rps']:8.2f}")
+
+def start_server(args):
+    env = dict(os.environ)
+    env.update({
+        "MONGO_URL": args.mongo_url,
+        "DB_NAME": args.db_name,
+        "SCHEDULER_ENABLED": "false",
+        "SLOW_LOG_ENABLED": "false",
+        # One benchmark client would exhaust the per-client buckets; concurrency caps stay on
+        "RATE_LIMIT_ENABLED": "false",
+    })
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(args.port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=str(ROOT_DIR), env=env
+    )
+
+async def wait_until_ready(client, timeout=30):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if (await client.get("/readyz")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("Server did not become ready")
+
+async def drive(client, args, mix):
+    """Seed through the API, warm up, then run the mix; returns (samples, elapsed seconds)."""
+    login = await client.post("/api/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+    state = BenchState(login.json()['access_token'])
+    print(f"Seeding {args.rooms} rooms with {args.months} months of bills...")
+    await seed_through_api(client, state, args.rooms, args.months)
+
+    samples = {}
+    if args.warmup:
+        print(f"Warming up for {args.warmup}s...")
+        deadline = time.perf_counter() + args.warmup
+        await asyncio.gather(*(worker(client, state, mix, deadline, samples, False)
+                               for _ in range(args.concurrency)))
+
+    print(f"Running {args.concurrency} clients for {args.duration}s...")
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(worker(client, state, mix, deadline, samples, True)
+                           for _ in range(args.concurrency)))
+    return samples, time.perf_counter() - started
+
+async def run_against_server(args, mix):
+    await seed_database(args.mongo_url, args.db_name)
+    server = start_server(args)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60) as client:
+            await wait_until_ready(client)
+            return await drive(client, args, mix)
+    finally:
+        server.terminate()
+        server.wait()
+        if not args.keep_db:
+            mongo = AsyncIOMotorClient(args.mongo_url)
+            await mongo.drop_database(args.db_name)
+            mongo.close()
+
+async def run_in_process(args, mix):
+    """Call the app through httpx's ASGI transport on in-memory repositories: handler CPU cost only."""
+    os.environ["STORAGE_BACKEND"] = "memory"
+    os.environ["SLOW_LOG_ENABLED"] = "false"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ.setdefault("MONGO_URL", args.mongo_url)
+    os.environ.setdefault("DB_NAME", args.db_name)
+    import server
+
+    await server.ensure_indexes()
+    await server.repos.users.insert_one(admin_document())
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app),
+                                     base_url="http://bench", timeout=60) as client:
+            return await drive(client, args, mix)
+    finally:
+        if server.kwitansi_executor:
+            server.kwitansi_executor.shutdown()
+
+async def run_benchmark(args):
+    mix = dict(DEFAULT_MIX)
+    if args.mix:
+        mix = {name: float(weight) for name, weight in (item.split("=") for item in args.mix.split(","))}
+
+    if args.in_process:
+        samples, elapsed = await run_in_process(args, mix)
+    else:
+        samples, elapsed = await run_against_server(args, mix)
+
+    results = summarize(samples, elapsed)
+    baseline = None
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())['results']
+    print_results(results, baseline)
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output = RESULTS_DIR / f"api_{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}.json"
+    output.write_text(json.dumps({
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "mode": "in-process" if args.in_process else "server",
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "workers": args.workers,
+            "rooms": args.rooms,
+            "months": args.months,
+            "mix": mix,
+        },
+        "results": results
+    }, indent=2))
+    print(f"\n✓ Results written to {output}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the SISKOSAN API against a local mongod")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default="siskosan_bench")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent async clients")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--months", type=int, default=12, help="unpaid past-month bills seeded per rental")
+    parser.add_argument("--mix", help="override weights, e.g. dashboard=5,bills=5,mark_paid=1")
+    parser.add_argument("--compare", help="previous results JSON to compare p95 latency against")
+    parser.add_argument("--keep-db", action="store_true", help="keep the benchmark database afterwards")
+    parser.add_argument("--in-process", action="store_true",
+                        help="run the app in this process on in-memory storage (no mongod, no uvicorn)")
+    asyncio.run(run_benchmark(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
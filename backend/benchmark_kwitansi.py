@@ -0,0 +1,57 @@
+import argparse
+import os
+import tempfile
+import time
+
+from kwitansi import render_kwitansi, render_kwitansi_document
+
+def sample_entries(count):
+    entries = []
+    for i in range(count):
+        bill = {
+            "id": f"{i:08x}-bench",
+            "bulan": i % 12 + 1,
+            "tahun": 2025,
+            "jumlah": 1500000 + i,
+            "cara_bayar": "tunai" if i % 2 else "non_tunai",
+            "tanggal_bayar": "2025-06-02T08:00:00+00:00",
+            "keterangan": "Listrik" if i % 5 == 0 else None,
+        }
+        room = {"nomor_kamar": f"A{i % 40 + 1}"}
+        tenant = {"nama": f"Penghuni {i}", "alamat": "Jl. Contoh No. 1", "telepon": "081234567890"}
+        entries.append((bill, room, tenant))
+    return entries
+
+def bench_document(entries, use_template):
+    handle, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(handle)
+    try:
+        start = time.perf_counter()
+        render_kwitansi_document(entries, path, use_template=use_template)
+        elapsed = time.perf_counter() - start
+        return len(entries) / elapsed, os.path.getsize(path)
+    finally:
+        os.unlink(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Kwitansi rendering micro-benchmark")
+    parser.add_argument("--count", type=int, default=500)
+    args = parser.parse_args()
+    entries = sample_entries(args.count)
+    
+    # Warm up reportlab's font and module caches so the first measurement is not penalised
+    for entry in entries[:20]:
+        render_kwitansi(*entry)
+    
+    for label, use_template in (("single, inline static", False), ("single, recorded", True)):
+        start = time.perf_counter()
+        single_bytes = sum(len(render_kwitansi(*entry, use_template=use_template)) for entry in entries)
+        single_rate = len(entries) / (time.perf_counter() - start)
+        print(f"{label:21s}: {single_rate:8.1f} receipts/s, {single_bytes / len(entries):8.0f} bytes/receipt")
+    
+    for label, use_template in (("batch, inline static", False), ("batch, form template", True)):
+        rate, size = bench_document(entries, use_template)
+        print(f"{label:21s}: {rate:8.1f} receipts/s, {size / len(entries):8.0f} bytes/receipt")
+
+if __name__ == "__main__":
+    main()
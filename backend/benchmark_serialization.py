@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from pydantic import TypeAdapter
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "siskosan_bench")
+os.environ["STORAGE_BACKEND"] = "memory"
+
+from server import Bill, Rental, Tenant  # noqa: E402
+from serialization import documents_response, dumps, msgpack  # noqa: E402
+
+DATE_FIELDS = {
+    Bill: ("created_at", "tanggal_bayar"),
+    Rental: ("created_at", "tanggal_mulai", "tanggal_selesai"),
+    Tenant: ("created_at",),
+}
+
+def sample_documents(model, count):
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    docs = []
+    for i in range(count):
+        stamp = (base + timedelta(hours=i)).isoformat()
+        if model is Bill:
+            docs.append({
+                "id": f"{i:08x}-bill", "rental_id": f"{i % 200:08x}-rental", "bulan": i % 12 + 1, "tahun": 2025,
+                "jumlah": 1500000.0, "tipe": "sewa", "keterangan": None,
+                "status": "lunas" if i % 3 else "belum_bayar", "cara_bayar": "tunai" if i % 3 else None,
+                "bukti_bayar": None, "tanggal_bayar": stamp if i % 3 else None, "created_at": stamp
+            })
+        elif model is Rental:
+            docs.append({
+                "id": f"{i:08x}-rental", "tenant_id": f"{i:08x}-tenant", "room_id": f"{i:08x}-room",
+                "tanggal_mulai": stamp, "tanggal_selesai": None, "harga": 1500000.0, "status": "aktif",
+                "created_at": stamp
+            })
+        else:
+            docs.append({
+                "id": f"{i:08x}-tenant", "nama": f"Penghuni {i}", "telepon": f"0812{i:08d}", "email": None,
+                "ktp": f"3201{i:012d}", "alamat": "Jl. Contoh No. 1", "created_at": stamp
+            })
+    return docs
+
+def validated_path(model, docs):
+    """What list handlers did before: parse dates, validate against response_model, stdlib json."""
+    adapter = TypeAdapter(List[model])
+    def run():
+        rows = [dict(doc) for doc in docs]
+        for row in rows:
+            for field in DATE_FIELDS[model]:
+                if isinstance(row.get(field), str):
+                    row[field] = datetime.fromisoformat(row[field])
+        content = adapter.dump_python(adapter.validate_python(rows), mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    return run
+
+def encode_json(model, docs):
+    def run():
+        return dumps(documents_response(model, docs).content)
+    return run
+
+def encode_msgpack(model, docs):
+    def run():
+        return msgpack.packb(documents_response(model, docs).content, default=str)
+    return run
+
+def measure(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = fn()
+    return (time.perf_counter() - start) / repeat * 1000, body
+
+def main():
+    parser = argparse.ArgumentParser(description="List response serialization micro-benchmark")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    for model in (Bill, Rental, Tenant):
+        docs = sample_documents(model, args.rows)
+        baseline, body = measure(validated_path(model, docs), args.repeat)
+        print(f"{model.__name__} x {args.rows}")
+        print(f"  validate + json      : {baseline:8.2f} ms  {len(body):8d} bytes")
+        paths = [("trusted + orjson", encode_json(model, docs))]
+        if msgpack is not None:
+            paths.append(("trusted + msgpack", encode_msgpack(model, docs)))
+        for label, fn in paths:
+            elapsed, body = measure(fn, args.repeat)
+            print(f"  {label:21s}: {elapsed:8.2f} ms  {len(body):8d} bytes  ({baseline / elapsed:4.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -30,6 +30,7 @@ async def create_admin():
         "email": "admin@siskosan.com",
         "password": hashed_password,
         "role": "admin",
+        "property_ids": [os.environ.get('DEFAULT_PROPERTY_ID', 'default')],
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
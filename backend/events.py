@@ -0,0 +1,115 @@
+"""In-process event bus fanning out change events to SSE subscribers.
+
+Each subscriber owns a bounded queue. A subscriber whose queue is full is
+dropped rather than allowed to stall publishers; its stream receives a final
+``dropped`` marker so the client can reconnect and refetch.
+
+When a ``MongoChangeStreamSource`` is attached, published events are written
+to a Mongo collection and delivered from its change stream instead, so every
+worker process sees the events of every other worker.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DROPPED = {"type": "dropped"}
+
+
+class Subscriber:
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+
+class EventBus:
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self.subscribers: Set[Subscriber] = set()
+        self.source: Optional["MongoChangeStreamSource"] = None
+        self.dropped_count = 0
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(self.queue_size)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def deliver(self, event: dict):
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.drop(subscriber)
+
+    def drop(self, subscriber: Subscriber):
+        self.unsubscribe(subscriber)
+        subscriber.dropped = True
+        self.dropped_count += 1
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(DROPPED)
+
+    async def publish(self, event_type: str, **data):
+        event = {
+            "id": str(uuid.uuid4()),
+            "type": event_type,
+            "data": data,
+            "ts": datetime.now(timezone.utc).isoformat()
+        }
+        if self.source:
+            await self.source.publish(event)
+        else:
+            self.deliver(event)
+
+
+class MongoChangeStreamSource:
+    """Relays events through a Mongo collection; requires a replica set."""
+
+    def __init__(self, collection, bus: EventBus, ttl_seconds: int = 3600):
+        self.collection = collection
+        self.bus = bus
+        self.ttl_seconds = ttl_seconds
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+        self.task = asyncio.create_task(self.run())
+        self.bus.source = self
+
+    async def stop(self):
+        self.bus.source = None
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def publish(self, event: dict):
+        doc = dict(event)
+        doc["expires_at"] = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        await self.collection.insert_one(doc)
+
+    async def run(self):
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        resume_token = None
+        while True:
+            try:
+                async with self.collection.watch(pipeline, resume_after=resume_token) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        doc = change["fullDocument"]
+                        doc.pop("_id", None)
+                        doc.pop("expires_at", None)
+                        self.bus.deliver(doc)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Event change stream failed, retrying")
+                await asyncio.sleep(1)
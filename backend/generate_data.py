@@ -0,0 +1,372 @@
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from shared import DEFAULT_PROPERTY_ID, tenant_search_keys  # noqa: E402  (needs the .env loaded above)
+from repositories import SYNCED_COLLECTIONS, RevisionClock  # noqa: E402
+
+COLLECTIONS = ['rooms', 'tenants', 'rentals', 'bills', 'maintenance', 'transactions', 'categories']
+DERIVED_COLLECTIONS = ['ledger_monthly', 'occupancy_monthly']
+LEDGER_KEY = ("property_id", "tahun", "bulan", "tipe", "kategori")
+# Everything but categories belongs to the property being generated
+SCOPED_COLLECTIONS = ['rooms', 'tenants', 'rentals', 'bills', 'maintenance', 'transactions'] + DERIVED_COLLECTIONS
+
+DEFAULT_CATEGORIES = [
+    ("sewa", "pemasukan"), ("listrik", "pengeluaran"), ("air", "pengeluaran"),
+    ("internet", "pengeluaran"), ("perbaikan", "pengeluaran"), ("gaji", "pengeluaran"),
+    ("kebersihan", "pengeluaran"), ("keamanan", "pengeluaran"), ("lainnya", "both"),
+]
+
+# Monthly operating costs per occupied-or-not room, paid on a fixed day
+MONTHLY_EXPENSES = [
+    ("listrik", 5, 150000), ("air", 5, 40000), ("internet", 10, 25000),
+    ("gaji", 25, 60000), ("kebersihan", 25, 15000), ("keamanan", 25, 20000),
+]
+
+NAMA_DEPAN = ["Andi", "Budi", "Citra", "Dewi", "Eko", "Fajar", "Gita", "Hendra", "Indah", "Joko",
+              "Kartika", "Lestari", "Made", "Nur", "Oki", "Putri", "Rizki", "Sari", "Tono", "Wulan"]
+NAMA_BELAKANG = ["Pratama", "Saputra", "Wijaya", "Hidayat", "Santoso", "Kurniawan", "Lestari",
+                 "Nugroho", "Permata", "Siregar", "Hasibuan", "Setiawan", "Utami", "Rahayu"]
+KERUSAKAN = ["AC tidak dingin", "Keran air bocor", "Lampu mati", "Pintu macet", "Kloset mampet",
+             "Stop kontak rusak", "Jendela retak", "WiFi tidak stabil", "Plafon bocor"]
+FASILITAS = ["AC, WiFi, Kamar mandi dalam", "Kipas, WiFi", "AC, WiFi, Lemari, Kasur", "WiFi, Kamar mandi luar"]
+
+
+def add_months(tahun: int, bulan: int, n: int) -> tuple:
+    index = tahun * 12 + bulan - 1 + n
+    return index // 12, index % 12 + 1
+
+
+def month_start(tahun: int, bulan: int) -> datetime:
+    return datetime(tahun, bulan, 1, 8, tzinfo=timezone.utc)
+
+
+class Generator:
+    """Builds the whole dataset in memory from one seeded RNG, so a seed always yields the same documents."""
+
+    def __init__(self, seed: int, rooms: int, tenants: int, years: int, payment_rate: float,
+                 maintenance_per_room_year: float, today: date, property_id: str = DEFAULT_PROPERTY_ID):
+        self.rng = random.Random(seed)
+        self.property_id = property_id
+        self.room_count = rooms
+        self.tenant_count = tenants
+        self.years = years
+        self.payment_rate = payment_rate
+        self.maintenance_per_room_year = maintenance_per_room_year
+        self.today = today
+        self.now = datetime(today.year, today.month, today.day, 12, tzinfo=timezone.utc)
+        self.start = add_months(today.year, today.month, -years * 12)
+        self.docs = defaultdict(list)
+        self.ledger = defaultdict(lambda: [0.0, 0])
+        # tenant id -> date the tenant's current rental ends
+        self.busy_until = {}
+
+    def new_id(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def add_transaction(self, tipe: str, jumlah: float, sumber: str, kategori: str, tanggal: datetime):
+        self.docs['transactions'].append({
+            "id": self.new_id(), "tipe": tipe, "jumlah": jumlah, "sumber": sumber,
+            "kategori": kategori, "tanggal": tanggal.isoformat()
+        })
+        row = self.ledger[(tanggal.year, tanggal.month, tipe, kategori)]
+        row[0] += jumlah
+        row[1] += 1
+
+    def generate(self):
+        created_at = month_start(*self.start) - timedelta(days=30)
+        for nama, tipe in DEFAULT_CATEGORIES:
+            self.docs['categories'].append({
+                "id": self.new_id(), "nama": nama, "tipe": tipe, "created_at": created_at.isoformat()
+            })
+
+        rooms = []
+        for i in range(self.room_count):
+            room = {
+                "id": self.new_id(),
+                "nomor_kamar": f"{i // 100 + 1}{i % 100 + 1:02d}",
+                "harga": float(self.rng.choice([800, 900, 1000, 1200, 1500, 1800]) * 1000),
+                "fasilitas": self.rng.choice(FASILITAS),
+                "status": "kosong",
+                "created_at": created_at.isoformat()
+            }
+            rooms.append(room)
+        self.docs['rooms'] = rooms
+
+        tenants = [self.make_tenant(created_at) for _ in range(self.tenant_count)]
+        for room in rooms:
+            self.generate_room_history(room, tenants)
+        self.docs['tenants'] = tenants
+        self.generate_expenses()
+        self.docs['ledger_monthly'] = [
+            {"tahun": tahun, "bulan": bulan, "tipe": tipe, "kategori": kategori,
+             "total": total, "jumlah_transaksi": count}
+            for (tahun, bulan, tipe, kategori), (total, count) in sorted(self.ledger.items())
+        ]
+        for collection in SCOPED_COLLECTIONS:
+            for doc in self.docs.get(collection, ()):
+                doc['property_id'] = self.property_id
+        return self.docs
+
+    def make_tenant(self, created_at: datetime) -> dict:
+        tenant = {
+            "id": self.new_id(),
+            "nama": f"{self.rng.choice(NAMA_DEPAN)} {self.rng.choice(NAMA_BELAKANG)}",
+            "telepon": f"08{self.rng.randint(11, 99)}{self.rng.randint(10000000, 99999999)}",
+            "email": None,
+            "ktp": f"32{self.rng.randint(10, 79):02d}{self.rng.randint(0, 10 ** 12 - 1):012d}",
+            "alamat": f"Jl. Contoh No. {self.rng.randint(1, 200)}",
+            "created_at": created_at.isoformat()
+        }
+        tenant.update(tenant_search_keys(tenant))
+        return tenant
+
+    def pick_tenant(self, tenants: list, tanggal_mulai: datetime) -> dict:
+        # Reuse a tenant from the pool when one is free, otherwise a new tenant moves in
+        for _ in range(3):
+            if not tenants:
+                break
+            tenant = self.rng.choice(tenants)
+            busy_until = self.busy_until.get(tenant['id'])
+            if busy_until is None or busy_until <= tanggal_mulai:
+                return tenant
+        tenant = self.make_tenant(tanggal_mulai)
+        tenants.append(tenant)
+        return tenant
+
+    def generate_room_history(self, room: dict, tenants: list):
+        tahun, bulan = self.start
+        # First tenant moves in within the first two months
+        cursor = month_start(tahun, bulan) + timedelta(days=self.rng.randint(0, 60))
+        while cursor < self.now:
+            stay_months = self.rng.choice([3, 6, 6, 12, 12, 12, 18, 24, 36])
+            tanggal_mulai = cursor
+            first = (tanggal_mulai.year, tanggal_mulai.month)
+            last = add_months(*first, stay_months - 1)
+            ended = last < (self.today.year, self.today.month)
+            if not ended:
+                last = (self.today.year, self.today.month)
+            tanggal_selesai = month_start(*add_months(*last, 1)) if ended else None
+
+            tenant = self.pick_tenant(tenants, tanggal_mulai)
+            self.busy_until[tenant['id']] = tanggal_selesai or datetime.max.replace(tzinfo=timezone.utc)
+            rental = {
+                "id": self.new_id(),
+                "tenant_id": tenant['id'],
+                "room_id": room['id'],
+                "tanggal_mulai": tanggal_mulai.isoformat(),
+                "tanggal_selesai": tanggal_selesai.isoformat() if tanggal_selesai else None,
+                "harga": room['harga'],
+                "status": "selesai" if ended else "aktif",
+                "created_at": tanggal_mulai.isoformat()
+            }
+            self.docs['rentals'].append(rental)
+            self.generate_bills(rental, room, tenant, first, last)
+            self.generate_maintenance(room, tanggal_mulai, tanggal_selesai or self.now)
+
+            if not ended:
+                room['status'] = "terisi"
+                break
+            # Vacancy before the next tenant
+            cursor = tanggal_selesai + timedelta(days=self.rng.choice([0, 0, 3, 7, 14, 30, 60]))
+
+    def generate_bills(self, rental: dict, room: dict, tenant: dict, first: tuple, last: tuple):
+        periode = first
+        while periode <= last:
+            tahun, bulan = periode
+            created = max(month_start(tahun, bulan), datetime.fromisoformat(rental['tanggal_mulai']))
+            bill = {
+                "id": self.new_id(),
+                "rental_id": rental['id'],
+                "bulan": bulan,
+                "tahun": tahun,
+                "jumlah": rental['harga'],
+                "tipe": "sewa",
+                "keterangan": None,
+                "status": "belum_bayar",
+                "cara_bayar": None,
+                "bukti_bayar": None,
+                "tanggal_bayar": None,
+                "created_at": created.isoformat()
+            }
+            tanggal_bayar = created + timedelta(days=self.rng.randint(0, 20), minutes=self.rng.randint(0, 600))
+            if tanggal_bayar < self.now and self.rng.random() < self.payment_rate:
+                bill['status'] = "lunas"
+                bill['cara_bayar'] = self.rng.choice(["tunai", "non_tunai"])
+                bill['tanggal_bayar'] = tanggal_bayar.isoformat()
+                self.add_transaction(
+                    "pemasukan", bill['jumlah'],
+                    f"Pembayaran sewa - {tenant['nama']} (Kamar {room['nomor_kamar']})", "sewa", tanggal_bayar
+                )
+            self.docs['bills'].append(bill)
+            periode = add_months(tahun, bulan, 1)
+
+    def generate_maintenance(self, room: dict, dari: datetime, sampai: datetime):
+        years = (sampai - dari).days / 365
+        tickets = int(years * self.maintenance_per_room_year + self.rng.random())
+        for _ in range(tickets):
+            created = dari + timedelta(seconds=self.rng.uniform(0, (sampai - dari).total_seconds()))
+            updated = min(created + timedelta(days=self.rng.randint(0, 14)), self.now)
+            status = "selesai" if updated < self.now - timedelta(days=14) else self.rng.choice(
+                ["dibuka", "dikerjakan", "selesai"])
+            biaya = float(self.rng.randint(5, 100) * 10000) if status == "selesai" else 0
+            self.docs['maintenance'].append({
+                "id": self.new_id(),
+                "lokasi": f"Kamar {room['nomor_kamar']}",
+                "room_id": room['id'],
+                "deskripsi": self.rng.choice(KERUSAKAN),
+                "petugas": self.rng.choice(["Pak Slamet", "Pak Udin", "Teknisi AC"]) if status != "dibuka" else None,
+                "status": status,
+                "biaya": biaya,
+                "created_at": created.isoformat(),
+                "updated_at": updated.isoformat()
+            })
+            if biaya:
+                self.add_transaction("pengeluaran", biaya, f"Perbaikan Kamar {room['nomor_kamar']}",
+                                     "perbaikan", updated)
+
+    def generate_expenses(self):
+        periode = self.start
+        while periode <= (self.today.year, self.today.month):
+            for kategori, day, per_room in MONTHLY_EXPENSES:
+                tanggal = month_start(*periode) + timedelta(days=day - 1)
+                if tanggal >= self.now:
+                    continue
+                jumlah = float(round(per_room * self.room_count * self.rng.uniform(0.85, 1.15), -3))
+                self.add_transaction("pengeluaran", jumlah, f"Biaya {kategori} bulan {periode[1]}/{periode[0]}",
+                                     kategori, tanggal)
+            periode = add_months(*periode, 1)
+
+
+async def insert_all(db, docs: dict, batch_size: int, parallel: int) -> dict:
+    """insert_many every collection in batches, with up to `parallel` batches in flight."""
+    semaphore = asyncio.Semaphore(parallel)
+    counts = defaultdict(int)
+
+    async def insert_batch(collection: str, batch: list):
+        async with semaphore:
+            await db[collection].insert_many(batch, ordered=False)
+            counts[collection] += len(batch)
+
+    tasks = []
+    for collection, items in docs.items():
+        for i in range(0, len(items), batch_size):
+            tasks.append(insert_batch(collection, items[i:i + batch_size]))
+    await asyncio.gather(*tasks)
+    return counts
+
+
+async def upsert_ledger(db, rows: list, batch_size: int, parallel: int) -> int:
+    """$inc the generated rollups into ledger_monthly, as record_transaction does, so existing rows add up."""
+    semaphore = asyncio.Semaphore(parallel)
+
+    async def upsert_batch(batch: list):
+        async with semaphore:
+            await db.ledger_monthly.bulk_write([
+                UpdateOne(
+                    {field: row[field] for field in LEDGER_KEY},
+                    {"$inc": {"total": row['total'], "jumlah_transaksi": row['jumlah_transaksi']}},
+                    upsert=True
+                )
+                for row in batch
+            ], ordered=False)
+
+    # Each key occurs once in rows, so no two batches race to upsert the same document
+    await asyncio.gather(*(upsert_batch(rows[i:i + batch_size]) for i in range(0, len(rows), batch_size)))
+    return len(rows)
+
+
+async def missing_categories(db, categories: list) -> list:
+    """Generated categories whose name is not taken yet; the collection has no unique index to reject repeats."""
+    existing = {doc['nama'] async for doc in db.categories.find({}, {"_id": 0, "nama": 1})}
+    return [category for category in categories if category['nama'] not in existing]
+
+
+async def bump_cache_versions(db):
+    """Make running API workers reload cached rooms, categories and ledger months on their next poll."""
+    await db.cache_versions.update_many({}, {"$inc": {"version": 1}})
+    await db.cache_versions.update_one({"key": "ledger"}, {"$setOnInsert": {"version": 1}}, upsert=True)
+
+
+async def generate_data(args):
+    mongo_url = os.environ['MONGO_URL']
+    client = AsyncIOMotorClient(mongo_url, maxPoolSize=max(args.parallel, 10))
+    db = client[os.environ['DB_NAME']]
+
+    started = time.perf_counter()
+    today = date.fromisoformat(args.today) if args.today else datetime.now(timezone.utc).date()
+    generator = Generator(args.seed, args.rooms, args.tenants, args.years, args.payment_rate,
+                          args.maintenance_rate, today, args.property_id)
+    docs = generator.generate()
+    # Stamped here, not in the generator, so the generated data stays a function of the seed
+    clock = RevisionClock()
+    for collection in SYNCED_COLLECTIONS:
+        for doc in docs.get(collection, ()):
+            doc['rev'] = clock.next()
+    print(f"✓ Generated data in memory in {time.perf_counter() - started:.1f}s")
+
+    await db.properties.update_one(
+        {"id": args.property_id},
+        {"$setOnInsert": {"id": args.property_id, "nama": args.property_name or f"Kos {args.property_id}",
+                          "alamat": None, "created_at": generator.now.isoformat(), "rev": clock.next()}},
+        upsert=True
+    )
+    scope = {"property_id": args.property_id}
+    if args.drop:
+        for collection in SCOPED_COLLECTIONS:
+            await db[collection].delete_many(scope)
+        print(f"✓ Cleared existing data of property '{args.property_id}' (users and categories kept)")
+    else:
+        # Occupancy rollups are rebuilt on demand; stale ones would no longer match the rentals
+        await db.occupancy_monthly.delete_many(scope)
+
+    inserted_at = time.perf_counter()
+    ledger_rows = docs.pop('ledger_monthly')
+    docs['categories'] = await missing_categories(db, docs['categories'])
+    counts = await insert_all(db, docs, args.batch_size, args.parallel)
+    counts['ledger_monthly'] = await upsert_ledger(db, ledger_rows, args.batch_size, args.parallel)
+    for collection in COLLECTIONS:
+        print(f"✓ Inserted {counts[collection]} documents into {collection}")
+    print(f"✓ Added {counts['ledger_monthly']} monthly rollups into ledger_monthly")
+    await bump_cache_versions(db)
+    print(f"\n✓ Inserted in {time.perf_counter() - inserted_at:.1f}s "
+          f"(total {time.perf_counter() - started:.1f}s, seed {args.seed})")
+
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic SISKOSAN dataset")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rooms", type=int, default=100)
+    parser.add_argument("--tenants", type=int, default=0,
+                        help="size of the initial tenant pool; more tenants are added as rentals turn over")
+    parser.add_argument("--years", type=int, default=2, help="years of history ending today")
+    parser.add_argument("--payment-rate", type=float, default=0.9, help="share of bills that get paid")
+    parser.add_argument("--maintenance-rate", type=float, default=1.5,
+                        help="maintenance tickets per occupied room per year")
+    parser.add_argument("--today", help="end date of the history (YYYY-MM-DD), for fully reproducible output")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--parallel", type=int, default=8, help="insert_many batches in flight")
+    parser.add_argument("--property-id", default=DEFAULT_PROPERTY_ID, help="property the data is generated for")
+    parser.add_argument("--property-name", help="name of the property if it does not exist yet")
+    parser.add_argument("--drop", action="store_true",
+                        help="clear the property's existing data first (users and categories are kept)")
+    asyncio.run(generate_data(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Durable background job queue backed by the ``jobs`` collection.
+
+Jobs are claimed atomically with ``find_one_and_update`` and held under a
+lease that a heartbeat keeps extending while the handler runs. A job whose
+lease expires (its worker crashed) becomes claimable again. A worker whose
+heartbeat finds the lease taken over cancels its handler, so a job never keeps
+running in two places. Failed jobs are retried with exponential backoff until
+``max_attempts`` is reached.
+
+Finished jobs are deleted ``retention_seconds`` after they finish, together
+with any result file older than that in ``results_dir``.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class JobContext:
+    def __init__(self, queue: "JobQueue", job: dict):
+        self.queue = queue
+        self.job = job
+
+    @property
+    def id(self) -> str:
+        return self.job["id"]
+
+    async def progress(self, done: int, total: int):
+        await self.queue.collection.update_one(
+            {"id": self.id, "worker": self.queue.worker_id},
+            {"$set": {"progress": {"done": done, "total": total}, "updated_at": now_iso()}}
+        )
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobQueue:
+    def __init__(self, db, concurrency: int = 2, lease_seconds: int = 60, max_attempts: int = 3,
+                 retry_base_seconds: int = 10, poll_seconds: float = 2.0,
+                 results_dir: Optional[Path] = None, retention_seconds: int = 86400, purge_seconds: float = 600):
+        self.collection = db.jobs
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.poll_seconds = poll_seconds
+        self.results_dir = results_dir
+        self.retention_seconds = retention_seconds
+        self.purge_seconds = purge_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.handlers: Dict[str, Callable[[JobContext, dict], Awaitable[Optional[dict]]]] = {}
+        self.workers: List[asyncio.Task] = []
+        self.wakeup = asyncio.Event()
+
+    def register(self, kind: str, handler: Callable[[JobContext, dict], Awaitable[Optional[dict]]]):
+        self.handlers[kind] = handler
+
+    async def start(self):
+        await self.collection.create_index("id", unique=True)
+        await self.collection.create_index([("status", 1), ("run_at", 1)])
+        await self.collection.create_index([("status", 1), ("lease_expires_at", 1)])
+        await self.collection.create_index([("status", 1), ("finished_at", 1)])
+        self.workers = [asyncio.create_task(self.work()) for _ in range(self.concurrency)]
+        self.workers.append(asyncio.create_task(self.purge_loop()))
+
+    async def stop(self):
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def enqueue(self, kind: str, payload: dict, created_by: Optional[str] = None) -> dict:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        now = now_iso()
+        job = {
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "payload": payload,
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": self.max_attempts,
+            "run_at": now,
+            "lease_expires_at": None,
+            "worker": None,
+            "progress": None,
+            "result": None,
+            "error": None,
+            "created_by": created_by,
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None
+        }
+        await self.collection.insert_one(job)
+        job.pop("_id", None)
+        self.wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"id": job_id}, {"_id": 0})
+
+    async def claim(self) -> Optional[dict]:
+        now = now_iso()
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "run_at": {"$lte": now}},
+                {"status": "running", "lease_expires_at": {"$lt": now}}
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "worker": self.worker_id,
+                    "lease_expires_at": self.lease_deadline(),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("run_at", 1)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def lease_deadline(self) -> str:
+        return (datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)).isoformat()
+
+    async def heartbeat(self, job_id: str, handler: asyncio.Task):
+        """Extend the lease while ``handler`` runs; cancel it once another worker has taken the job over."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                result = await self.collection.update_one(
+                    {"id": job_id, "worker": self.worker_id, "status": "running"},
+                    {"$set": {"lease_expires_at": self.lease_deadline()}}
+                )
+            except PyMongoError:
+                # The lease outlasts a couple of missed beats, so keep trying rather than let it lapse
+                logger.exception("Heartbeat for job %s failed, retrying", job_id)
+                continue
+            if result.matched_count == 0:
+                logger.error("Lost the lease on job %s, cancelling its handler", job_id)
+                handler.cancel()
+                return
+
+    async def work(self):
+        while True:
+            try:
+                job = await self.claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to claim job")
+                job = None
+
+            if job is None:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self.execute(job)
+
+    async def execute(self, job: dict):
+        owned = {"id": job["id"], "worker": self.worker_id}
+        handler = self.handlers.get(job["kind"])
+        if handler is None or job["attempts"] > job["max_attempts"]:
+            error = "Unknown job kind" if handler is None else "Lease expired too many times"
+            await self.collection.update_one(owned, {"$set": {
+                "status": "failed", "error": error, "finished_at": now_iso(), "updated_at": now_iso()
+            }})
+            return
+
+        running = asyncio.create_task(handler(JobContext(self, job), job["payload"]))
+        heartbeat = asyncio.create_task(self.heartbeat(job["id"], running))
+        try:
+            result = await running
+        except asyncio.CancelledError:
+            if heartbeat.done() and not heartbeat.cancelled():
+                # Cancelled by the heartbeat: the job belongs to another worker now, leave its record alone
+                return
+            # Graceful shutdown: hand the job back without charging an attempt
+            await self.collection.update_one(owned, {
+                "$set": {"status": "queued", "worker": None, "lease_expires_at": None, "updated_at": now_iso()},
+                "$inc": {"attempts": -1}
+            })
+            raise
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job["id"], job["kind"])
+            update = {"error": str(exc), "updated_at": now_iso(), "worker": None, "lease_expires_at": None}
+            if job["attempts"] < job["max_attempts"]:
+                delay = self.retry_base_seconds * 2 ** (job["attempts"] - 1)
+                update["status"] = "queued"
+                update["run_at"] = (datetime.now(timezone.utc) + timedelta(seconds=delay)).isoformat()
+            else:
+                update["status"] = "failed"
+                update["finished_at"] = now_iso()
+            await self.collection.update_one(owned, {"$set": update})
+        else:
+            await self.collection.update_one(owned, {"$set": {
+                "status": "success",
+                "result": result,
+                "error": None,
+                "lease_expires_at": None,
+                "finished_at": now_iso(),
+                "updated_at": now_iso()
+            }})
+        finally:
+            heartbeat.cancel()
+
+    async def purge_loop(self):
+        while True:
+            try:
+                await self.purge()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to purge expired jobs")
+            await asyncio.sleep(self.purge_seconds)
+
+    async def purge(self) -> int:
+        """Delete jobs finished more than retention_seconds ago and result files older than that."""
+        cutoff = (datetime.now(timezone.utc) - timedelta(seconds=self.retention_seconds)).isoformat()
+        result = await self.collection.delete_many(
+            {"status": {"$in": ["success", "failed"]}, "finished_at": {"$lt": cutoff}}
+        )
+        if self.results_dir is not None and self.results_dir.exists():
+            # By age rather than by job, so files of jobs that crashed mid-write go as well
+            oldest = time.time() - self.retention_seconds
+            for path in self.results_dir.iterdir():
+                if path.is_file() and path.stat().st_mtime < oldest:
+                    path.unlink(missing_ok=True)
+        return result.deleted_count
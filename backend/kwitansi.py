@@ -0,0 +1,200 @@
+"""Kwitansi (payment receipt) PDF rendering.
+
+Kept free of database and app imports so it can run inside worker processes.
+
+The static parts of a receipt (header, labels, rules, amount box, signature
+block and footer) are described by a layout computed once at import. In a
+multi-receipt document they are compiled into a form XObject on first use
+and every page only references it, overlaying the per-bill text. A form
+cannot be shared across files, so single receipts instead replay the page
+operators of the static parts, recorded once per process.
+"""
+import io
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, Tuple
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from reportlab.lib import colors
+
+WIDTH, HEIGHT = A4
+
+BULAN_INDONESIA = (
+    'Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni',
+    'Juli', 'Agustus', 'September', 'Oktober', 'November', 'Desember'
+)
+
+# Rows of the details block, top to bottom; None is a 10pt spacer, everything else a 20pt line
+DETAIL_ROWS = ("nomor", "tanggal", None, "terima", "nama", "alamat", "telepon", None, "pembayaran", "kamar", "periode")
+DETAIL_LABELS = {"terima": "Telah terima dari:", "pembayaran": "Untuk pembayaran:"}
+
+
+def build_layout(has_keterangan: bool) -> Dict[str, float]:
+    y_position = HEIGHT - 130
+    positions = {}
+    for row in DETAIL_ROWS + (("keterangan",) if has_keterangan else ()):
+        if row is None:
+            y_position -= 10
+            continue
+        positions[row] = y_position
+        y_position -= 20
+
+    box = y_position - 10
+    positions.update({
+        "box": box,
+        "cara_bayar": box - 80,
+        "penerima": box - 140,
+        "tanda_tangan": box - 200,
+        "admin": box - 215
+    })
+    return positions
+
+
+# The optional keterangan line shifts everything below it, hence one layout per variant
+LAYOUTS = {False: build_layout(False), True: build_layout(True)}
+
+
+def draw_static(c: canvas.Canvas, layout: Dict[str, float]):
+    # Header
+    c.setFont("Helvetica-Bold", 20)
+    c.drawCentredString(WIDTH / 2, HEIGHT - 50, "KWITANSI PEMBAYARAN")
+
+    c.setFont("Helvetica-Bold", 14)
+    c.drawCentredString(WIDTH / 2, HEIGHT - 75, "SISKOSAN")
+
+    # Line
+    c.setStrokeColor(colors.black)
+    c.setLineWidth(2)
+    c.line(50, HEIGHT - 90, WIDTH - 50, HEIGHT - 90)
+
+    # Section labels
+    c.setFont("Helvetica-Bold", 11)
+    for row, label in DETAIL_LABELS.items():
+        c.drawString(60, layout[row], label)
+
+    # Amount box
+    box = layout["box"]
+    c.setLineWidth(1)
+    c.rect(60, box - 40, WIDTH - 120, 60)
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(70, box - 15, "Jumlah Dibayar:")
+
+    # Signature
+    c.setFont("Helvetica", 10)
+    c.drawString(WIDTH - 200, layout["penerima"], "Penerima,")
+    c.line(WIDTH - 200, layout["tanda_tangan"], WIDTH - 60, layout["tanda_tangan"])
+    c.drawString(WIDTH - 200, layout["admin"], "(Admin)")
+
+    # Footer
+    c.setFont("Helvetica-Oblique", 8)
+    c.setFillColor(colors.grey)
+    c.drawCentredString(WIDTH / 2, 30, "Kwitansi ini sah tanpa tanda tangan dan stempel")
+    c.drawCentredString(WIDTH / 2, 20, "Terima kasih atas pembayaran Anda")
+
+
+def draw_variable(c: canvas.Canvas, bill: dict, room: dict, tenant: dict, layout: Dict[str, float]):
+    lines = {
+        "nomor": f"No. Kwitansi: KWT-{bill['id'][:8].upper()}",
+        "tanggal": f"Tanggal: {datetime.fromisoformat(bill['tanggal_bayar']).strftime('%d %B %Y')}",
+        "nama": f"Nama: {tenant['nama']}",
+        "alamat": f"Alamat: {tenant['alamat']}",
+        "telepon": f"Telepon: {tenant['telepon']}",
+        "kamar": f"Sewa Kamar: {room['nomor_kamar']}",
+        "periode": f"Periode: {BULAN_INDONESIA[bill['bulan'] - 1]} {bill['tahun']}",
+    }
+    if bill.get('keterangan'):
+        lines["keterangan"] = f"Keterangan: {bill['keterangan']}"
+
+    c.setFont("Helvetica", 11)
+    for row, text in lines.items():
+        c.drawString(60, layout[row], text)
+
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(70, layout["box"] - 35, f"Rp {bill['jumlah']:,.0f}".replace(",", "."))
+
+    c.setFont("Helvetica", 10)
+    cara_bayar_text = "Tunai" if bill.get('cara_bayar') == 'tunai' else "Transfer/Non Tunai"
+    c.drawString(60, layout["cara_bayar"], f"Cara Bayar: {cara_bayar_text}")
+
+
+class KwitansiTemplate:
+    """Compiles the static parts into a form XObject once per document and reuses it on every page."""
+
+    def __init__(self, c: canvas.Canvas):
+        self.canvas = c
+        self.defined = set()
+
+    def draw(self, layout_key: bool):
+        name = f"kwitansi_static_{int(layout_key)}"
+        if name not in self.defined:
+            self.canvas.beginForm(name)
+            draw_static(self.canvas, LAYOUTS[layout_key])
+            self.canvas.endForm()
+            self.defined.add(name)
+        self.canvas.doForm(name)
+
+
+@lru_cache(maxsize=None)
+def static_operators(layout_key: bool) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    """The static parts as raw page operators, with the (font, internal name) pairs their Tf operators use."""
+    c = canvas.Canvas(io.BytesIO(), pagesize=A4)
+    start = len(c._code)
+    c.saveState()
+    draw_static(c, LAYOUTS[layout_key])
+    c.restoreState()
+    return "\n".join(c._code[start:]), tuple(c._doc.fontMapping.items())
+
+
+class RecordedTemplate:
+    """Replays the recorded static operators into a single-receipt file instead of redrawing them."""
+
+    def __init__(self, c: canvas.Canvas):
+        self.canvas = c
+
+    def draw(self, layout_key: bool):
+        operators, fonts = static_operators(layout_key)
+        # Internal font names follow registration order, which only matches on a fresh canvas
+        if any(self.canvas._doc.getInternalFontName(font) != name for font, name in fonts):
+            self.canvas.saveState()
+            draw_static(self.canvas, LAYOUTS[layout_key])
+            self.canvas.restoreState()
+            return
+        self.canvas.addLiteral(operators)
+
+
+def draw_kwitansi(c: canvas.Canvas, bill: dict, room: dict, tenant: dict, template: KwitansiTemplate = None):
+    layout_key = bool(bill.get('keterangan'))
+    layout = LAYOUTS[layout_key]
+    if template:
+        template.draw(layout_key)
+    else:
+        c.saveState()
+        draw_static(c, layout)
+        c.restoreState()
+    draw_variable(c, bill, room, tenant, layout)
+
+
+def render_kwitansi(bill: dict, room: dict, tenant: dict, use_template: bool = True) -> bytes:
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    draw_kwitansi(c, bill, room, tenant, RecordedTemplate(c) if use_template else None)
+    c.save()
+    return buffer.getvalue()
+
+
+def render_kwitansi_document(entries: Iterable[Tuple[dict, dict, dict]], pdf_path: str, use_template: bool = True) -> int:
+    """Render many receipts as pages of one PDF written to ``pdf_path``."""
+    c = canvas.Canvas(pdf_path, pagesize=A4)
+    template = KwitansiTemplate(c) if use_template else None
+    count = 0
+    for bill, room, tenant in entries:
+        draw_kwitansi(c, bill, room, tenant, template)
+        c.showPage()
+        count += 1
+    c.save()
+    return count
+
+
+def kwitansi_download_name(bill: dict, tenant: dict) -> str:
+    return f"kwitansi_{tenant['nama'].replace(' ', '_')}_{bill['bulan']}_{bill['tahun']}.pdf"
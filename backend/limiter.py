@@ -0,0 +1,187 @@
+"""Per-client rate limits and per-process concurrency caps for expensive routes.
+
+Rate limits are token buckets. Each bucket is keyed by rule name, scope and
+client, e.g. ``login:ip:10.0.0.7`` or ``kwitansi:user:<id>``. It holds up to
+``capacity`` tokens and refills ``capacity`` tokens every ``per_seconds``.
+Buckets live in memory by default. ``MongoBucketStore`` keeps them in a
+collection instead: each take is a single atomic ``find_one_and_update``, so
+every worker sees the same buckets.
+
+Concurrency caps bound how many requests of a route class run at once in this
+process. Extra requests wait up to ``queue_timeout`` seconds for a slot and
+are then shed. The caps protect this process's CPU and connection pool, so
+they are deliberately not shared between workers.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+class Rate(NamedTuple):
+    capacity: float
+    per_seconds: float
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.capacity / self.per_seconds
+
+
+def parse_rate(text: Optional[str]) -> Optional[Rate]:
+    """``"5/60"`` is 5 requests per 60 seconds; empty or ``"0"`` disables the rule."""
+    if not text or text.strip() == "0":
+        return None
+    capacity, _, per_seconds = text.partition("/")
+    return Rate(float(capacity), float(per_seconds or 1))
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"rate limited, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"overloaded, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class MemoryBucketStore:
+    def __init__(self, max_buckets: int = 100_000):
+        self.max_buckets = max_buckets
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def take(self, key: str, rate: Rate) -> float:
+        """Take one token; returns 0 when allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (rate.capacity, now))
+        tokens = min(rate.capacity, tokens + (now - updated) * rate.refill_per_second)
+        if tokens >= 1:
+            self.store(key, tokens - 1, now)
+            return 0.0
+        self.store(key, tokens, now)
+        return (1 - tokens) / rate.refill_per_second
+
+    def store(self, key: str, tokens: float, now: float):
+        if key not in self.buckets and len(self.buckets) >= self.max_buckets:
+            # Oldest-inserted bucket goes first; an evicted client simply starts with a full bucket
+            self.buckets.pop(next(iter(self.buckets)))
+        self.buckets[key] = (tokens, now)
+
+
+class MongoBucketStore:
+    """Buckets shared by all workers; idle buckets expire through a TTL index once they would be full again."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def start(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def take(self, key: str, rate: Rate) -> float:
+        now = time.time()
+        refilled = {"$min": [rate.capacity, {"$add": [
+            {"$ifNull": ["$tokens", rate.capacity]},
+            {"$multiply": [
+                {"$max": [0, {"$subtract": [now, {"$ifNull": ["$updated", now]}]}]},
+                rate.refill_per_second
+            ]}
+        ]}]}
+        pipeline = [
+            {"$set": {"tokens": refilled, "updated": now}},
+            {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+            {"$set": {
+                "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=rate.per_seconds)
+            }},
+        ]
+        for attempt in range(2):
+            try:
+                doc = await self.collection.find_one_and_update(
+                    {"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER
+                )
+                break
+            except DuplicateKeyError:
+                # Two workers upserted the same new bucket; the second attempt updates the winner's
+                if attempt:
+                    raise
+        if doc['allowed']:
+            return 0.0
+        return (1 - doc['tokens']) / rate.refill_per_second
+
+
+class ConcurrencyCap:
+    def __init__(self, limit: int, queue_timeout: float):
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+
+
+class Limiter:
+    def __init__(self, store, on_decision: Optional[Callable[[str, str, str], None]] = None):
+        self.store = store
+        self.on_decision = on_decision
+        self.rates: Dict[Tuple[str, str], Rate] = {}
+        self.caps: Dict[str, ConcurrencyCap] = {}
+
+    def add_rate(self, name: str, scope: str, rate: Optional[Rate]):
+        if rate is not None:
+            self.rates[(name, scope)] = rate
+
+    def add_cap(self, name: str, limit: int, queue_timeout: float):
+        if limit > 0:
+            self.caps[name] = ConcurrencyCap(limit, queue_timeout)
+
+    def record(self, name: str, scope: str, outcome: str):
+        if self.on_decision:
+            self.on_decision(name, scope, outcome)
+
+    async def hit(self, name: str, scope: str, client: str):
+        """Take a token from the (name, scope) bucket of ``client``; raises RateLimited when it is empty."""
+        rate = self.rates.get((name, scope))
+        if rate is None:
+            return
+        try:
+            wait = await self.store.take(f"{name}:{scope}:{client}", rate)
+        except Exception:
+            # A limiter that cannot reach its store lets traffic through rather than failing every request
+            logger.exception("Rate limiter store failed, allowing request")
+            self.record(name, scope, "error")
+            return
+        if wait:
+            self.record(name, scope, "limited")
+            raise RateLimited(wait)
+        self.record(name, scope, "allowed")
+
+    @asynccontextmanager
+    async def slot(self, name: str):
+        """Hold one of the ``name`` concurrency slots; raises Overloaded after waiting queue_timeout."""
+        cap = self.caps.get(name)
+        if cap is None:
+            yield
+            return
+        cap.waiting += 1
+        try:
+            await asyncio.wait_for(cap.semaphore.acquire(), timeout=cap.queue_timeout)
+        except asyncio.TimeoutError:
+            self.record(name, "concurrency", "shed")
+            raise Overloaded(cap.queue_timeout)
+        finally:
+            cap.waiting -= 1
+        self.record(name, "concurrency", "admitted")
+        cap.in_flight += 1
+        try:
+            yield
+        finally:
+            cap.in_flight -= 1
+            cap.semaphore.release()
@@ -0,0 +1,208 @@
+"""Request and database metrics rendered in the Prometheus text format.
+
+``MetricsMiddleware`` opens a ``RequestDBStats`` per HTTP request and exposes
+it through a context variable. Motor copies the context into the executor
+threads that run pymongo, so ``DBCommandListener`` can attribute every Mongo
+command to the request (and therefore the route) that issued it.
+"""
+import contextvars
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import bson
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_COMMAND_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+DB_BYTES_BUCKETS = (1024, 8192, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class RequestDBStats:
+    __slots__ = ("commands", "bytes", "command_counts", "command_log")
+
+    def __init__(self):
+        self.commands = 0
+        self.bytes = 0
+        self.command_counts: Dict[str, int] = {}
+        self.command_log: list = []
+
+
+current_request: contextvars.ContextVar[Optional[RequestDBStats]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.series: Dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self.series.get(labels)
+        if series is None:
+            # bucket counts, then sum, then count
+            series = self.series[labels] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: Tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.db_commands_per_request = Histogram(DB_COMMAND_BUCKETS)
+        self.db_bytes_per_request = Histogram(DB_BYTES_BUCKETS)
+        self.responses: Dict[tuple, int] = {}
+        self.db_commands: Dict[tuple, int] = {}
+        self.limiter_decisions: Dict[tuple, int] = {}
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestDBStats):
+        with self.lock:
+            self.latency.observe((method, route), seconds)
+            self.db_commands_per_request.observe((method, route), stats.commands)
+            self.db_bytes_per_request.observe((method, route), stats.bytes)
+            key = (method, route, str(status))
+            self.responses[key] = self.responses.get(key, 0) + 1
+            for command, count in stats.command_counts.items():
+                key = (route, command)
+                self.db_commands[key] = self.db_commands.get(key, 0) + count
+
+    def observe_background_command(self, command: str):
+        with self.lock:
+            key = ("background", command)
+            self.db_commands[key] = self.db_commands.get(key, 0) + 1
+
+    def observe_limiter(self, name: str, scope: str, outcome: str):
+        with self.lock:
+            key = (name, scope, outcome)
+            self.limiter_decisions[key] = self.limiter_decisions.get(key, 0) + 1
+
+    def render(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        lines = []
+        with self.lock:
+            self.render_histogram(lines, "siskosan_http_request_duration_seconds",
+                                  "HTTP request latency by route", self.latency, ("method", "route"))
+            self.render_counter(lines, "siskosan_http_responses_total", "HTTP responses by route and status",
+                                self.responses, ("method", "route", "status"))
+            self.render_histogram(lines, "siskosan_db_commands_per_request",
+                                  "Mongo commands issued per HTTP request", self.db_commands_per_request,
+                                  ("method", "route"))
+            self.render_histogram(lines, "siskosan_db_reply_bytes_per_request",
+                                  "Mongo reply bytes received per HTTP request", self.db_bytes_per_request,
+                                  ("method", "route"))
+            self.render_counter(lines, "siskosan_db_commands_total", "Mongo commands by route and command name",
+                                self.db_commands, ("route", "command"))
+            self.render_counter(lines, "siskosan_limiter_decisions_total",
+                                "Rate limit and concurrency cap decisions by rule, scope and outcome",
+                                self.limiter_decisions, ("rule", "scope", "outcome"))
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def render_counter(lines: list, name: str, help_text: str, values: Dict[tuple, int], label_names: tuple):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in values.items():
+            lines.append(f"{name}{format_labels(label_names, labels)} {value}")
+
+    @staticmethod
+    def render_histogram(lines: list, name: str, help_text: str, histogram: Histogram, label_names: tuple):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, series in histogram.series.items():
+            for bound, count in zip(histogram.buckets, series):
+                bucket_labels = format_labels(label_names, labels, 'le="%s"' % bound)
+                lines.append(f"{name}_bucket{bucket_labels} {count}")
+            inf_labels = format_labels(label_names, labels, 'le="+Inf"')
+            lines.append(f"{name}_bucket{inf_labels} {series[-1]}")
+            lines.append(f"{name}_sum{format_labels(label_names, labels)} {series[-2]}")
+            lines.append(f"{name}_count{format_labels(label_names, labels)} {series[-1]}")
+
+
+registry = MetricsRegistry()
+
+# Called as hook(method, route, status, seconds, stats) once each request has finished
+request_end_hooks: List[Callable[[str, str, int, float, RequestDBStats], None]] = []
+
+
+def route_label(scope: dict) -> str:
+    """The matched route template (FastAPI stores the route in the scope), never the raw path."""
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path_format", None) or getattr(route, "path", "unknown")
+    if scope.get("root_path"):
+        return scope["root_path"]
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed responses are timed until their last chunk is sent."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestDBStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            elapsed = time.perf_counter() - started
+            route = route_label(scope)
+            registry.observe_request(scope["method"], route, status_holder[0], elapsed, stats)
+            for hook in request_end_hooks:
+                hook(scope["method"], route, status_holder[0], elapsed, stats)
+
+
+class DBCommandListener(monitoring.CommandListener):
+    def __init__(self, measure_bytes: bool = True):
+        self.measure_bytes = measure_bytes
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.record(event.command_name, event.reply if self.measure_bytes else None)
+
+    def failed(self, event):
+        self.record(event.command_name, None)
+
+    def record(self, command_name: str, reply):
+        stats = current_request.get()
+        if stats is None:
+            registry.observe_background_command(command_name)
+            return
+        stats.commands += 1
+        stats.command_counts[command_name] = stats.command_counts.get(command_name, 0) + 1
+        if reply is not None:
+            stats.bytes += len(bson.encode(reply))
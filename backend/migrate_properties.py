@@ -0,0 +1,53 @@
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+from datetime import datetime, timezone
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Collections whose documents belong to exactly one property
+SCOPED_COLLECTIONS = [
+    'rooms', 'tenants', 'rentals', 'bills', 'maintenance', 'transactions',
+    'ledger_monthly', 'occupancy_monthly'
+]
+
+async def migrate_properties():
+    mongo_url = os.environ['MONGO_URL']
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ['DB_NAME']]
+    property_id = os.environ.get('DEFAULT_PROPERTY_ID', 'default')
+
+    await db.properties.update_one(
+        {"id": property_id},
+        {"$setOnInsert": {
+            "id": property_id,
+            "nama": os.environ.get('DEFAULT_PROPERTY_NAME', 'Kos Utama'),
+            "alamat": None,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }},
+        upsert=True
+    )
+    print(f"✓ Default property '{property_id}' ready")
+
+    # Idempotent: only documents written before properties existed are touched
+    for collection in SCOPED_COLLECTIONS:
+        result = await db[collection].update_many(
+            {"property_id": {"$exists": False}}, {"$set": {"property_id": property_id}}
+        )
+        print(f"✓ Assigned {result.modified_count} {collection} documents to '{property_id}'")
+
+    result = await db.users.update_many(
+        {"role": {"$ne": "super_admin"}, "property_ids": {"$exists": False}},
+        {"$set": {"property_ids": [property_id]}}
+    )
+    print(f"✓ Granted {result.modified_count} users access to '{property_id}'")
+
+    print("\n✓ Migration complete. The API replaces the old indexes with property_id compound indexes on startup.")
+
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(migrate_properties())
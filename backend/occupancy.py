@@ -0,0 +1,116 @@
+"""Occupancy engine: sweeps rental intervals into per-month occupancy statistics.
+
+A rental occupies its room from the date of ``tanggal_mulai`` up to, but not
+including, the date of ``tanggal_selesai``. Active rentals run until the end
+of the period being computed (or today, for the open month).
+"""
+from calendar import monthrange
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+
+def to_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.date()
+    return value
+
+
+def merge_intervals(intervals: List[Tuple[date, date]]) -> List[Tuple[date, date]]:
+    merged: List[Tuple[date, date]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def compute_month_occupancy(rentals: List[dict], rooms: List[dict], tahun: int, bulan: int, today: date) -> dict:
+    """Compute occupancy for one month from raw rental and room documents.
+
+    For the open month only days up to and including ``today`` are counted.
+    Rentals whose room no longer exists are ignored.
+    """
+    month_start = date(tahun, bulan, 1)
+    month_end = month_start + timedelta(days=monthrange(tahun, bulan)[1])
+    window_end = min(month_end, today + timedelta(days=1))
+    jumlah_hari = max((window_end - month_start).days, 0)
+
+    rooms_by_id = {room['id']: room for room in rooms}
+    intervals_by_room: Dict[str, List[Tuple[date, date]]] = {room_id: [] for room_id in rooms_by_id}
+    available_from = {room_id: to_date(room.get('created_at')) or month_start for room_id, room in rooms_by_id.items()}
+
+    sewa_selesai = 0
+    total_lama_sewa_hari = 0
+    for rental in rentals:
+        room_id = rental['room_id']
+        if room_id not in rooms_by_id:
+            continue
+        start = to_date(rental['tanggal_mulai'])
+        end = to_date(rental.get('tanggal_selesai')) or window_end
+        available_from[room_id] = min(available_from[room_id], start)
+        if rental.get('tanggal_selesai') and month_start <= end < month_end:
+            sewa_selesai += 1
+            total_lama_sewa_hari += (end - start).days
+        clipped = (max(start, month_start), min(end, window_end))
+        if clipped[0] < clipped[1]:
+            intervals_by_room[room_id].append(clipped)
+
+    # Sweep: +1 when a room becomes occupied/available, -1 when it stops
+    terisi_delta = [0] * (jumlah_hari + 1)
+    tersedia_delta = [0] * (jumlah_hari + 1)
+    per_kamar = []
+    for room_id, room in rooms_by_id.items():
+        tersedia_mulai = max(available_from[room_id], month_start)
+        hari_tersedia = max((window_end - tersedia_mulai).days, 0)
+        if hari_tersedia:
+            tersedia_delta[(tersedia_mulai - month_start).days] += 1
+            tersedia_delta[jumlah_hari] -= 1
+
+        hari_terisi = 0
+        for start, end in merge_intervals(intervals_by_room[room_id]):
+            terisi_delta[(start - month_start).days] += 1
+            terisi_delta[(end - month_start).days] -= 1
+            hari_terisi += (end - start).days
+
+        if hari_tersedia or hari_terisi:
+            per_kamar.append({
+                "room_id": room_id,
+                "nomor_kamar": room.get('nomor_kamar'),
+                "hari_terisi": hari_terisi,
+                "hari_kosong": max(hari_tersedia - hari_terisi, 0)
+            })
+
+    harian = []
+    terisi = tersedia = 0
+    for offset in range(jumlah_hari):
+        terisi += terisi_delta[offset]
+        tersedia += tersedia_delta[offset]
+        harian.append({
+            "tanggal": (month_start + timedelta(days=offset)).isoformat(),
+            "terisi": terisi,
+            "tersedia": tersedia,
+            "tingkat_hunian": round(terisi / tersedia, 4) if tersedia else 0
+        })
+
+    kamar_hari_terisi = sum(day['terisi'] for day in harian)
+    kamar_hari_tersedia = sum(day['tersedia'] for day in harian)
+
+    return {
+        "tahun": tahun,
+        "bulan": bulan,
+        "jumlah_hari": jumlah_hari,
+        "kamar_hari_terisi": kamar_hari_terisi,
+        "kamar_hari_tersedia": kamar_hari_tersedia,
+        "tingkat_hunian": round(kamar_hari_terisi / kamar_hari_tersedia, 4) if kamar_hari_tersedia else 0,
+        "sewa_selesai": sewa_selesai,
+        "total_lama_sewa_hari": total_lama_sewa_hari,
+        "harian": harian,
+        "per_kamar": per_kamar
+    }
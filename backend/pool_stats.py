@@ -0,0 +1,90 @@
+"""Connection pool statistics gathered from pymongo's pool event listeners.
+
+pymongo emits checkout-started and checked-out events from the same thread
+(Motor runs pymongo calls in its executor threads), so the wait time of a
+checkout is measured between the two with a thread-local start timestamp.
+"""
+import threading
+import time
+from pymongo import monitoring
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkouts_total = 0
+        self.checkout_failures = {}
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.pool_clears = 0
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "waiting": self.waiting,
+                "checkouts_total": self.checkouts_total,
+                "checkout_failures": dict(self.checkout_failures),
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts_total, 6) if self.checkouts_total else 0,
+                "pool_clears": self.pool_clears
+            }
+
+    def _finish_wait(self) -> float:
+        started = getattr(self.local, "checkout_started", None)
+        self.local.checkout_started = None
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def connection_check_out_started(self, event):
+        self.local.checkout_started = time.perf_counter()
+        with self.lock:
+            self.waiting += 1
+
+    def connection_checked_out(self, event):
+        waited = self._finish_wait()
+        with self.lock:
+            self.waiting -= 1
+            self.checked_out += 1
+            self.checkouts_total += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def connection_check_out_failed(self, event):
+        self._finish_wait()
+        with self.lock:
+            self.waiting -= 1
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+
+    def connection_checked_in(self, event):
+        with self.lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self.lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self.lock:
+            self.open_connections -= 1
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self.lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
@@ -0,0 +1,202 @@
+"""On-demand request profiling.
+
+A super admin arms one ``ProfilerSession`` at a time for the next N requests
+whose path matches a glob, or for a time window. Matching requests run under
+either ``cProfile`` (saved as ``.pstats``) or a stack sampler thread that
+snapshots the event-loop thread's stack (saved as speedscope JSON).
+
+When no session is armed, ``ProfilerMiddleware`` costs one attribute check.
+cProfile sees everything the event loop runs while a matching request is in
+flight, including other requests interleaved at ``await`` points.
+"""
+import asyncio
+import cProfile
+import fnmatch
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+
+class StackSampler:
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.active = 0
+        self.samples: Counter = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="profiler-sampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            if not self.active:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+    def to_speedscope(self, name: str) -> dict:
+        frame_index = {}
+        frames = []
+        samples = []
+        weights = []
+        for stack, count in self.samples.items():
+            indices = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                indices.append(frame_index[frame])
+            samples.append(indices)
+            weights.append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "siskosan-profiler",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights
+            }]
+        }
+
+
+class ProfilerSession:
+    def __init__(self, mode: str, path_pattern: str, max_requests: Optional[int],
+                 duration_seconds: Optional[float], sample_interval: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.mode = mode
+        self.path_pattern = path_pattern
+        self.max_requests = max_requests
+        self.deadline = time.monotonic() + duration_seconds if duration_seconds else None
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.profiled = 0
+        self.in_flight = 0
+        self.cprofile = cProfile.Profile() if mode == "cprofile" else None
+        self.sampler = StackSampler(threading.get_ident(), sample_interval) if mode == "sampler" else None
+
+    def exhausted(self) -> bool:
+        if self.max_requests is not None and self.profiled >= self.max_requests:
+            return True
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def wants(self, path: str) -> bool:
+        if self.exhausted() or not fnmatch.fnmatchcase(path, self.path_pattern):
+            return False
+        if self.max_requests is not None and self.profiled + self.in_flight >= self.max_requests:
+            return False
+        # cProfile cannot nest: while one request is profiled, concurrent ones pass through
+        return not (self.cprofile and self.in_flight)
+
+    def describe(self) -> dict:
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "path_pattern": self.path_pattern,
+            "max_requests": self.max_requests,
+            "profiled": self.profiled,
+            "started_at": self.started_at
+        }
+
+
+class Profiler:
+    def __init__(self, output_dir: Path, sample_interval: float = 0.005):
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.session: Optional[ProfilerSession] = None
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def start(self, mode: str, path_pattern: str, max_requests: Optional[int],
+              duration_seconds: Optional[float]) -> ProfilerSession:
+        if self.session is not None:
+            raise RuntimeError("A profiling session is already running")
+        session = ProfilerSession(mode, path_pattern, max_requests, duration_seconds, self.sample_interval)
+        if session.sampler:
+            session.sampler.start()
+        self.session = session
+        if duration_seconds:
+            self.timer = asyncio.get_running_loop().call_later(duration_seconds, self.finish_if_idle)
+        return session
+
+    def finish_if_idle(self):
+        if self.session and self.session.in_flight == 0:
+            self.finish()
+
+    def finish(self) -> Optional[str]:
+        session, self.session = self.session, None
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        if session is None:
+            return None
+
+        self.output_dir.mkdir(exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        if session.cprofile:
+            filename = f"profile_{stamp}_{session.id}.pstats"
+            session.cprofile.dump_stats(str(self.output_dir / filename))
+        else:
+            session.sampler.stop()
+            filename = f"profile_{stamp}_{session.id}.speedscope.json"
+            profile = session.sampler.to_speedscope(f"{session.path_pattern} ({session.profiled} requests)")
+            (self.output_dir / filename).write_text(json.dumps(profile))
+        return filename
+
+    def list_profiles(self) -> List[dict]:
+        if not self.output_dir.exists():
+            return []
+        return [
+            {"name": path.name, "size": path.stat().st_size}
+            for path in sorted(self.output_dir.glob("profile_*"), reverse=True)
+        ]
+
+
+class ProfilerMiddleware:
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        session = self.profiler.session
+        if session is None or scope["type"] != "http" or not session.wants(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        session.in_flight += 1
+        if session.cprofile:
+            session.cprofile.enable()
+        else:
+            session.sampler.active += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if session.cprofile:
+                session.cprofile.disable()
+            else:
+                session.sampler.active -= 1
+            session.in_flight -= 1
+            session.profiled += 1
+            if self.profiler.session is session and session.exhausted() and session.in_flight == 0:
+                self.profiler.finish()
@@ -0,0 +1,57 @@
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+async def rebuild_ledger():
+    mongo_url = os.environ['MONGO_URL']
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ['DB_NAME']]
+    
+    # Rebuild ledger_monthly from raw transactions, hot and archived, in a single aggregation.
+    # $out swaps the collection atomically and keeps its existing indexes.
+    pipeline = [
+        {"$unionWith": "transactions_archive"},
+        {"$addFields": {"_tanggal": {"$toDate": "$tanggal"}}},
+        {"$group": {
+            "_id": {
+                "property_id": "$property_id",
+                "tahun": {"$year": "$_tanggal"},
+                "bulan": {"$month": "$_tanggal"},
+                "tipe": "$tipe",
+                "kategori": "$kategori"
+            },
+            "total": {"$sum": "$jumlah"},
+            "jumlah_transaksi": {"$sum": 1}
+        }},
+        {"$project": {
+            "_id": 0,
+            "property_id": "$_id.property_id",
+            "tahun": "$_id.tahun",
+            "bulan": "$_id.bulan",
+            "tipe": "$_id.tipe",
+            "kategori": "$_id.kategori",
+            "total": 1,
+            "jumlah_transaksi": 1
+        }},
+        {"$out": "ledger_monthly"}
+    ]
+    await db.transactions.aggregate(pipeline).to_list(None)
+    await db.ledger_monthly.create_index(
+        [("property_id", 1), ("tahun", 1), ("bulan", 1), ("tipe", 1), ("kategori", 1)], unique=True
+    )
+    
+    count = await db.ledger_monthly.count_documents({})
+    print(f"✓ Rebuilt ledger_monthly with {count} rollup documents")
+
+    # Running API workers drop their cached closed-month totals on their next version poll
+    await db.cache_versions.update_one({"key": "ledger"}, {"$inc": {"version": 1}}, upsert=True)
+    
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_ledger())
@@ -0,0 +1,104 @@
+"""Versioned in-process cache for reference data (categories, rooms).
+
+Every cached key has a version document in the ``cache_versions`` collection.
+A write calls ``invalidate(key)``, which increments that document and drops
+the entry in this worker straight away. Other workers read all version
+documents in a single query every ``poll_seconds``. An entry whose version
+has moved is reloaded on its next read. Between polls, reads are served from
+memory without touching the database.
+
+Other in-process caches can tag their entries with ``version(key)`` and share
+the same invalidation, as the financial report's closed-month cache does with
+the ``ledger`` key.
+
+snapshot.py restore bumps every version, and rebuild_ledger.py and
+generate_data.py bump ``ledger``. Other writes that bypass the API stay
+invisible for at most ``max_age_seconds``.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceCache:
+    def __init__(self, versions, poll_seconds: float = 5.0, max_age_seconds: float = 300.0):
+        self.versions = versions
+        self.poll_seconds = poll_seconds
+        self.max_age_seconds = max_age_seconds
+        self.known: Dict[str, int] = {}
+        # key -> (version it was loaded at, monotonic load time, value)
+        self.entries: Dict[str, Tuple[int, float, Any]] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    def fresh(self, key: str) -> Optional[Tuple[int, float, Any]]:
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != self.known.get(key, 0):
+            return None
+        if time.monotonic() - entry[1] >= self.max_age_seconds:
+            return None
+        return entry
+
+    def version(self, key: str) -> int:
+        return self.known.get(key, 0)
+
+    async def get(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached value for ``key``, loading it with ``loader`` when missing or stale.
+
+        The value is shared by every caller; treat it as read-only.
+        """
+        entry = self.fresh(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[2]
+        # One load per key at a time; concurrent readers wait for it instead of stampeding Mongo
+        async with self.locks.setdefault(key, asyncio.Lock()):
+            entry = self.fresh(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            # Taken before loading: an invalidate() during the load leaves the entry stale
+            version = self.known.get(key, 0)
+            value = await loader()
+            self.entries[key] = (version, time.monotonic(), value)
+            return value
+
+    async def invalidate(self, key: str):
+        self.entries.pop(key, None)
+        await self.versions.update_one({"key": key}, {"$inc": {"version": 1}}, upsert=True)
+        doc = await self.versions.find_one({"key": key}, {"version": 1})
+        if doc:
+            self.known[key] = doc['version']
+
+    async def sync(self):
+        """Pick up version bumps made by other workers."""
+        for doc in await self.versions.find({}, {"key": 1, "version": 1}):
+            self.known[doc['key']] = doc['version']
+
+    async def start(self):
+        await self.sync()
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Reference cache version poll failed")
@@ -0,0 +1,762 @@
+"""Async repositories for the collections the API handlers read and write.
+
+Handlers go through ``Repositories`` instead of the Motor database, so the
+same code runs against ``MotorRepository`` (production) or
+``InMemoryRepository`` (tests and CPU-only benchmarks, no MongoDB needed).
+
+The repository surface mirrors the Motor calls the handlers already make,
+with ``_id`` always left out of returned documents. The in-memory backend
+implements the query, update and aggregation operators used in this code
+base, not all of MongoDB; anything else raises ``NotImplementedError``.
+"""
+import copy
+import re
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+COLLECTIONS = (
+    "users", "properties", "rooms", "tenants", "rentals", "bills", "maintenance", "transactions",
+    "categories", "ledger_monthly", "occupancy_monthly", "scheduler_runs",
+    "bills_archive", "transactions_archive", "cache_versions", "tombstones",
+)
+# Documents clients cache; writes stamp a rev and deletes leave tombstones so GET /sync can send deltas
+SYNCED_COLLECTIONS = (
+    "users", "properties", "rooms", "tenants", "rentals", "bills", "maintenance", "transactions", "categories"
+)
+
+
+def normalize_sort(sort) -> Optional[List[tuple]]:
+    if sort is None:
+        return None
+    if isinstance(sort, str):
+        return [(sort, 1)]
+    return list(sort)
+
+
+class Repository:
+    """Interface shared by the Motor and in-memory backends."""
+
+    async def find_one(self, query: dict, projection: Optional[dict] = None, sort=None) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def find(self, query: Optional[dict] = None, projection: Optional[dict] = None,
+                   sort=None, limit: int = 0) -> List[dict]:
+        raise NotImplementedError
+
+    def iterate(self, query: Optional[dict] = None, projection: Optional[dict] = None,
+                sort=None, batch_size: Optional[int] = None) -> AsyncIterator[dict]:
+        raise NotImplementedError
+
+    async def insert_one(self, doc: dict):
+        raise NotImplementedError
+
+    async def insert_many(self, docs: List[dict]):
+        raise NotImplementedError
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False) -> int:
+        """Returns the number of matched documents."""
+        raise NotImplementedError
+
+    async def update_many(self, query: dict, update: dict) -> int:
+        raise NotImplementedError
+
+    async def replace_one(self, query: dict, doc: dict, upsert: bool = False) -> int:
+        raise NotImplementedError
+
+    async def delete_one(self, query: dict) -> int:
+        """Returns the number of deleted documents."""
+        raise NotImplementedError
+
+    async def delete_many(self, query: dict) -> int:
+        raise NotImplementedError
+
+    async def count(self, query: Optional[dict] = None) -> int:
+        raise NotImplementedError
+
+    async def aggregate(self, pipeline: List[dict]) -> List[dict]:
+        raise NotImplementedError
+
+    async def create_index(self, keys, **options):
+        raise NotImplementedError
+
+
+# ==================== MOTOR ====================
+
+class MotorRepository(Repository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    @staticmethod
+    def projection(projection: Optional[dict]) -> dict:
+        return {"_id": 0, **(projection or {})}
+
+    def cursor(self, query, projection, sort, limit=0):
+        cursor = self.collection.find(query or {}, self.projection(projection))
+        if sort:
+            cursor = cursor.sort(normalize_sort(sort))
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    async def find_one(self, query, projection=None, sort=None):
+        return await self.collection.find_one(query, self.projection(projection), sort=normalize_sort(sort))
+
+    async def find(self, query=None, projection=None, sort=None, limit=0):
+        return await self.cursor(query, projection, sort, limit).to_list(limit or None)
+
+    async def iterate(self, query=None, projection=None, sort=None, batch_size=None):
+        cursor = self.cursor(query, projection, sort)
+        if batch_size:
+            cursor = cursor.batch_size(batch_size)
+        async for doc in cursor:
+            yield doc
+
+    async def insert_one(self, doc):
+        await self.collection.insert_one(doc)
+        doc.pop("_id", None)
+
+    async def insert_many(self, docs):
+        if docs:
+            await self.collection.insert_many(docs)
+            for doc in docs:
+                doc.pop("_id", None)
+
+    async def update_one(self, query, update, upsert=False):
+        return (await self.collection.update_one(query, update, upsert=upsert)).matched_count
+
+    async def update_many(self, query, update):
+        return (await self.collection.update_many(query, update)).matched_count
+
+    async def replace_one(self, query, doc, upsert=False):
+        return (await self.collection.replace_one(query, doc, upsert=upsert)).matched_count
+
+    async def delete_one(self, query):
+        return (await self.collection.delete_one(query)).deleted_count
+
+    async def delete_many(self, query):
+        return (await self.collection.delete_many(query)).deleted_count
+
+    async def count(self, query=None):
+        return await self.collection.count_documents(query or {})
+
+    async def aggregate(self, pipeline):
+        return await self.collection.aggregate(pipeline).to_list(None)
+
+    async def create_index(self, keys, **options):
+        await self.collection.create_index(keys, **options)
+
+
+# ==================== IN-MEMORY ====================
+
+MISSING = object()
+
+
+def get_path(doc, path: str):
+    """Resolve a dotted path; like MongoDB, a path through an array maps over its elements."""
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, list):
+            value = [item.get(part, MISSING) if isinstance(item, dict) else MISSING for item in value]
+            value = [item for item in value if item is not MISSING]
+        elif isinstance(value, dict):
+            value = value.get(part, MISSING)
+        else:
+            return MISSING
+        if value is MISSING:
+            return MISSING
+    return value
+
+
+def set_path(doc: dict, path: str, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def unset_path(doc: dict, path: str):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def type_rank(value) -> int:
+    # MongoDB's BSON comparison order for the types this app stores
+    if value is None or value is MISSING:
+        return 0
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, list):
+        return 4
+    if isinstance(value, bool):
+        return 5
+    if isinstance(value, datetime):
+        return 6
+    return 7
+
+
+def sort_key(value):
+    rank = type_rank(value)
+    if rank == 0:
+        return (0, 0)
+    if rank in (3, 4):
+        return (rank, repr(value))
+    if rank == 6 and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (rank, value)
+
+
+def compare(left, right, op: str) -> bool:
+    if type_rank(left) != type_rank(right) or type_rank(left) == 0:
+        return False
+    left, right = sort_key(left)[1], sort_key(right)[1]
+    if op == "$gt":
+        return left > right
+    if op == "$gte":
+        return left >= right
+    if op == "$lt":
+        return left < right
+    return left <= right
+
+
+def values_equal(value, expected) -> bool:
+    if expected is None:
+        return value is None or value is MISSING
+    if isinstance(value, list) and not isinstance(expected, list):
+        return expected in value
+    return value is not MISSING and value == expected
+
+
+def match_operators(value, condition: dict) -> bool:
+    for op, operand in condition.items():
+        if op == "$eq":
+            ok = values_equal(value, operand)
+        elif op == "$ne":
+            ok = not values_equal(value, operand)
+        elif op == "$in":
+            ok = any(values_equal(value, item) for item in operand)
+        elif op == "$nin":
+            ok = not any(values_equal(value, item) for item in operand)
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            ok = compare(value, operand, op)
+        elif op == "$exists":
+            ok = (value is not MISSING) == bool(operand)
+        elif op == "$regex":
+            flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+            ok = isinstance(value, str) and re.search(operand, value, flags) is not None
+        elif op == "$options":
+            ok = True
+        else:
+            raise NotImplementedError(f"Query operator {op} is not supported in memory")
+        if not ok:
+            return False
+    return True
+
+
+def is_operator_dict(value) -> bool:
+    return isinstance(value, dict) and bool(value) and all(key.startswith("$") for key in value)
+
+
+def matches(doc: dict, query: dict, text_fields: tuple = ()) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, clause, text_fields) for clause in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, clause, text_fields) for clause in condition):
+                return False
+        elif key == "$text":
+            # Whole-word match on the text-indexed fields, like a text index without stemming
+            words = set(condition["$search"].lower().split())
+            text = " ".join(str(doc.get(f, "")) for f in text_fields).lower().split()
+            if not words & set(text):
+                return False
+        elif is_operator_dict(condition):
+            if not match_operators(get_path(doc, key), condition):
+                return False
+        elif not values_equal(get_path(doc, key), condition):
+            return False
+    return True
+
+
+class InMemoryRepository(Repository):
+    """Documents in a dict keyed by insertion sequence, with hash indexes on indexed fields."""
+
+    def __init__(self, name: str, registry: Dict[str, "InMemoryRepository"]):
+        self.name = name
+        self.registry = registry
+        self.docs: Dict[int, dict] = {}
+        self.sequence = 0
+        self.indexes: Dict[str, Dict[object, set]] = {"id": {}}
+        self.unique_indexes: List[tuple] = []
+        self.text_fields: tuple = ()
+
+    # ---------- indexes ----------
+
+    @staticmethod
+    def index_key(value):
+        if isinstance(value, (dict, list)):
+            return repr(value)
+        return value
+
+    def index_add(self, seq: int, doc: dict):
+        for field, index in self.indexes.items():
+            value = doc.get(field)
+            index.setdefault(self.index_key(value), set()).add(seq)
+
+    def index_remove(self, seq: int, doc: dict):
+        for field, index in self.indexes.items():
+            bucket = index.get(self.index_key(doc.get(field)))
+            if bucket is not None:
+                bucket.discard(seq)
+
+    def check_unique(self, doc: dict, ignore_seq: Optional[int] = None):
+        for fields in self.unique_indexes:
+            key = tuple(doc.get(f) for f in fields)
+            for seq, other in self.docs.items():
+                if seq != ignore_seq and tuple(other.get(f) for f in fields) == key:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {fields}")
+
+    async def create_index(self, keys, **options):
+        keys = normalize_sort(keys)
+        if any(direction == "text" for _, direction in keys):
+            self.text_fields = tuple(field for field, direction in keys if direction == "text")
+            return
+        fields = tuple(field for field, _ in keys)
+        if options.get("unique") and fields not in self.unique_indexes:
+            self.unique_indexes.append(fields)
+        # Hash indexes cannot serve compound keys, so every field of the index gets its own
+        for field in fields:
+            if field not in self.indexes:
+                self.indexes[field] = {}
+                for seq, doc in self.docs.items():
+                    self.indexes[field].setdefault(self.index_key(doc.get(field)), set()).add(seq)
+
+    # ---------- matching ----------
+
+    def candidates(self, query: dict):
+        """Sequence numbers worth matching, narrowed by the most selective usable hash index."""
+        best = None
+        for field, index in self.indexes.items():
+            condition = query.get(field, MISSING)
+            if condition is MISSING:
+                continue
+            if is_operator_dict(condition):
+                if set(condition) != {"$in"}:
+                    continue
+                seqs = set()
+                for value in condition["$in"]:
+                    seqs |= index.get(self.index_key(value), set())
+            elif condition is None or isinstance(condition, (dict, list)):
+                continue
+            else:
+                seqs = index.get(self.index_key(condition), set())
+            if best is None or len(seqs) < len(best):
+                best = seqs
+        return list(self.docs) if best is None else sorted(best)
+
+    def matching(self, query: Optional[dict]) -> List[tuple]:
+        query = query or {}
+        return [(seq, self.docs[seq]) for seq in self.candidates(query)
+                if matches(self.docs[seq], query, self.text_fields)]
+
+    # ---------- reads ----------
+
+    @staticmethod
+    def project(doc: dict, projection: Optional[dict]) -> dict:
+        fields = {k: v for k, v in (projection or {}).items() if k != "_id" and not isinstance(v, dict)}
+        if not fields:
+            return copy.deepcopy(doc)
+        if any(fields.values()):
+            return {k: copy.deepcopy(doc[k]) for k in fields if fields[k] and k in doc}
+        return {k: copy.deepcopy(v) for k, v in doc.items() if k not in fields}
+
+    @staticmethod
+    def sorted_docs(docs: List[dict], sort) -> List[dict]:
+        for field, direction in reversed(normalize_sort(sort) or []):
+            if isinstance(direction, dict):
+                continue  # {"$meta": "textScore"}: keep match order
+            docs = sorted(docs, key=lambda d: sort_key(get_path(d, field)), reverse=direction == -1)
+        return docs
+
+    def select(self, query, sort, limit) -> List[dict]:
+        docs = self.sorted_docs([doc for _, doc in self.matching(query)], sort)
+        return docs[:limit] if limit else docs
+
+    async def find_one(self, query, projection=None, sort=None):
+        docs = self.select(query, sort, 1)
+        return self.project(docs[0], projection) if docs else None
+
+    async def find(self, query=None, projection=None, sort=None, limit=0):
+        return [self.project(doc, projection) for doc in self.select(query, sort, limit)]
+
+    async def iterate(self, query=None, projection=None, sort=None, batch_size=None):
+        for doc in self.select(query, sort, 0):
+            yield self.project(doc, projection)
+
+    async def count(self, query=None):
+        return len(self.matching(query))
+
+    # ---------- writes ----------
+
+    def store(self, doc: dict):
+        doc = copy.deepcopy(doc)
+        doc.pop("_id", None)
+        self.check_unique(doc)
+        self.sequence += 1
+        self.docs[self.sequence] = doc
+        self.index_add(self.sequence, doc)
+
+    async def insert_one(self, doc):
+        self.store(doc)
+
+    async def insert_many(self, docs):
+        for doc in docs:
+            self.store(doc)
+
+    @staticmethod
+    def apply_update(doc: dict, update: dict, inserting: bool = False):
+        for op, fields in update.items():
+            for path, value in fields.items():
+                if op == "$set" or (op == "$setOnInsert" and inserting):
+                    set_path(doc, path, copy.deepcopy(value))
+                elif op == "$inc":
+                    current = get_path(doc, path)
+                    set_path(doc, path, (0 if current is MISSING or current is None else current) + value)
+                elif op == "$unset":
+                    unset_path(doc, path)
+                elif op != "$setOnInsert":
+                    raise NotImplementedError(f"Update operator {op} is not supported in memory")
+
+    @staticmethod
+    def upsert_base(query: dict) -> dict:
+        return {k: copy.deepcopy(v) for k, v in query.items() if not k.startswith("$") and not is_operator_dict(v)}
+
+    def modify(self, seq: int, new_doc: dict):
+        self.check_unique(new_doc, ignore_seq=seq)
+        self.index_remove(seq, self.docs[seq])
+        self.docs[seq] = new_doc
+        self.index_add(seq, new_doc)
+
+    async def update_one(self, query, update, upsert=False):
+        matched = self.matching(query)
+        if matched:
+            seq, doc = matched[0]
+            new_doc = copy.deepcopy(doc)
+            self.apply_update(new_doc, update)
+            self.modify(seq, new_doc)
+            return 1
+        if upsert:
+            doc = self.upsert_base(query)
+            self.apply_update(doc, update, inserting=True)
+            self.store(doc)
+        return 0
+
+    async def update_many(self, query, update):
+        matched = self.matching(query)
+        for seq, doc in matched:
+            new_doc = copy.deepcopy(doc)
+            self.apply_update(new_doc, update)
+            self.modify(seq, new_doc)
+        return len(matched)
+
+    async def replace_one(self, query, doc, upsert=False):
+        matched = self.matching(query)
+        if matched:
+            new_doc = copy.deepcopy(doc)
+            new_doc.pop("_id", None)
+            self.modify(matched[0][0], new_doc)
+            return 1
+        if upsert:
+            self.store(doc)
+        return 0
+
+    def remove(self, seq: int):
+        self.index_remove(seq, self.docs.pop(seq))
+
+    async def delete_one(self, query):
+        matched = self.matching(query)
+        if not matched:
+            return 0
+        self.remove(matched[0][0])
+        return 1
+
+    async def delete_many(self, query):
+        matched = self.matching(query)
+        for seq, _ in matched:
+            self.remove(seq)
+        return len(matched)
+
+    # ---------- aggregation ----------
+
+    async def aggregate(self, pipeline):
+        return run_pipeline([copy.deepcopy(doc) for _, doc in self.matching({})], pipeline, self.registry)
+
+
+def evaluate(expr, doc: dict):
+    """Evaluate the aggregation expressions used by the report pipelines."""
+    if isinstance(expr, str) and expr.startswith("$"):
+        value = get_path(doc, expr[1:])
+        return None if value is MISSING else value
+    if isinstance(expr, list):
+        return [evaluate(item, doc) for item in expr]
+    if not isinstance(expr, dict) or not expr:
+        return expr
+    if len(expr) != 1 or not next(iter(expr)).startswith("$"):
+        return {key: evaluate(value, doc) for key, value in expr.items()}
+
+    op, args = next(iter(expr.items()))
+    if op == "$dateFromParts":
+        parts = {key: evaluate(value, doc) for key, value in args.items()}
+        return datetime(parts["year"], parts.get("month", 1), parts.get("day", 1), tzinfo=timezone.utc)
+    if op == "$switch":
+        for branch in args["branches"]:
+            if evaluate(branch["case"], doc):
+                return evaluate(branch["then"], doc)
+        return evaluate(args.get("default"), doc)
+    if op == "$cond":
+        condition, then, otherwise = args
+        return evaluate(then, doc) if evaluate(condition, doc) else evaluate(otherwise, doc)
+
+    values = [evaluate(arg, doc) for arg in args] if isinstance(args, list) else [evaluate(args, doc)]
+    if op == "$subtract":
+        left, right = values
+        if isinstance(left, datetime):
+            return (sort_key(left)[1] - sort_key(right)[1]).total_seconds() * 1000
+        return left - right
+    if op == "$divide":
+        return values[0] / values[1]
+    if op == "$floor":
+        return float(int(values[0] // 1))
+    if op == "$eq":
+        return values[0] == values[1]
+    if op == "$ne":
+        return values[0] != values[1]
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        return compare(values[0], values[1], op)
+    if op == "$arrayElemAt":
+        array, index = values
+        return array[index] if isinstance(array, list) and -len(array) <= index < len(array) else None
+    raise NotImplementedError(f"Expression {op} is not supported in memory")
+
+
+def run_group(docs: List[dict], spec: dict) -> List[dict]:
+    groups: Dict[object, dict] = {}
+    for doc in docs:
+        key = evaluate(spec["_id"], doc)
+        group = groups.setdefault(repr(key), {"_id": key})
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (op, arg), = accumulator.items()
+            value = evaluate(arg, doc)
+            if op == "$sum":
+                group[field] = group.get(field, 0) + (value if isinstance(value, (int, float)) else 0)
+            elif op == "$first":
+                group.setdefault(field, value)
+            elif op == "$last":
+                group[field] = value
+            else:
+                raise NotImplementedError(f"Accumulator {op} is not supported in memory")
+    return list(groups.values())
+
+
+def run_project(doc: dict, spec: dict) -> dict:
+    inclusion = any(value not in (0, False) for key, value in spec.items() if key != "_id")
+    if not inclusion:
+        return {k: v for k, v in doc.items() if spec.get(k, 1) not in (0, False)}
+    result = {"_id": doc["_id"]} if "_id" in doc and spec.get("_id", 1) not in (0, False) else {}
+    for key, value in spec.items():
+        if key == "_id":
+            continue
+        if value in (1, True):
+            found = get_path(doc, key)
+            if found is not MISSING:
+                result[key] = found
+        else:
+            result[key] = evaluate(value, doc)
+    return result
+
+
+def run_pipeline(docs: List[dict], pipeline: List[dict], registry: Dict[str, InMemoryRepository]) -> List[dict]:
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            docs = [doc for doc in docs if matches(doc, spec)]
+        elif name == "$project":
+            docs = [run_project(doc, spec) for doc in docs]
+        elif name in ("$addFields", "$set"):
+            docs = [{**doc, **{key: evaluate(value, doc) for key, value in spec.items()}} for doc in docs]
+        elif name == "$group":
+            docs = run_group(docs, spec)
+        elif name == "$sort":
+            docs = InMemoryRepository.sorted_docs(docs, list(spec.items()))
+        elif name == "$limit":
+            docs = docs[:spec]
+        elif name == "$skip":
+            docs = docs[spec:]
+        elif name == "$unwind":
+            field = (spec if isinstance(spec, str) else spec["path"])[1:]
+            unwound = []
+            for doc in docs:
+                items = get_path(doc, field)
+                if isinstance(items, list):
+                    unwound.extend({**doc, field: item} for item in items)
+                elif items is not MISSING and items is not None:
+                    unwound.append(doc)
+            docs = unwound
+        elif name == "$lookup":
+            foreign = registry[spec["from"]]
+            for doc in docs:
+                local = get_path(doc, spec["localField"])
+                local = None if local is MISSING else local
+                doc[spec["as"]] = [
+                    copy.deepcopy(other) for _, other in foreign.matching({spec["foreignField"]: local})
+                ]
+        elif name == "$facet":
+            docs = [{key: run_pipeline([copy.deepcopy(d) for d in docs], sub, registry)
+                     for key, sub in spec.items()}]
+        else:
+            raise NotImplementedError(f"Aggregation stage {name} is not supported in memory")
+    return docs
+
+
+# ==================== REVISIONS ====================
+
+class RevisionClock:
+    """Microseconds since the epoch, bumped past the last value handed out so revisions only grow.
+
+    Revisions from different workers interleave by wall clock, which lets a sync
+    reader treat anything older than a few seconds as settled.
+    """
+
+    def __init__(self):
+        self.last = 0
+
+    def next(self) -> int:
+        self.last = max(self.last + 1, time.time_ns() // 1000)
+        return self.last
+
+
+class RevisionedRepository(Repository):
+    """Stamps ``rev`` on every written document and records a tombstone for every deleted one."""
+
+    def __init__(self, name: str, inner: Repository, tombstones: Repository, clock: RevisionClock):
+        self.name = name
+        self.inner = inner
+        self.tombstones = tombstones
+        self.clock = clock
+
+    def stamp(self, update):
+        if isinstance(update, list):
+            return update + [{"$set": {"rev": self.clock.next()}}]
+        if set(update) == {"$setOnInsert"}:
+            # An upsert that only seeds a missing document changes nothing when it matches
+            return {"$setOnInsert": {**update["$setOnInsert"], "rev": self.clock.next()}}
+        return {**update, "$set": {**update.get("$set", {}), "rev": self.clock.next()}}
+
+    async def record_deleted(self, docs: List[dict]):
+        deleted_at = datetime.now(timezone.utc)
+        await self.tombstones.insert_many([
+            {"collection": self.name, "id": doc['id'], "property_id": doc.get('property_id'),
+             "rev": self.clock.next(), "deleted_at": deleted_at}
+            for doc in docs
+        ])
+
+    async def find_one(self, query, projection=None, sort=None):
+        return await self.inner.find_one(query, projection, sort=sort)
+
+    async def find(self, query=None, projection=None, sort=None, limit=0):
+        return await self.inner.find(query, projection, sort=sort, limit=limit)
+
+    def iterate(self, query=None, projection=None, sort=None, batch_size=None):
+        return self.inner.iterate(query, projection, sort=sort, batch_size=batch_size)
+
+    async def insert_one(self, doc):
+        doc['rev'] = self.clock.next()
+        await self.inner.insert_one(doc)
+
+    async def insert_many(self, docs):
+        for doc in docs:
+            doc['rev'] = self.clock.next()
+        await self.inner.insert_many(docs)
+
+    async def update_one(self, query, update, upsert=False):
+        return await self.inner.update_one(query, self.stamp(update), upsert=upsert)
+
+    async def update_many(self, query, update):
+        return await self.inner.update_many(query, self.stamp(update))
+
+    async def replace_one(self, query, doc, upsert=False):
+        return await self.inner.replace_one(query, {**doc, "rev": self.clock.next()}, upsert=upsert)
+
+    async def delete_one(self, query):
+        doc = await self.inner.find_one(query, {"id": 1, "property_id": 1})
+        if doc is None or not await self.inner.delete_one({"id": doc['id']}):
+            return 0
+        await self.record_deleted([doc])
+        return 1
+
+    async def delete_many(self, query):
+        docs = await self.inner.find(query, {"id": 1, "property_id": 1})
+        if not docs:
+            return 0
+        # Only the documents read above are deleted, so each one gets its tombstone
+        deleted = await self.inner.delete_many({"id": {"$in": [doc['id'] for doc in docs]}})
+        await self.record_deleted(docs)
+        return deleted
+
+    async def count(self, query=None):
+        return await self.inner.count(query)
+
+    async def aggregate(self, pipeline):
+        return await self.inner.aggregate(pipeline)
+
+    async def create_index(self, keys, **options):
+        await self.inner.create_index(keys, **options)
+
+
+# ==================== REGISTRY ====================
+
+class Repositories:
+    """One repository per collection, reachable as attributes (``repos.bills``)."""
+
+    def __init__(self, repositories: Dict[str, Repository]):
+        # A copy: wrapping an entry must not change the registry in-memory $lookup stages resolve against
+        self.all = dict(repositories)
+        for name, repository in repositories.items():
+            setattr(self, name, repository)
+
+    def track_revisions(self, names, clock: Optional[RevisionClock] = None) -> RevisionClock:
+        """Wrap ``names`` in RevisionedRepository, writing their tombstones to ``tombstones``."""
+        clock = clock or RevisionClock()
+        for name in names:
+            self.all[name] = RevisionedRepository(name, self.all[name], self.all["tombstones"], clock)
+            setattr(self, name, self.all[name])
+        return clock
+
+    def untracked(self, name: str) -> Repository:
+        """``name`` without revision stamps or tombstones, for writes sync clients must not see as changes."""
+        repository = self.all[name]
+        return repository.inner if isinstance(repository, RevisionedRepository) else repository
+
+    @classmethod
+    def motor(cls, db) -> "Repositories":
+        return cls({name: MotorRepository(db[name]) for name in COLLECTIONS})
+
+    @classmethod
+    def in_memory(cls) -> "Repositories":
+        registry: Dict[str, InMemoryRepository] = {}
+        for name in COLLECTIONS:
+            registry[name] = InMemoryRepository(name, registry)
+        return cls(registry)
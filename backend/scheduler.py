@@ -0,0 +1,206 @@
+"""Asyncio scheduler for periodic jobs, safe to run in every worker.
+
+Schedules are written as ``daily@HH:MM`` or ``monthly@D HH:MM`` (UTC). Each
+due slot is executed at most once across all workers: a worker must first
+take the job's lease document (``scheduler_leases``, expired via TTL), then
+claim the slot in ``scheduler_runs``, whose unique (job, run_key) index
+rejects a second claim. Runs that were missed while no worker was up are
+caught up on the next tick.
+
+A failed run is retried on later ticks with exponential backoff, each attempt
+under its own run key (``<slot>``, ``<slot>:attempt2``, ...), until
+``max_attempts`` runs of the slot have failed.
+"""
+import asyncio
+import logging
+import os
+import re
+import socket
+import uuid
+from calendar import monthrange
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+def parse_schedule(spec: str) -> Callable[[datetime], datetime]:
+    """Return a function giving the most recent due slot at or before ``now``."""
+    kind, _, when = spec.partition("@")
+    if kind == "daily":
+        hour, minute = (int(x) for x in when.split(":"))
+
+        def last_slot(now: datetime) -> datetime:
+            slot = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            return slot if slot <= now else slot - timedelta(days=1)
+        return last_slot
+
+    if kind == "monthly":
+        day_part, time_part = when.split()
+        day = int(day_part)
+        hour, minute = (int(x) for x in time_part.split(":"))
+
+        def slot_in(tahun: int, bulan: int) -> datetime:
+            return datetime(tahun, bulan, min(day, monthrange(tahun, bulan)[1]), hour, minute, tzinfo=timezone.utc)
+
+        def last_slot(now: datetime) -> datetime:
+            slot = slot_in(now.year, now.month)
+            if slot <= now:
+                return slot
+            tahun, bulan = (now.year, now.month - 1) if now.month > 1 else (now.year - 1, 12)
+            return slot_in(tahun, bulan)
+        return last_slot
+
+    raise ValueError(f"Unknown schedule '{spec}'")
+
+
+class Job:
+    def __init__(self, name: str, schedule: str, func: Callable[[], Awaitable[Optional[dict]]]):
+        self.name = name
+        self.schedule = schedule
+        self.last_slot = parse_schedule(schedule)
+        self.func = func
+        self.handled_slot: Optional[datetime] = None
+
+
+class Scheduler:
+    def __init__(self, db, tick_seconds: int = 30, lease_seconds: int = 600,
+                 max_attempts: int = 5, retry_backoff_seconds: int = 60):
+        self.db = db
+        self.tick_seconds = tick_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.jobs: Dict[str, Job] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def add_job(self, name: str, schedule: str, func: Callable[[], Awaitable[Optional[dict]]]):
+        self.jobs[name] = Job(name, schedule, func)
+
+    async def start(self):
+        await self.db.scheduler_leases.create_index("expires_at", expireAfterSeconds=0)
+        await self.db.scheduler_runs.create_index([("job", 1), ("run_key", 1)], unique=True)
+        await self.db.scheduler_runs.create_index([("job", 1), ("started_at", -1)])
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def run(self):
+        while True:
+            for job in self.jobs.values():
+                try:
+                    await self.run_if_due(job)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("Scheduler tick failed for %s", job.name)
+            await asyncio.sleep(self.tick_seconds)
+
+    async def acquire_lease(self, job: Job) -> bool:
+        now = datetime.now(timezone.utc)
+        try:
+            await self.db.scheduler_leases.update_one(
+                {"_id": job.name, "$or": [{"expires_at": {"$lte": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def release_lease(self, job: Job):
+        await self.db.scheduler_leases.delete_one({"_id": job.name, "owner": self.owner})
+
+    async def run_if_due(self, job: Job, force: bool = False) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        slot = now if force else job.last_slot(now)
+        if not force and job.handled_slot == slot:
+            return None
+        if not await self.acquire_lease(job):
+            return None
+
+        try:
+            if force:
+                run_key = f"manual:{now.isoformat()}"
+            else:
+                run_key = await self.next_run_key(job, slot, now)
+                if run_key is None:
+                    return None
+            run = {
+                "id": str(uuid.uuid4()),
+                "job": job.name,
+                "run_key": run_key,
+                "owner": self.owner,
+                "status": "running",
+                "started_at": now.isoformat()
+            }
+            try:
+                await self.db.scheduler_runs.insert_one(run)
+            except DuplicateKeyError:
+                # Another worker claimed this attempt; the next tick sees its outcome
+                return None
+            run.pop("_id", None)
+
+            started = asyncio.get_running_loop().time()
+            update = {}
+            try:
+                update["result"] = await job.func()
+                update["status"] = "success"
+            except Exception as exc:
+                logger.exception("Scheduled job %s failed", job.name)
+                update["status"] = "failed"
+                update["error"] = str(exc)
+            update["finished_at"] = datetime.now(timezone.utc).isoformat()
+            update["duration_ms"] = round((asyncio.get_running_loop().time() - started) * 1000, 1)
+            await self.db.scheduler_runs.update_one({"job": job.name, "run_key": run_key}, {"$set": update})
+            # A failed slot stays unhandled so a later tick retries it
+            if not force and update["status"] == "success":
+                job.handled_slot = slot
+            run.update(update)
+            return run
+        finally:
+            await self.release_lease(job)
+
+    async def next_run_key(self, job: Job, slot: datetime, now: datetime) -> Optional[str]:
+        """Run key for the next attempt at ``slot``, or None when it succeeded, gave up, or is backing off."""
+        slot_key = slot.isoformat()
+        runs = await self.db.scheduler_runs.find(
+            {"job": job.name, "run_key": {"$regex": f"^{re.escape(slot_key)}"}},
+            {"_id": 0, "status": 1, "started_at": 1, "finished_at": 1}
+        ).sort("started_at", 1).to_list(None)
+        if any(run['status'] == "success" for run in runs):
+            job.handled_slot = slot
+            return None
+        attempts = len(runs)
+        if attempts >= self.max_attempts:
+            logger.error("Scheduled job %s gave up on slot %s after %d attempts", job.name, slot_key, attempts)
+            job.handled_slot = slot
+            return None
+        if attempts:
+            last = runs[-1]
+            if last['status'] == "running":
+                # Still within its lease: a worker is on it. Past the lease it crashed and counts as failed
+                started_at = datetime.fromisoformat(last['started_at'])
+                if now < started_at + timedelta(seconds=self.lease_seconds):
+                    return None
+            last_at = datetime.fromisoformat(last.get('finished_at') or last['started_at'])
+            if now < last_at + timedelta(seconds=self.retry_backoff_seconds * 2 ** (attempts - 1)):
+                return None
+            return f"{slot_key}:attempt{attempts + 1}"
+        return slot_key
+
+    def describe(self) -> List[dict]:
+        now = datetime.now(timezone.utc)
+        return [
+            {"job": job.name, "schedule": job.schedule, "last_slot": job.last_slot(now).isoformat()}
+            for job in self.jobs.values()
+        ]
@@ -0,0 +1,108 @@
+"""Response encoding for documents that come from our own collections.
+
+Stored documents were written from the API models, so read handlers hand them
+to ``DocumentResponse`` as they are. The usual path parses every date string
+into a datetime, lets FastAPI validate each row against ``response_model``,
+and encodes with the stdlib json encoder. That path is skipped here. Rows are
+only cut down to the model's fields, with static defaults filled in, and then
+encoded with orjson. FastAPI skips response validation for ``Response``
+instances, so ``response_model`` still documents the schema in OpenAPI.
+
+Clients that send ``Accept: application/msgpack`` get MessagePack when the
+optional ``msgpack`` package is installed. Set ``RESPONSE_VALIDATION=true``
+to validate every row with a cached ``TypeAdapter`` while developing.
+"""
+from datetime import datetime
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple, Type
+
+import orjson
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import PydanticUndefined
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+validate_responses = False
+
+
+def to_document(model: BaseModel) -> dict:
+    """``model_dump()`` with datetimes stored as ISO strings, the way every collection keeps them."""
+    doc = model.model_dump()
+    for key, value in doc.items():
+        if isinstance(value, datetime):
+            doc[key] = value.isoformat()
+    return doc
+
+
+@lru_cache(maxsize=None)
+def model_shape(model: Type[BaseModel]) -> Tuple[Tuple[str, ...], dict]:
+    """Field names of ``model`` and the static defaults used when a stored document lacks them."""
+    defaults = {
+        name: field.default
+        for name, field in model.model_fields.items()
+        if field.default is not PydanticUndefined
+    }
+    return tuple(model.model_fields), defaults
+
+
+def model_projection(model: Type[BaseModel]) -> dict:
+    """Projection that fetches only the fields the response model returns."""
+    fields, _ = model_shape(model)
+    return {field: 1 for field in fields}
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def shape_document(model: Type[BaseModel], doc: dict) -> dict:
+    fields, defaults = model_shape(model)
+    return {field: doc[field] if field in doc else defaults.get(field) for field in fields}
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+class DocumentResponse(Response):
+    """JSON or MessagePack response. The encoding is chosen from the Accept header when the response is sent."""
+
+    def __init__(self, content, status_code: int = 200, headers: Optional[dict] = None):
+        self.content = content
+        self.status_code = status_code
+        self.background = None
+        self.extra_headers = headers
+
+    async def __call__(self, scope, receive, send):
+        accept = Headers(scope=scope).get("accept", "")
+        if msgpack is not None and MSGPACK_MEDIA_TYPE in accept:
+            self.media_type = MSGPACK_MEDIA_TYPE
+            self.body = msgpack.packb(self.content, default=str)
+        else:
+            self.media_type = "application/json"
+            self.body = dumps(self.content)
+        self.init_headers(self.extra_headers)
+        self.headers.append("Vary", "Accept")
+        await super().__call__(scope, receive, send)
+
+
+def documents_response(model: Type[BaseModel], docs: Iterable[dict]) -> DocumentResponse:
+    rows = [shape_document(model, doc) for doc in docs]
+    if validate_responses:
+        list_adapter(model).validate_python(rows)
+    return DocumentResponse(rows)
+
+
+def document_response(model: Type[BaseModel], doc: dict) -> DocumentResponse:
+    row = shape_document(model, doc)
+    if validate_responses:
+        model.model_validate(row)
+    return DocumentResponse(row)
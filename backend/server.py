@@ -1,6 +1,6 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Query, Request, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse, PlainTextResponse, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -15,19 +15,83 @@ from datetime import datetime, timezone, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import shutil
+import csv
+import io
+import json
+import re
+import math
+import asyncio
+import zipfile
+import tempfile
+import multiprocessing
+from collections import deque, OrderedDict
+from contextlib import asynccontextmanager
+from urllib.parse import quote
+from concurrent.futures import ProcessPoolExecutor
 from calendar import monthrange
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import mm
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
+from occupancy import compute_month_occupancy
+from kwitansi import render_kwitansi, render_kwitansi_document, kwitansi_download_name
+from events import EventBus, MongoChangeStreamSource
+from scheduler import Scheduler
+from jobs import JobQueue
+from pool_stats import PoolStatsListener
+from metrics import MetricsMiddleware, DBCommandListener, registry as metrics_registry, request_end_hooks
+from slowlog import SlowLog
+from profiler import Profiler, ProfilerMiddleware
+from repositories import Repositories, SYNCED_COLLECTIONS
+from reference_cache import ReferenceCache
+from limiter import Limiter, MemoryBucketStore, MongoBucketStore, RateLimited, Overloaded, parse_rate
+import serialization
+from serialization import (
+    to_document, model_projection, shape_document, document_response, documents_response, DocumentResponse
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+from shared import (  # noqa: E402  (reads DEFAULT_PROPERTY_* from the .env loaded above)
+    DEFAULT_PROPERTY_ID, DEFAULT_PROPERTY_NAME, normalize_digits, normalize_phone, tenant_search_keys
+)
+
+def mongo_client_options() -> dict:
+    env_options = {
+        'maxPoolSize': 'MONGO_MAX_POOL_SIZE',
+        'minPoolSize': 'MONGO_MIN_POOL_SIZE',
+        'waitQueueTimeoutMS': 'MONGO_WAIT_QUEUE_TIMEOUT_MS',
+        'serverSelectionTimeoutMS': 'MONGO_SERVER_SELECTION_TIMEOUT_MS',
+        'connectTimeoutMS': 'MONGO_CONNECT_TIMEOUT_MS',
+        'socketTimeoutMS': 'MONGO_SOCKET_TIMEOUT_MS',
+    }
+    return {option: int(os.environ[name]) for option, name in env_options.items() if os.environ.get(name)}
+
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+pool_stats = PoolStatsListener()
+# Encoding replies to measure their size costs CPU on large lists; METRICS_DB_BYTES=false turns it off
+db_command_listener = DBCommandListener(measure_bytes=os.environ.get('METRICS_DB_BYTES', 'true').lower() == 'true')
+SLOW_LOG_ENABLED = os.environ.get('SLOW_LOG_ENABLED', 'true').lower() == 'true'
+# Validate rows against the response model before encoding; off in production, see serialization.py
+serialization.validate_responses = os.environ.get('RESPONSE_VALIDATION', 'false').lower() == 'true'
+slow_log = SlowLog(
+    client=None,
+    slow_request_ms=float(os.environ.get('SLOW_REQUEST_MS', '1000')),
+    slow_query_ms=float(os.environ.get('SLOW_QUERY_MS', '200')),
+    explain_sample_rate=float(os.environ.get('EXPLAIN_SAMPLE_RATE', '0.1')),
+    log_file=os.environ.get('SLOW_LOG_FILE')
+)
+event_listeners = [pool_stats, db_command_listener]
+if SLOW_LOG_ENABLED:
+    event_listeners.append(slow_log.listener)
+    request_end_hooks.append(slow_log.on_request_end)
+client = AsyncIOMotorClient(mongo_url, event_listeners=event_listeners, **mongo_client_options())
+slow_log.client = client
 db = client[os.environ['DB_NAME']]
 
+# "memory" keeps every collection in process (tests and CPU-only benchmarks); scheduler,
+# job queue and change stream still need MongoDB and are not started in that mode
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongo')
+repos = Repositories.in_memory() if STORAGE_BACKEND == "memory" else Repositories.motor(db)
+revision_clock = repos.track_revisions(SYNCED_COLLECTIONS)
+
 SECRET_KEY = os.environ.get('SECRET_KEY', 'siskosan-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 43200
@@ -37,7 +101,104 @@ security = HTTPBearer()
 UPLOADS_DIR = ROOT_DIR / "uploads"
 UPLOADS_DIR.mkdir(exist_ok=True)
 
-app = FastAPI()
+PROFILES_DIR = ROOT_DIR / "profiles"
+profiler = Profiler(PROFILES_DIR)
+
+READINESS_PING_TIMEOUT_SECONDS = 2
+indexes_ready = False
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '500'))
+
+# Settled bills and transactions older than this many months move to *_archive collections; 0 disables
+ARCHIVE_HORIZON_MONTHS = int(os.environ.get('ARCHIVE_HORIZON_MONTHS', '24'))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', '1000'))
+
+# Categories and rooms are served from memory; other workers' writes show up within the poll interval
+REFERENCE_CACHE_POLL_SECONDS = float(os.environ.get('REFERENCE_CACHE_POLL_SECONDS', '5'))
+REFERENCE_CACHE_MAX_AGE_SECONDS = float(os.environ.get('REFERENCE_CACHE_MAX_AGE_SECONDS', '300'))
+reference_cache = ReferenceCache(
+    repos.cache_versions,
+    poll_seconds=REFERENCE_CACHE_POLL_SECONDS,
+    max_age_seconds=REFERENCE_CACHE_MAX_AGE_SECONDS
+)
+
+SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', '1000'))
+# Revisions newer than this may belong to writes still in flight, so the returned cursor stays behind them
+SYNC_SETTLE_SECONDS = float(os.environ.get('SYNC_SETTLE_SECONDS', '5'))
+# Tombstones expire after this; a client whose cursor is older gets a full reset
+SYNC_TOMBSTONE_DAYS = int(os.environ.get('SYNC_TOMBSTONE_DAYS', '90'))
+
+EVENT_QUEUE_SIZE = int(os.environ.get('EVENT_QUEUE_SIZE', '100'))
+EVENT_KEEPALIVE_SECONDS = 15
+# "auto" uses a Mongo change stream when a replica set is available, "off" keeps events in-process
+EVENT_CHANGE_STREAM = os.environ.get('EVENT_CHANGE_STREAM', 'auto')
+event_bus = EventBus(queue_size=EVENT_QUEUE_SIZE)
+event_source: Optional[MongoChangeStreamSource] = None
+
+SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true'
+SCHEDULE_MONTHLY_BILLS = os.environ.get('SCHEDULE_MONTHLY_BILLS', 'monthly@1 00:05')
+SCHEDULE_OCCUPANCY_SNAPSHOT = os.environ.get('SCHEDULE_OCCUPANCY_SNAPSHOT', 'monthly@1 00:15')
+SCHEDULE_ARCHIVE = os.environ.get('SCHEDULE_ARCHIVE', 'monthly@2 01:00')
+# A failed slot is retried after 1, 2, 4, ... backoff periods, up to SCHEDULER_MAX_ATTEMPTS runs
+scheduler = Scheduler(
+    db,
+    max_attempts=int(os.environ.get('SCHEDULER_MAX_ATTEMPTS', '5')),
+    retry_backoff_seconds=int(os.environ.get('SCHEDULER_RETRY_BACKOFF_SECONDS', '60'))
+)
+
+KWITANSI_WORKERS = int(os.environ.get('KWITANSI_WORKERS', str(min(4, os.cpu_count() or 1))))
+KWITANSI_STREAM_CHUNK = 64 * 1024
+kwitansi_executor: Optional[ProcessPoolExecutor] = None
+
+# Token buckets per client IP and per user, "capacity/seconds" ("0" disables one); mongo shares them across workers
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMITS = {
+    ("login", "ip"): os.environ.get('RATE_LIMIT_LOGIN_IP', '20/60'),
+    ("login", "user"): os.environ.get('RATE_LIMIT_LOGIN_USER', '5/60'),
+    ("kwitansi", "ip"): os.environ.get('RATE_LIMIT_KWITANSI_IP', '120/60'),
+    ("kwitansi", "user"): os.environ.get('RATE_LIMIT_KWITANSI_USER', '60/60'),
+    ("generate_monthly", "ip"): os.environ.get('RATE_LIMIT_GENERATE_MONTHLY_IP', '10/60'),
+    ("generate_monthly", "user"): os.environ.get('RATE_LIMIT_GENERATE_MONTHLY_USER', '3/60'),
+}
+# Requests of a class running at once in this process; the rest wait up to LIMIT_QUEUE_TIMEOUT_SECONDS, then get 503
+CONCURRENCY_CAPS = {
+    "auth": int(os.environ.get('CONCURRENCY_AUTH', '4')),
+    "pdf": int(os.environ.get('CONCURRENCY_PDF', str(KWITANSI_WORKERS))),
+    "bulk": int(os.environ.get('CONCURRENCY_BULK', '1')),
+}
+LIMIT_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('LIMIT_QUEUE_TIMEOUT_SECONDS', '5'))
+use_mongo_buckets = RATE_LIMIT_BACKEND == "mongo" and STORAGE_BACKEND != "memory"
+limiter = Limiter(
+    MongoBucketStore(db.rate_limits) if use_mongo_buckets else MemoryBucketStore(),
+    on_decision=metrics_registry.observe_limiter
+)
+if RATE_LIMIT_ENABLED:
+    for (rule, scope), rate in RATE_LIMITS.items():
+        limiter.add_rate(rule, scope, parse_rate(rate))
+for route_class, cap in CONCURRENCY_CAPS.items():
+    limiter.add_cap(route_class, cap, LIMIT_QUEUE_TIMEOUT_SECONDS)
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+# Job output holds tenant details, so it lives outside the public /uploads mount and is only
+# served by the property-scoped download endpoint; it goes with the job record after the retention
+JOB_RESULTS_DIR = ROOT_DIR / "job_results"
+JOB_RESULTS_DIR.mkdir(exist_ok=True)
+JOB_RETENTION_HOURS = float(os.environ.get('JOB_RETENTION_HOURS', '24'))
+job_queue = JobQueue(
+    db, concurrency=JOB_WORKERS, results_dir=JOB_RESULTS_DIR, retention_seconds=int(JOB_RETENTION_HOURS * 3600)
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # STARTUP_STEPS and SHUTDOWN_STEPS sit with the handlers at the end of this file
+    for step in STARTUP_STEPS:
+        await step()
+    yield
+    for step in SHUTDOWN_STEPS:
+        await step()
+
+app = FastAPI(lifespan=lifespan)
 api_router = APIRouter(prefix="/api")
 
 app.mount("/uploads", StaticFiles(directory=str(UPLOADS_DIR)), name="uploads")
@@ -49,12 +210,17 @@ class User(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     email: EmailStr
     role: Literal["super_admin", "admin", "owner"]
+    property_ids: List[str] = []
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class UserCreate(BaseModel):
     email: EmailStr
     password: str
     role: Literal["super_admin", "admin", "owner"]
+    property_ids: List[str] = []
+
+class UserPropertiesUpdate(BaseModel):
+    property_ids: List[str]
 
 class UserLogin(BaseModel):
     email: EmailStr
@@ -65,9 +231,21 @@ class Token(BaseModel):
     token_type: str
     user: User
 
+class Property(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    nama: str
+    alamat: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class PropertyCreate(BaseModel):
+    nama: str
+    alamat: Optional[str] = None
+
 class Room(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    property_id: str
     nomor_kamar: str
     harga: float
     fasilitas: str
@@ -88,6 +266,7 @@ class RoomUpdate(BaseModel):
 class Tenant(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    property_id: str
     nama: str
     telepon: str
     email: Optional[str] = None
@@ -109,12 +288,19 @@ class TenantUpdate(BaseModel):
     ktp: Optional[str] = None
     alamat: Optional[str] = None
 
+class TenantSearchResult(BaseModel):
+    id: str
+    nama: str
+    telepon: str
+
 class Rental(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    property_id: str
     tenant_id: str
     room_id: str
     tanggal_mulai: datetime
+    tanggal_selesai: Optional[datetime] = None
     harga: float
     status: Literal["aktif", "selesai"] = "aktif"
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -129,6 +315,7 @@ class RentalCreate(BaseModel):
 class Bill(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    property_id: str
     rental_id: str
     bulan: int
     tahun: int
@@ -152,6 +339,7 @@ class BillCreate(BaseModel):
 class Maintenance(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    property_id: str
     lokasi: str
     room_id: Optional[str] = None
     deskripsi: str
@@ -174,6 +362,7 @@ class MaintenanceUpdate(BaseModel):
 class Transaction(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    property_id: str
     tipe: Literal["pemasukan", "pengeluaran"]
     jumlah: float
     sumber: str
@@ -197,6 +386,12 @@ class CategoryCreate(BaseModel):
     nama: str
     tipe: Literal["pemasukan", "pengeluaran", "both"]
 
+class ProfilerStart(BaseModel):
+    mode: Literal["cprofile", "sampler"] = "sampler"
+    path_pattern: str = "/api/*"
+    max_requests: Optional[int] = Field(default=10, ge=1)
+    duration_seconds: Optional[float] = Field(default=None, gt=0, le=3600)
+
 class DashboardStats(BaseModel):
     jumlah_kamar_terisi: int
     jumlah_kamar_kosong: int
@@ -221,14 +416,13 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_user_from_token(token: str) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
@@ -236,11 +430,14 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except JWTError:
         raise credentials_exception
     
-    user = await db.users.find_one({"email": email}, {"_id": 0})
+    user = await repos.users.find_one({"email": email})
     if user is None:
         raise credentials_exception
     return User(**user)
 
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await get_user_from_token(credentials.credentials)
+
 def require_admin(current_user: User = Depends(get_current_user)):
     if current_user.role not in ["admin", "super_admin"]:
         raise HTTPException(
@@ -257,47 +454,323 @@ def require_super_admin(current_user: User = Depends(get_current_user)):
         )
     return current_user
 
+def require_owner(current_user: User = Depends(get_current_user)):
+    if current_user.role not in ["owner", "super_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Owner access required"
+        )
+    return current_user
+
+async def get_property_id(
+    x_property_id: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
+) -> str:
+    """Property a request works on: the X-Property-Id header, else the user's first property."""
+    if current_user.role == "super_admin":
+        if x_property_id is None or x_property_id == DEFAULT_PROPERTY_ID:
+            return DEFAULT_PROPERTY_ID
+        if not await repos.properties.find_one({"id": x_property_id}, {"id": 1}):
+            raise HTTPException(status_code=404, detail="Properti tidak ditemukan")
+        return x_property_id
+    
+    if not current_user.property_ids:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Akun belum ditugaskan ke properti")
+    if x_property_id is None:
+        return current_user.property_ids[0]
+    if x_property_id not in current_user.property_ids:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Tidak punya akses ke properti ini")
+    return x_property_id
+
+# ==================== LIMITER HELPERS ====================
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+def retry_after_header(seconds: float) -> dict:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+async def enforce_rate_limit(rule: str, scope: str, client: str):
+    try:
+        await limiter.hit(rule, scope, client)
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Terlalu banyak permintaan, coba lagi nanti",
+            headers=retry_after_header(e.retry_after)
+        )
+
+def rate_limit_ip(rule: str):
+    async def dependency(request: Request):
+        await enforce_rate_limit(rule, "ip", client_ip(request))
+    return dependency
+
+def rate_limit_user(rule: str):
+    async def dependency(request: Request, current_user: User = Depends(get_current_user)):
+        await enforce_rate_limit(rule, "ip", client_ip(request))
+        await enforce_rate_limit(rule, "user", current_user.id)
+    return dependency
+
+def concurrency_cap(route_class: str):
+    """Holds a slot of ``route_class`` while the handler runs (not while a streamed body is sent)."""
+    async def dependency():
+        try:
+            async with limiter.slot(route_class):
+                yield
+        except Overloaded as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server sedang sibuk, coba lagi nanti",
+                headers=retry_after_header(e.retry_after)
+            )
+    return dependency
+
+# ==================== EXPORT HELPERS ====================
+
+TRANSACTION_EXPORT_FIELDS = ["id", "tanggal", "tipe", "kategori", "sumber", "jumlah"]
+BILL_EXPORT_FIELDS = [
+    "id", "rental_id", "bulan", "tahun", "tipe", "jumlah", "status",
+    "cara_bayar", "tanggal_bayar", "keterangan", "created_at"
+]
+
+def to_utc_iso(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+def period_range_query(dari: Optional[datetime], sampai: Optional[datetime]) -> dict:
+    """Filter bills by (tahun, bulan) period so it can use the tahun/bulan index."""
+    clauses = []
+    if dari:
+        clauses.append({"$or": [
+            {"tahun": {"$gt": dari.year}},
+            {"tahun": dari.year, "bulan": {"$gte": dari.month}}
+        ]})
+    if sampai:
+        clauses.append({"$or": [
+            {"tahun": {"$lt": sampai.year}},
+            {"tahun": sampai.year, "bulan": {"$lte": sampai.month}}
+        ]})
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+async def stream_export_rows(cursor, fields: List[str], export_format: str):
+    """Yield CSV or NDJSON chunks, one per EXPORT_BATCH_SIZE documents."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(fields)
+
+    count = 0
+    async for doc in cursor:
+        if export_format == "csv":
+            writer.writerow(["" if doc.get(f) is None else doc.get(f) for f in fields])
+        else:
+            buffer.write(json.dumps({f: doc.get(f) for f in fields}, default=str))
+            buffer.write("\n")
+        count += 1
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def export_response(cursor, fields: List[str], export_format: str, name: str):
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    extension = "csv" if export_format == "csv" else "ndjson"
+    return StreamingResponse(
+        stream_export_rows(cursor, fields, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'}
+    )
+
+# ==================== LEDGER HELPERS ====================
+
+async def record_transaction(transaction: Transaction):
+    """Insert a transaction and $inc its (tahun, bulan, tipe, kategori) rollup in ledger_monthly."""
+    doc = to_document(transaction)
+    await repos.transactions.insert_one(doc)
+
+    tanggal = transaction.tanggal.astimezone(timezone.utc)
+    await repos.ledger_monthly.update_one(
+        {
+            "property_id": transaction.property_id,
+            "tahun": tanggal.year,
+            "bulan": tanggal.month,
+            "tipe": transaction.tipe,
+            "kategori": transaction.kategori
+        },
+        {"$inc": {"total": transaction.jumlah, "jumlah_transaksi": 1}},
+        upsert=True
+    )
+    now = datetime.now(timezone.utc)
+    if (tanggal.year, tanggal.month) < (now.year, now.month):
+        # A back-dated transaction changes a closed month that report workers may have cached
+        await reference_cache.invalidate(LEDGER_CACHE_KEY)
+    return doc
+
+async def get_ledger_totals(property_id: str, tahun: int, bulan: int) -> dict:
+    totals = {"pemasukan": 0, "pengeluaran": 0}
+    rows = await repos.ledger_monthly.find({"property_id": property_id, "tahun": tahun, "bulan": bulan}, limit=1000)
+    for row in rows:
+        totals[row['tipe']] += row['total']
+    return totals
+
+# ==================== ARCHIVE HELPERS ====================
+
+def archive_cutoff(now: datetime) -> datetime:
+    """Start of the oldest month that stays in the hot collections."""
+    index = now.year * 12 + now.month - 1 - ARCHIVE_HORIZON_MONTHS
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+async def move_to_archive(name: str, query: dict) -> int:
+    """Copy matching documents to <name>_archive in batches, then delete them from <name>."""
+    hot, archive = repos.all[name], repos.all[f"{name}_archive"]
+    # Archived records still exist, so their removal from the hot side must not reach /sync as deletes
+    unrevisioned = repos.untracked(name)
+    moved = 0
+    while True:
+        batch = await hot.find(query, limit=ARCHIVE_BATCH_SIZE)
+        if not batch:
+            return moved
+        ids = [doc['id'] for doc in batch]
+        # Clearing the ids first makes a rerun after a crash between insert and delete safe
+        await archive.delete_many({"id": {"$in": ids}})
+        await archive.insert_many(batch)
+        await unrevisioned.delete_many({"id": {"$in": ids}})
+        moved += len(batch)
+
+async def archive_settled_records() -> dict:
+    """Archive paid bills and transactions older than the horizon.
+
+    Reports stay complete: the financial report reads ledger_monthly and occupancy reads
+    rentals, neither of which is archived.
+    """
+    cutoff = archive_cutoff(datetime.now(timezone.utc))
+    last_archived_month = cutoff - timedelta(days=1)
+    bills = await move_to_archive("bills", {"status": "lunas", **period_range_query(None, last_archived_month)})
+    transactions = await move_to_archive("transactions", {"tanggal": {"$lt": cutoff.isoformat()}})
+    return {"cutoff": cutoff.isoformat(), "bills": bills, "transactions": transactions}
+
+async def find_hot_and_archived(name: str, query: dict, projection: Optional[dict] = None, sort=None,
+                                limit: int = 0, include_archived: bool = False) -> List[dict]:
+    """Hot documents first; with include_archived, archived ones fill up to ``limit``."""
+    docs = await repos.all[name].find(query, projection, sort=sort, limit=limit)
+    if include_archived and (not limit or len(docs) < limit):
+        docs += await repos.all[f"{name}_archive"].find(
+            query, projection, sort=sort, limit=limit - len(docs) if limit else 0
+        )
+    return docs
+
+async def iterate_archived_then_hot(name: str, query: dict, projection: dict, sort,
+                                    include_archived: bool = False):
+    """Export cursor; archived rows come first since they are older than everything hot but unpaid bills."""
+    sources = [f"{name}_archive", name] if include_archived else [name]
+    for source in sources:
+        async for doc in repos.all[source].iterate(query, projection, sort=sort, batch_size=EXPORT_BATCH_SIZE):
+            yield doc
+
+async def find_one_hot_or_archived(name: str, query: dict) -> Optional[dict]:
+    return await repos.all[name].find_one(query) or await repos.all[f"{name}_archive"].find_one(query)
+
+# ==================== TENANT SEARCH HELPERS ====================
+
+TENANT_SEARCH_LIMIT = 10
+
+async def backfill_tenant_search_keys():
+    async for tenant in repos.tenants.iterate({"nama_norm": {"$exists": False}}):
+        await repos.tenants.update_one({"id": tenant['id']}, {"$set": tenant_search_keys(tenant)})
+
+async def backfill_revisions():
+    """Give documents written before revisions existed (or by scripts) a rev so /sync can page them."""
+    for name in SYNCED_COLLECTIONS:
+        await repos.all[name].update_many({"rev": {"$exists": False}}, {})
+
+# ==================== REFERENCE CACHE HELPERS ====================
+
+CATEGORY_TIPES = ("pemasukan", "pengeluaran", "both")
+
+def rooms_cache_key(property_id: str) -> str:
+    return f"rooms:{property_id}"
+
+async def cached_rooms(property_id: str) -> List[dict]:
+    """Rooms of a property; invalidated by the room CRUD and by rentals changing a room's status."""
+    async def load():
+        return await repos.rooms.find({"property_id": property_id}, model_projection(Room), limit=1000)
+    return await reference_cache.get(rooms_cache_key(property_id), load)
+
+async def cached_categories() -> dict:
+    """Category rows per GET /categories ``tipe`` filter, precomputed; the None key holds all of them."""
+    async def load():
+        categories = await repos.categories.find({}, model_projection(Category), limit=1000)
+        by_tipe = {None: categories}
+        for tipe in CATEGORY_TIPES:
+            by_tipe[tipe] = [c for c in categories if c['tipe'] in (tipe, "both")]
+        return by_tipe
+    return await reference_cache.get("categories", load)
+
 # ==================== AUTH ENDPOINTS ====================
 
 @api_router.post("/auth/register", response_model=User)
 async def register(user_input: UserCreate, current_user: User = Depends(require_super_admin)):
-    existing_user = await db.users.find_one({"email": user_input.email}, {"_id": 0})
+    existing_user = await repos.users.find_one({"email": user_input.email})
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
+    property_ids = user_input.property_ids
+    if user_input.role != "super_admin":
+        property_ids = property_ids or [DEFAULT_PROPERTY_ID]
+        await check_properties_exist(property_ids)
+    
     hashed_password = get_password_hash(user_input.password)
     user_dict = user_input.model_dump()
-    user_obj = User(email=user_dict["email"], role=user_dict["role"])
+    user_obj = User(email=user_dict["email"], role=user_dict["role"], property_ids=property_ids)
     
-    doc = user_obj.model_dump()
+    doc = to_document(user_obj)
     doc['password'] = hashed_password
-    doc['created_at'] = doc['created_at'].isoformat()
     
-    await db.users.insert_one(doc)
-    return user_obj
+    await repos.users.insert_one(doc)
+    return document_response(User, doc)
 
 @api_router.get("/users", response_model=List[User])
 async def get_users(current_user: User = Depends(require_super_admin)):
-    users = await db.users.find({}, {"_id": 0, "password": 0}).to_list(1000)
-    for user in users:
-        if isinstance(user['created_at'], str):
-            user['created_at'] = datetime.fromisoformat(user['created_at'])
-    return users
+    users = await repos.users.find({}, model_projection(User), limit=1000)
+    return documents_response(User, users)
+
+@api_router.put("/users/{user_id}/properties", response_model=User)
+async def update_user_properties(
+    user_id: str,
+    properties_input: UserPropertiesUpdate,
+    current_user: User = Depends(require_super_admin)
+):
+    await check_properties_exist(properties_input.property_ids)
+    if await repos.users.update_one({"id": user_id}, {"$set": {"property_ids": properties_input.property_ids}}) == 0:
+        raise HTTPException(status_code=404, detail="User not found")
+    return document_response(User, await repos.users.find_one({"id": user_id}))
 
 @api_router.delete("/users/{user_id}")
 async def delete_user(user_id: str, current_user: User = Depends(require_super_admin)):
     if user_id == current_user.id:
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
     
-    result = await db.users.delete_one({"id": user_id})
-    if result.deleted_count == 0:
+    if await repos.users.delete_one({"id": user_id}) == 0:
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": "User deleted successfully"}
 
-@api_router.post("/auth/login", response_model=Token)
-async def login(user_input: UserLogin):
-    user = await db.users.find_one({"email": user_input.email}, {"_id": 0})
-    if not user or not verify_password(user_input.password, user['password']):
+@api_router.post(
+    "/auth/login", response_model=Token,
+    dependencies=[Depends(rate_limit_ip("login")), Depends(concurrency_cap("auth"))]
+)
+async def login(user_input: UserLogin, request: Request):
+    # Per account from each address: a guessing run is throttled, but flooding someone's email
+    # from one address does not lock them out of logging in from their own
+    await enforce_rate_limit("login", "user", f"{client_ip(request)}:{user_input.email.lower()}")
+    user = await repos.users.find_one({"email": user_input.email})
+    # bcrypt releases the GIL, so hashing in a thread keeps the event loop serving other requests
+    if not user or not await asyncio.to_thread(verify_password, user_input.password, user['password']):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -311,297 +784,381 @@ async def login(user_input: UserLogin):
 async def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
+# ==================== PROPERTY ENDPOINTS ====================
+
+async def check_properties_exist(property_ids: List[str]):
+    found = await repos.properties.count({"id": {"$in": property_ids}})
+    if found != len(set(property_ids)):
+        raise HTTPException(status_code=400, detail="Properti tidak ditemukan")
+
+async def ensure_default_property():
+    await repos.properties.update_one(
+        {"id": DEFAULT_PROPERTY_ID},
+        {"$setOnInsert": to_document(Property(id=DEFAULT_PROPERTY_ID, nama=DEFAULT_PROPERTY_NAME))},
+        upsert=True
+    )
+
+@api_router.post("/properties", response_model=Property)
+async def create_property(property_input: PropertyCreate, current_user: User = Depends(require_super_admin)):
+    property_obj = Property(**property_input.model_dump())
+    doc = to_document(property_obj)
+    await repos.properties.insert_one(doc)
+    return document_response(Property, doc)
+
+@api_router.get("/properties", response_model=List[Property])
+async def get_properties(current_user: User = Depends(get_current_user)):
+    query = {} if current_user.role == "super_admin" else {"id": {"$in": current_user.property_ids}}
+    properties = await repos.properties.find(query, model_projection(Property), sort="nama", limit=1000)
+    return documents_response(Property, properties)
+
 # ==================== ROOM ENDPOINTS ====================
 
 @api_router.post("/rooms", response_model=Room)
-async def create_room(room_input: RoomCreate, current_user: User = Depends(require_admin)):
-    existing = await db.rooms.find_one({"nomor_kamar": room_input.nomor_kamar}, {"_id": 0})
+async def create_room(room_input: RoomCreate, current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)):
+    existing = await repos.rooms.find_one({"property_id": property_id, "nomor_kamar": room_input.nomor_kamar})
     if existing:
         raise HTTPException(status_code=400, detail="Nomor kamar sudah ada")
     
     room_dict = room_input.model_dump()
-    room_obj = Room(**room_dict)
-    doc = room_obj.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
+    room_obj = Room(**room_dict, property_id=property_id)
+    doc = to_document(room_obj)
     
-    await db.rooms.insert_one(doc)
-    return room_obj
+    await repos.rooms.insert_one(doc)
+    await reference_cache.invalidate(rooms_cache_key(property_id))
+    return document_response(Room, doc)
 
 @api_router.get("/rooms", response_model=List[Room])
-async def get_rooms(current_user: User = Depends(get_current_user)):
-    rooms = await db.rooms.find({}, {"_id": 0}).to_list(1000)
-    for room in rooms:
-        if isinstance(room['created_at'], str):
-            room['created_at'] = datetime.fromisoformat(room['created_at'])
-    return rooms
+async def get_rooms(current_user: User = Depends(get_current_user), property_id: str = Depends(get_property_id)):
+    return documents_response(Room, await cached_rooms(property_id))
 
 @api_router.get("/rooms/{room_id}", response_model=Room)
-async def get_room(room_id: str, current_user: User = Depends(get_current_user)):
-    room = await db.rooms.find_one({"id": room_id}, {"_id": 0})
+async def get_room(room_id: str, current_user: User = Depends(get_current_user), property_id: str = Depends(get_property_id)):
+    room = await repos.rooms.find_one({"id": room_id, "property_id": property_id})
     if not room:
         raise HTTPException(status_code=404, detail="Kamar tidak ditemukan")
-    if isinstance(room['created_at'], str):
-        room['created_at'] = datetime.fromisoformat(room['created_at'])
-    return Room(**room)
+    return document_response(Room, room)
 
 @api_router.put("/rooms/{room_id}", response_model=Room)
-async def update_room(room_id: str, room_input: RoomUpdate, current_user: User = Depends(require_admin)):
-    room = await db.rooms.find_one({"id": room_id}, {"_id": 0})
+async def update_room(
+    room_id: str, room_input: RoomUpdate, current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)
+):
+    room = await repos.rooms.find_one({"id": room_id, "property_id": property_id})
     if not room:
         raise HTTPException(status_code=404, detail="Kamar tidak ditemukan")
     
     update_data = {k: v for k, v in room_input.model_dump().items() if v is not None}
     if update_data:
-        await db.rooms.update_one({"id": room_id}, {"$set": update_data})
+        await repos.rooms.update_one({"id": room_id}, {"$set": update_data})
+        await reference_cache.invalidate(rooms_cache_key(property_id))
     
-    updated_room = await db.rooms.find_one({"id": room_id}, {"_id": 0})
-    if isinstance(updated_room['created_at'], str):
-        updated_room['created_at'] = datetime.fromisoformat(updated_room['created_at'])
-    return Room(**updated_room)
+    updated_room = await repos.rooms.find_one({"id": room_id})
+    return document_response(Room, updated_room)
 
 @api_router.delete("/rooms/{room_id}")
-async def delete_room(room_id: str, current_user: User = Depends(require_admin)):
-    active_rental = await db.rentals.find_one({"room_id": room_id, "status": "aktif"}, {"_id": 0})
+async def delete_room(room_id: str, current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)):
+    active_rental = await repos.rentals.find_one({"room_id": room_id, "property_id": property_id, "status": "aktif"})
     if active_rental:
         raise HTTPException(status_code=400, detail="Tidak bisa hapus kamar yang sedang disewa")
     
-    result = await db.rooms.delete_one({"id": room_id})
-    if result.deleted_count == 0:
+    if await repos.rooms.delete_one({"id": room_id, "property_id": property_id}) == 0:
         raise HTTPException(status_code=404, detail="Kamar tidak ditemukan")
+    await reference_cache.invalidate(rooms_cache_key(property_id))
     return {"message": "Kamar berhasil dihapus"}
 
 # ==================== TENANT ENDPOINTS ====================
 
 @api_router.post("/tenants", response_model=Tenant)
-async def create_tenant(tenant_input: TenantCreate, current_user: User = Depends(require_admin)):
+async def create_tenant(tenant_input: TenantCreate, current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)):
     tenant_dict = tenant_input.model_dump()
-    tenant_obj = Tenant(**tenant_dict)
-    doc = tenant_obj.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
+    tenant_obj = Tenant(**tenant_dict, property_id=property_id)
+    doc = to_document(tenant_obj)
+    doc.update(tenant_search_keys(doc))
     
-    await db.tenants.insert_one(doc)
-    return tenant_obj
+    await repos.tenants.insert_one(doc)
+    return document_response(Tenant, doc)
 
 @api_router.get("/tenants", response_model=List[Tenant])
-async def get_tenants(current_user: User = Depends(get_current_user)):
-    tenants = await db.tenants.find({}, {"_id": 0}).to_list(1000)
-    for tenant in tenants:
-        if isinstance(tenant['created_at'], str):
-            tenant['created_at'] = datetime.fromisoformat(tenant['created_at'])
-    return tenants
+async def get_tenants(current_user: User = Depends(get_current_user), property_id: str = Depends(get_property_id)):
+    tenants = await repos.tenants.find({"property_id": property_id}, model_projection(Tenant), limit=1000)
+    return documents_response(Tenant, tenants)
+
+@api_router.get("/tenants/search", response_model=List[TenantSearchResult])
+async def search_tenants(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(TENANT_SEARCH_LIMIT, ge=1, le=50),
+    current_user: User = Depends(get_current_user),
+    property_id: str = Depends(get_property_id)
+):
+    projection = {"_id": 0, "id": 1, "nama": 1, "telepon": 1}
+    digits = normalize_digits(q)
+    
+    # Numeric input is a phone or KTP prefix; anchored regexes on the normalized keys use their indexes
+    if digits and not re.search(r"[^\d\s+\-]", q):
+        phone_prefix = re.escape(normalize_phone(q))
+        query = {"property_id": property_id, "$or": [
+            {"telepon_norm": {"$regex": f"^{phone_prefix}"}},
+            {"ktp_norm": {"$regex": f"^{re.escape(digits)}"}}
+        ]}
+        return documents_response(TenantSearchResult, await repos.tenants.find(query, projection, limit=limit))
+    
+    nama_prefix = re.escape(" ".join(q.lower().split()))
+    results = await repos.tenants.find(
+        {"property_id": property_id, "nama_norm": {"$regex": f"^{nama_prefix}"}}, projection,
+        sort="nama_norm", limit=limit
+    )
+    
+    if len(results) < limit:
+        # Fall back to whole-word matches anywhere in the name via the text index
+        seen = {t['id'] for t in results}
+        text_matches = await repos.tenants.find(
+            {"property_id": property_id, "$text": {"$search": q}}, {**projection, "score": {"$meta": "textScore"}},
+            sort=[("score", {"$meta": "textScore"})], limit=limit
+        )
+        for tenant in text_matches:
+            if tenant['id'] not in seen and len(results) < limit:
+                tenant.pop("score", None)
+                results.append(tenant)
+    
+    return documents_response(TenantSearchResult, results)
 
 @api_router.get("/tenants/{tenant_id}", response_model=Tenant)
-async def get_tenant(tenant_id: str, current_user: User = Depends(get_current_user)):
-    tenant = await db.tenants.find_one({"id": tenant_id}, {"_id": 0})
+async def get_tenant(tenant_id: str, current_user: User = Depends(get_current_user), property_id: str = Depends(get_property_id)):
+    tenant = await repos.tenants.find_one({"id": tenant_id, "property_id": property_id})
     if not tenant:
         raise HTTPException(status_code=404, detail="Penghuni tidak ditemukan")
-    if isinstance(tenant['created_at'], str):
-        tenant['created_at'] = datetime.fromisoformat(tenant['created_at'])
-    return Tenant(**tenant)
+    return document_response(Tenant, tenant)
 
 @api_router.put("/tenants/{tenant_id}", response_model=Tenant)
-async def update_tenant(tenant_id: str, tenant_input: TenantUpdate, current_user: User = Depends(require_admin)):
-    tenant = await db.tenants.find_one({"id": tenant_id}, {"_id": 0})
+async def update_tenant(
+    tenant_id: str, tenant_input: TenantUpdate, current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)
+):
+    tenant = await repos.tenants.find_one({"id": tenant_id, "property_id": property_id})
     if not tenant:
         raise HTTPException(status_code=404, detail="Penghuni tidak ditemukan")
     
     update_data = {k: v for k, v in tenant_input.model_dump().items() if v is not None}
+    update_data.update(tenant_search_keys(update_data))
     if update_data:
-        await db.tenants.update_one({"id": tenant_id}, {"$set": update_data})
+        await repos.tenants.update_one({"id": tenant_id}, {"$set": update_data})
     
-    updated_tenant = await db.tenants.find_one({"id": tenant_id}, {"_id": 0})
-    if isinstance(updated_tenant['created_at'], str):
-        updated_tenant['created_at'] = datetime.fromisoformat(updated_tenant['created_at'])
-    return Tenant(**updated_tenant)
+    updated_tenant = await repos.tenants.find_one({"id": tenant_id})
+    return document_response(Tenant, updated_tenant)
 
 @api_router.delete("/tenants/{tenant_id}")
-async def delete_tenant(tenant_id: str, current_user: User = Depends(require_admin)):
-    active_rental = await db.rentals.find_one({"tenant_id": tenant_id, "status": "aktif"}, {"_id": 0})
+async def delete_tenant(tenant_id: str, current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)):
+    active_rental = await repos.rentals.find_one({"tenant_id": tenant_id, "property_id": property_id, "status": "aktif"})
     if active_rental:
         raise HTTPException(status_code=400, detail="Tidak bisa hapus penghuni yang sedang menyewa")
     
-    result = await db.tenants.delete_one({"id": tenant_id})
-    if result.deleted_count == 0:
+    if await repos.tenants.delete_one({"id": tenant_id, "property_id": property_id}) == 0:
         raise HTTPException(status_code=404, detail="Penghuni tidak ditemukan")
     return {"message": "Penghuni berhasil dihapus"}
 
 # ==================== RENTAL ENDPOINTS ====================
 
 @api_router.post("/rentals", response_model=Rental)
-async def create_rental(rental_input: RentalCreate, current_user: User = Depends(require_admin)):
-    room = await db.rooms.find_one({"id": rental_input.room_id}, {"_id": 0})
+async def create_rental(rental_input: RentalCreate, current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)):
+    room = await repos.rooms.find_one({"id": rental_input.room_id, "property_id": property_id})
     if not room:
         raise HTTPException(status_code=404, detail="Kamar tidak ditemukan")
     
-    active_rental = await db.rentals.find_one({"room_id": rental_input.room_id, "status": "aktif"}, {"_id": 0})
+    active_rental = await repos.rentals.find_one(
+        {"room_id": rental_input.room_id, "property_id": property_id, "status": "aktif"}
+    )
     if active_rental:
         raise HTTPException(status_code=400, detail="Kamar sudah disewa")
     
     tenant_id = rental_input.tenant_id
     
     if rental_input.tenant and not tenant_id:
-        tenant_obj = Tenant(**rental_input.tenant.model_dump())
-        tenant_doc = tenant_obj.model_dump()
-        tenant_doc['created_at'] = tenant_doc['created_at'].isoformat()
-        await db.tenants.insert_one(tenant_doc)
+        tenant_obj = Tenant(**rental_input.tenant.model_dump(), property_id=property_id)
+        tenant_doc = to_document(tenant_obj)
+        tenant_doc.update(tenant_search_keys(tenant_doc))
+        await repos.tenants.insert_one(tenant_doc)
         tenant_id = tenant_obj.id
     
     if not tenant_id:
         raise HTTPException(status_code=400, detail="Tenant ID atau data tenant baru harus diisi")
     
-    tenant = await db.tenants.find_one({"id": tenant_id}, {"_id": 0})
+    tenant = await repos.tenants.find_one({"id": tenant_id, "property_id": property_id})
     if not tenant:
         raise HTTPException(status_code=404, detail="Penghuni tidak ditemukan")
     
     tanggal_mulai = rental_input.tanggal_mulai or datetime.now(timezone.utc)
     
     rental_obj = Rental(
+        property_id=property_id,
         tenant_id=tenant_id,
         room_id=rental_input.room_id,
         tanggal_mulai=tanggal_mulai,
         harga=rental_input.harga
     )
     
-    doc = rental_obj.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    doc['tanggal_mulai'] = doc['tanggal_mulai'].isoformat()
+    doc = to_document(rental_obj)
     
-    await db.rentals.insert_one(doc)
-    await db.rooms.update_one({"id": rental_input.room_id}, {"$set": {"status": "terisi"}})
+    await repos.rentals.insert_one(doc)
+    await repos.rooms.update_one({"id": rental_input.room_id}, {"$set": {"status": "terisi"}})
+    await reference_cache.invalidate(rooms_cache_key(property_id))
+    await invalidate_occupancy_from(property_id, tanggal_mulai)
     
     # Auto-generate tagihan bulan pertama
     start_month = tanggal_mulai.month
     start_year = tanggal_mulai.year
     
     bill = Bill(
+        property_id=property_id,
         rental_id=rental_obj.id,
         bulan=start_month,
         tahun=start_year,
         jumlah=rental_input.harga,
         tipe="sewa"
     )
-    bill_doc = bill.model_dump()
-    bill_doc['created_at'] = bill_doc['created_at'].isoformat()
-    await db.bills.insert_one(bill_doc)
+    await repos.bills.insert_one(to_document(bill))
+    await event_bus.publish(
+        "rental.created", property_id=property_id, rental_id=rental_obj.id,
+        room_id=rental_obj.room_id, tenant_id=tenant_id
+    )
     
-    return rental_obj
+    return document_response(Rental, doc)
 
 @api_router.get("/rentals", response_model=List[Rental])
-async def get_rentals(current_user: User = Depends(get_current_user)):
-    rentals = await db.rentals.find({}, {"_id": 0}).to_list(1000)
-    for rental in rentals:
-        if isinstance(rental['created_at'], str):
-            rental['created_at'] = datetime.fromisoformat(rental['created_at'])
-        if isinstance(rental['tanggal_mulai'], str):
-            rental['tanggal_mulai'] = datetime.fromisoformat(rental['tanggal_mulai'])
-    return rentals
+async def get_rentals(current_user: User = Depends(get_current_user), property_id: str = Depends(get_property_id)):
+    rentals = await repos.rentals.find({"property_id": property_id}, model_projection(Rental), limit=1000)
+    return documents_response(Rental, rentals)
 
 @api_router.get("/rentals/{rental_id}", response_model=Rental)
-async def get_rental(rental_id: str, current_user: User = Depends(get_current_user)):
-    rental = await db.rentals.find_one({"id": rental_id}, {"_id": 0})
+async def get_rental(rental_id: str, current_user: User = Depends(get_current_user), property_id: str = Depends(get_property_id)):
+    rental = await repos.rentals.find_one({"id": rental_id, "property_id": property_id})
     if not rental:
         raise HTTPException(status_code=404, detail="Data sewa tidak ditemukan")
-    if isinstance(rental['created_at'], str):
-        rental['created_at'] = datetime.fromisoformat(rental['created_at'])
-    if isinstance(rental['tanggal_mulai'], str):
-        rental['tanggal_mulai'] = datetime.fromisoformat(rental['tanggal_mulai'])
-    return Rental(**rental)
+    return document_response(Rental, rental)
 
 @api_router.post("/rentals/{rental_id}/end")
-async def end_rental(rental_id: str, current_user: User = Depends(require_admin)):
-    rental = await db.rentals.find_one({"id": rental_id}, {"_id": 0})
+async def end_rental(rental_id: str, current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)):
+    rental = await repos.rentals.find_one({"id": rental_id, "property_id": property_id})
     if not rental:
         raise HTTPException(status_code=404, detail="Data sewa tidak ditemukan")
     
     if rental['status'] == "selesai":
         raise HTTPException(status_code=400, detail="Sewa sudah selesai")
     
-    await db.rentals.update_one({"id": rental_id}, {"$set": {"status": "selesai"}})
-    await db.rooms.update_one({"id": rental['room_id']}, {"$set": {"status": "kosong"}})
+    await repos.rentals.update_one({"id": rental_id}, {"$set": {
+        "status": "selesai",
+        "tanggal_selesai": datetime.now(timezone.utc).isoformat()
+    }})
+    await repos.rooms.update_one({"id": rental['room_id']}, {"$set": {"status": "kosong"}})
+    await reference_cache.invalidate(rooms_cache_key(property_id))
+    await event_bus.publish("rental.ended", property_id=property_id, rental_id=rental_id, room_id=rental['room_id'])
     
     return {"message": "Sewa berhasil diakhiri"}
 
 # ==================== BILL ENDPOINTS ====================
 
-@api_router.post("/bills/generate-monthly")
-async def generate_monthly_bills(current_user: User = Depends(require_admin)):
+async def create_monthly_bills(property_id: Optional[str] = None, progress=None) -> int:
+    """Bill every active rental for the current month; all properties when property_id is None."""
     now = datetime.now(timezone.utc)
     current_month = now.month
     current_year = now.year
     
-    active_rentals = await db.rentals.find({"status": "aktif"}, {"_id": 0}).to_list(1000)
+    query = {"status": "aktif"}
+    if property_id:
+        query["property_id"] = property_id
+    active_rentals = await repos.rentals.find(query)
     
     created_count = 0
-    for rental in active_rentals:
-        existing_bill = await db.bills.find_one({
+    for index, rental in enumerate(active_rentals):
+        if progress and index % 50 == 0:
+            await progress(index, len(active_rentals))
+        existing_bill = await repos.bills.find_one({
             "rental_id": rental['id'],
             "bulan": current_month,
             "tahun": current_year,
             "tipe": "sewa"
-        }, {"_id": 0})
+        })
         
         if not existing_bill:
             bill = Bill(
+                property_id=rental['property_id'],
                 rental_id=rental['id'],
                 bulan=current_month,
                 tahun=current_year,
                 jumlah=rental['harga'],
                 tipe="sewa"
             )
-            bill_doc = bill.model_dump()
-            bill_doc['created_at'] = bill_doc['created_at'].isoformat()
-            await db.bills.insert_one(bill_doc)
+            await repos.bills.insert_one(to_document(bill))
             created_count += 1
     
+    return created_count
+
+@api_router.post(
+    "/bills/generate-monthly",
+    dependencies=[Depends(rate_limit_user("generate_monthly")), Depends(concurrency_cap("bulk"))]
+)
+async def generate_monthly_bills(current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)):
+    created_count = await create_monthly_bills(property_id)
     return {"message": f"Berhasil membuat {created_count} tagihan", "count": created_count}
 
 @api_router.post("/bills", response_model=Bill)
-async def create_bill(bill_input: BillCreate, current_user: User = Depends(require_admin)):
-    rental = await db.rentals.find_one({"id": bill_input.rental_id}, {"_id": 0})
+async def create_bill(bill_input: BillCreate, current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)):
+    rental = await repos.rentals.find_one({"id": bill_input.rental_id, "property_id": property_id})
     if not rental:
         raise HTTPException(status_code=404, detail="Data sewa tidak ditemukan")
     
-    existing_bill = await db.bills.find_one({
+    existing_bill = await find_one_hot_or_archived("bills", {
         "rental_id": bill_input.rental_id,
         "bulan": bill_input.bulan,
         "tahun": bill_input.tahun,
         "tipe": bill_input.tipe
-    }, {"_id": 0})
+    })
     if existing_bill:
         raise HTTPException(status_code=400, detail="Tagihan untuk periode ini sudah ada")
     
     bill_dict = bill_input.model_dump()
-    bill_obj = Bill(**bill_dict)
-    doc = bill_obj.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
+    bill_obj = Bill(**bill_dict, property_id=property_id)
+    doc = to_document(bill_obj)
     
-    await db.bills.insert_one(doc)
-    return bill_obj
+    await repos.bills.insert_one(doc)
+    return document_response(Bill, doc)
 
 @api_router.get("/bills", response_model=List[Bill])
-async def get_bills(current_user: User = Depends(get_current_user)):
-    bills = await db.bills.find({}, {"_id": 0}).to_list(1000)
-    for bill in bills:
-        if isinstance(bill['created_at'], str):
-            bill['created_at'] = datetime.fromisoformat(bill['created_at'])
-        if bill.get('tanggal_bayar') and isinstance(bill['tanggal_bayar'], str):
-            bill['tanggal_bayar'] = datetime.fromisoformat(bill['tanggal_bayar'])
-    return bills
+async def get_bills(
+    include_archived: bool = False,
+    current_user: User = Depends(get_current_user),
+    property_id: str = Depends(get_property_id)
+):
+    bills = await find_hot_and_archived(
+        "bills", {"property_id": property_id}, model_projection(Bill), limit=1000, include_archived=include_archived
+    )
+    return documents_response(Bill, bills)
+
+@api_router.get("/bills/export")
+async def export_bills(
+    format: Literal["csv", "ndjson"] = "csv",
+    dari: Optional[datetime] = None,
+    sampai: Optional[datetime] = None,
+    include_archived: bool = False,
+    current_user: User = Depends(get_current_user),
+    property_id: str = Depends(get_property_id)
+):
+    query = {"property_id": property_id, **period_range_query(dari, sampai)}
+    projection = {"_id": 0, **{f: 1 for f in BILL_EXPORT_FIELDS}}
+    cursor = iterate_archived_then_hot(
+        "bills", query, projection, [("tahun", 1), ("bulan", 1)], include_archived
+    )
+    return export_response(cursor, BILL_EXPORT_FIELDS, format, "tagihan")
 
 @api_router.get("/bills/{bill_id}", response_model=Bill)
-async def get_bill(bill_id: str, current_user: User = Depends(get_current_user)):
-    bill = await db.bills.find_one({"id": bill_id}, {"_id": 0})
+async def get_bill(bill_id: str, current_user: User = Depends(get_current_user), property_id: str = Depends(get_property_id)):
+    bill = await find_one_hot_or_archived("bills", {"id": bill_id, "property_id": property_id})
     if not bill:
         raise HTTPException(status_code=404, detail="Tagihan tidak ditemukan")
-    if isinstance(bill['created_at'], str):
-        bill['created_at'] = datetime.fromisoformat(bill['created_at'])
-    if bill.get('tanggal_bayar') and isinstance(bill['tanggal_bayar'], str):
-        bill['tanggal_bayar'] = datetime.fromisoformat(bill['tanggal_bayar'])
-    return Bill(**bill)
+    return document_response(Bill, bill)
 
 @api_router.post("/bills/{bill_id}/upload")
-async def upload_payment_proof(bill_id: str, file: UploadFile = File(...), current_user: User = Depends(require_admin)):
-    bill = await db.bills.find_one({"id": bill_id}, {"_id": 0})
+async def upload_payment_proof(
+    bill_id: str, file: UploadFile = File(...), current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)
+):
+    bill = await repos.bills.find_one({"id": bill_id, "property_id": property_id})
     if not bill:
         raise HTTPException(status_code=404, detail="Tagihan tidak ditemukan")
     
@@ -612,13 +1169,15 @@ async def upload_payment_proof(bill_id: str, file: UploadFile = File(...), curre
     with open(file_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
     
-    await db.bills.update_one({"id": bill_id}, {"$set": {"bukti_bayar": filename}})
+    await repos.bills.update_one({"id": bill_id}, {"$set": {"bukti_bayar": filename}})
     
     return {"filename": filename, "message": "Bukti bayar berhasil diupload"}
 
 @api_router.post("/bills/{bill_id}/mark-paid")
-async def mark_bill_paid(bill_id: str, cara_bayar: Literal["tunai", "non_tunai"], current_user: User = Depends(require_admin)):
-    bill = await db.bills.find_one({"id": bill_id}, {"_id": 0})
+async def mark_bill_paid(
+    bill_id: str, cara_bayar: Literal["tunai", "non_tunai"], current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)
+):
+    bill = await repos.bills.find_one({"id": bill_id, "property_id": property_id})
     if not bill:
         raise HTTPException(status_code=404, detail="Tagihan tidak ditemukan")
     
@@ -626,179 +1185,227 @@ async def mark_bill_paid(bill_id: str, cara_bayar: Literal["tunai", "non_tunai"]
         raise HTTPException(status_code=400, detail="Tagihan sudah lunas")
     
     now = datetime.now(timezone.utc)
-    await db.bills.update_one({"id": bill_id}, {
+    # Conditional on the status, so of two concurrent calls only one records the payment and its ledger $inc
+    paid = await repos.bills.update_one({"id": bill_id, "property_id": property_id, "status": "belum_bayar"}, {
         "$set": {
             "status": "lunas",
             "cara_bayar": cara_bayar,
             "tanggal_bayar": now.isoformat()
         }
     })
+    if paid != 1:
+        raise HTTPException(status_code=400, detail="Tagihan sudah lunas")
     
-    rental = await db.rentals.find_one({"id": bill['rental_id']}, {"_id": 0})
-    room = await db.rooms.find_one({"id": rental['room_id']}, {"_id": 0})
-    tenant = await db.tenants.find_one({"id": rental['tenant_id']}, {"_id": 0})
+    rental = await repos.rentals.find_one({"id": bill['rental_id']})
+    room = await repos.rooms.find_one({"id": rental['room_id']})
+    tenant = await repos.tenants.find_one({"id": rental['tenant_id']})
     
     sumber = f"Pembayaran {bill.get('keterangan', 'sewa')} - {tenant['nama']} (Kamar {room['nomor_kamar']})"
     
     transaction = Transaction(
+        property_id=property_id,
         tipe="pemasukan",
         jumlah=bill['jumlah'],
         sumber=sumber,
         kategori="sewa" if bill['tipe'] == "sewa" else "lainnya"
     )
-    trans_doc = transaction.model_dump()
-    trans_doc['tanggal'] = trans_doc['tanggal'].isoformat()
-    await db.transactions.insert_one(trans_doc)
+    await record_transaction(transaction)
+    await event_bus.publish(
+        "bill.paid", property_id=property_id, bill_id=bill_id, rental_id=bill['rental_id'],
+        jumlah=bill['jumlah'], cara_bayar=cara_bayar
+    )
     
     return {"message": "Tagihan berhasil ditandai lunas"}
 
-@api_router.get("/bills/{bill_id}/kwitansi")
-async def generate_kwitansi(bill_id: str, current_user: User = Depends(get_current_user)):
-    bill = await db.bills.find_one({"id": bill_id}, {"_id": 0})
+async def load_kwitansi_parties(bill: dict) -> tuple:
+    rental = await repos.rentals.find_one({"id": bill['rental_id']})
+    room = await repos.rooms.find_one({"id": rental['room_id']})
+    tenant = await repos.tenants.find_one({"id": rental['tenant_id']})
+    return room, tenant
+
+async def load_paid_bills_for_period(property_id: str, bulan: int, tahun: int) -> List[tuple]:
+    """Paid bills of a period with their room and tenant, fetched with three $in queries."""
+    # Paid bills of old periods are archived, so both collections are always read here
+    bills = await find_hot_and_archived(
+        "bills", {"property_id": property_id, "status": "lunas", "bulan": bulan, "tahun": tahun},
+        include_archived=True
+    )
+    rental_ids = list({b['rental_id'] for b in bills})
+    rentals = {r['id']: r async for r in repos.rentals.iterate({"id": {"$in": rental_ids}})}
+    room_ids = list({r['room_id'] for r in rentals.values()})
+    tenant_ids = list({r['tenant_id'] for r in rentals.values()})
+    rooms = {r['id']: r async for r in repos.rooms.iterate({"id": {"$in": room_ids}})}
+    tenants = {t['id']: t async for t in repos.tenants.iterate({"id": {"$in": tenant_ids}})}
+    
+    result = []
+    for bill in bills:
+        rental = rentals.get(bill['rental_id'])
+        if rental and rental['room_id'] in rooms and rental['tenant_id'] in tenants:
+            result.append((bill, rooms[rental['room_id']], tenants[rental['tenant_id']]))
+    return result
+
+def get_kwitansi_executor() -> ProcessPoolExecutor:
+    global kwitansi_executor
+    if kwitansi_executor is None:
+        # spawn: worker processes import only the kwitansi module, never the Motor client
+        kwitansi_executor = ProcessPoolExecutor(
+            max_workers=KWITANSI_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return kwitansi_executor
+
+async def render_kwitansi_parallel(entries: List[tuple]):
+    """Yield (entry, pdf_bytes) in order, keeping at most 2x KWITANSI_WORKERS renders in flight."""
+    loop = asyncio.get_running_loop()
+    executor = get_kwitansi_executor()
+    remaining = iter(entries)
+    pending = deque()
+    
+    def submit_next():
+        entry = next(remaining, None)
+        if entry is not None:
+            pending.append((entry, loop.run_in_executor(executor, render_kwitansi, *entry)))
+    
+    for _ in range(KWITANSI_WORKERS * 2):
+        submit_next()
+    try:
+        while pending:
+            entry, future = pending.popleft()
+            pdf = await future
+            submit_next()
+            yield entry, pdf
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+class ChunkSink:
+    """Write-only, unseekable file object; zipfile then emits data descriptors and never seeks back."""
+    
+    def __init__(self):
+        self.chunks = []
+    
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def kwitansi_archive_name(bill: dict, tenant: dict) -> str:
+    return f"{bill['id'][:8]}_{kwitansi_download_name(bill, tenant)}"
+
+async def stream_kwitansi_zip(entries: List[tuple]):
+    sink = ChunkSink()
+    # PDFs are already compressed, so entries are stored rather than deflated
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as archive:
+        async for (bill, room, tenant), pdf in render_kwitansi_parallel(entries):
+            archive.writestr(kwitansi_archive_name(bill, tenant), pdf)
+            yield sink.drain()
+    yield sink.drain()
+
+async def stream_kwitansi_pdf(entries: List[tuple]):
+    loop = asyncio.get_running_loop()
+    # The system temp dir, not UPLOADS_DIR: that one is served publicly by /uploads
+    handle, pdf_path = tempfile.mkstemp(suffix=".pdf")
+    os.close(handle)
+    try:
+        # One canvas holds every page, so the merged document renders in a single worker process
+        await loop.run_in_executor(get_kwitansi_executor(), render_kwitansi_document, entries, pdf_path)
+        with open(pdf_path, "rb") as f:
+            while chunk := f.read(KWITANSI_STREAM_CHUNK):
+                yield chunk
+    finally:
+        os.unlink(pdf_path)
+
+@api_router.get("/kwitansi/batch", dependencies=[Depends(rate_limit_user("kwitansi")), Depends(concurrency_cap("pdf"))])
+async def generate_kwitansi_batch(
+    bulan: int = Query(..., ge=1, le=12),
+    tahun: int = Query(...),
+    format: Literal["zip", "pdf"] = "zip",
+    current_user: User = Depends(require_admin),
+    property_id: str = Depends(get_property_id)
+):
+    entries = await load_paid_bills_for_period(property_id, bulan, tahun)
+    if not entries:
+        raise HTTPException(status_code=404, detail="Tidak ada tagihan lunas pada periode ini")
+    
+    filename = f"kwitansi_{tahun}_{bulan:02d}.{format}"
+    if format == "zip":
+        stream, media_type = stream_kwitansi_zip(entries), "application/zip"
+    else:
+        stream, media_type = stream_kwitansi_pdf(entries), "application/pdf"
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@api_router.get(
+    "/bills/{bill_id}/kwitansi",
+    dependencies=[Depends(rate_limit_user("kwitansi")), Depends(concurrency_cap("pdf"))]
+)
+async def generate_kwitansi(bill_id: str, current_user: User = Depends(get_current_user), property_id: str = Depends(get_property_id)):
+    bill = await find_one_hot_or_archived("bills", {"id": bill_id, "property_id": property_id})
     if not bill:
         raise HTTPException(status_code=404, detail="Tagihan tidak ditemukan")
     
     if bill['status'] != "lunas":
         raise HTTPException(status_code=400, detail="Kwitansi hanya untuk tagihan yang sudah lunas")
     
-    rental = await db.rentals.find_one({"id": bill['rental_id']}, {"_id": 0})
-    room = await db.rooms.find_one({"id": rental['room_id']}, {"_id": 0})
-    tenant = await db.tenants.find_one({"id": rental['tenant_id']}, {"_id": 0})
-    
-    # Generate PDF
-    pdf_path = UPLOADS_DIR / f"kwitansi_{bill_id}.pdf"
-    c = canvas.Canvas(str(pdf_path), pagesize=A4)
-    width, height = A4
-    
-    # Header
-    c.setFont("Helvetica-Bold", 20)
-    c.drawCentredString(width / 2, height - 50, "KWITANSI PEMBAYARAN")
-    
-    c.setFont("Helvetica-Bold", 14)
-    c.drawCentredString(width / 2, height - 75, "SISKOSAN")
-    
-    # Line
-    c.setStrokeColor(colors.black)
-    c.setLineWidth(2)
-    c.line(50, height - 90, width - 50, height - 90)
-    
-    # Details
-    y_position = height - 130
-    c.setFont("Helvetica", 11)
-    
-    # Left column
-    details = [
-        f"No. Kwitansi: KWT-{bill_id[:8].upper()}",
-        f"Tanggal: {datetime.fromisoformat(bill['tanggal_bayar']).strftime('%d %B %Y')}",
-        "",
-        "Telah terima dari:",
-        f"Nama: {tenant['nama']}",
-        f"Alamat: {tenant['alamat']}",
-        f"Telepon: {tenant['telepon']}",
-        "",
-        "Untuk pembayaran:",
-        f"Sewa Kamar: {room['nomor_kamar']}",
-        f"Periode: {['Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni', 'Juli', 'Agustus', 'September', 'Oktober', 'November', 'Desember'][bill['bulan']-1]} {bill['tahun']}",
-    ]
+    room, tenant = await load_kwitansi_parties(bill)
     
-    if bill.get('keterangan'):
-        details.append(f"Keterangan: {bill['keterangan']}")
+    # Rendered in the same worker pool as the batch, so the event loop never runs reportlab
+    loop = asyncio.get_running_loop()
+    pdf = await loop.run_in_executor(get_kwitansi_executor(), render_kwitansi, bill, room, tenant)
     
-    for line in details:
-        if line == "":
-            y_position -= 10
-        else:
-            if line.startswith("Telah terima") or line.startswith("Untuk pembayaran"):
-                c.setFont("Helvetica-Bold", 11)
-            else:
-                c.setFont("Helvetica", 11)
-            c.drawString(60, y_position, line)
-            y_position -= 20
-    
-    # Amount box
-    y_position -= 10
-    c.setStrokeColor(colors.black)
-    c.setLineWidth(1)
-    c.rect(60, y_position - 40, width - 120, 60)
-    
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(70, y_position - 15, "Jumlah Dibayar:")
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(70, y_position - 35, f"Rp {bill['jumlah']:,.0f}".replace(",", "."))
-    
-    # Payment method
-    y_position -= 80
-    c.setFont("Helvetica", 10)
-    cara_bayar_text = "Tunai" if bill.get('cara_bayar') == 'tunai' else "Transfer/Non Tunai"
-    c.drawString(60, y_position, f"Cara Bayar: {cara_bayar_text}")
-    
-    # Signature
-    y_position -= 60
-    c.setFont("Helvetica", 10)
-    c.drawString(width - 200, y_position, "Penerima,")
-    
-    y_position -= 60
-    c.line(width - 200, y_position, width - 60, y_position)
-    y_position -= 15
-    c.drawString(width - 200, y_position, "(Admin)")
-    
-    # Footer
-    c.setFont("Helvetica-Oblique", 8)
-    c.setFillColor(colors.grey)
-    c.drawCentredString(width / 2, 30, "Kwitansi ini sah tanpa tanda tangan dan stempel")
-    c.drawCentredString(width / 2, 20, "Terima kasih atas pembayaran Anda")
-    
-    c.save()
-    
-    return FileResponse(
-        path=str(pdf_path),
-        media_type='application/pdf',
-        filename=f"kwitansi_{tenant['nama'].replace(' ', '_')}_{bill['bulan']}_{bill['tahun']}.pdf"
-    )
+    # Same encoding FileResponse uses, so tenant names outside ASCII still make a valid header
+    filename = kwitansi_download_name(bill, tenant)
+    if quote(filename) == filename:
+        disposition = f'attachment; filename="{filename}"'
+    else:
+        disposition = f"attachment; filename*=utf-8''{quote(filename)}"
+    return Response(content=pdf, media_type='application/pdf', headers={"Content-Disposition": disposition})
 
 # ==================== MAINTENANCE ENDPOINTS ====================
 
 @api_router.post("/maintenance", response_model=Maintenance)
-async def create_maintenance(maint_input: MaintenanceCreate, current_user: User = Depends(require_admin)):
+async def create_maintenance(maint_input: MaintenanceCreate, current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)):
     if maint_input.room_id:
-        room = await db.rooms.find_one({"id": maint_input.room_id}, {"_id": 0})
+        room = await repos.rooms.find_one({"id": maint_input.room_id, "property_id": property_id})
         if not room:
             raise HTTPException(status_code=404, detail="Kamar tidak ditemukan")
     
     maint_dict = maint_input.model_dump()
-    maint_obj = Maintenance(**maint_dict)
-    doc = maint_obj.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    doc['updated_at'] = doc['updated_at'].isoformat()
+    maint_obj = Maintenance(**maint_dict, property_id=property_id)
+    doc = to_document(maint_obj)
     
-    await db.maintenance.insert_one(doc)
+    await repos.maintenance.insert_one(doc)
     
-    return maint_obj
+    return document_response(Maintenance, doc)
 
 @api_router.get("/maintenance", response_model=List[Maintenance])
-async def get_maintenance(current_user: User = Depends(get_current_user)):
-    maintenances = await db.maintenance.find({}, {"_id": 0}).to_list(1000)
-    for maint in maintenances:
-        if isinstance(maint['created_at'], str):
-            maint['created_at'] = datetime.fromisoformat(maint['created_at'])
-        if isinstance(maint['updated_at'], str):
-            maint['updated_at'] = datetime.fromisoformat(maint['updated_at'])
-    return maintenances
+async def get_maintenance(current_user: User = Depends(get_current_user), property_id: str = Depends(get_property_id)):
+    maintenances = await repos.maintenance.find(
+        {"property_id": property_id}, model_projection(Maintenance), limit=1000
+    )
+    return documents_response(Maintenance, maintenances)
 
 @api_router.get("/maintenance/{maint_id}", response_model=Maintenance)
-async def get_maintenance_detail(maint_id: str, current_user: User = Depends(get_current_user)):
-    maint = await db.maintenance.find_one({"id": maint_id}, {"_id": 0})
+async def get_maintenance_detail(maint_id: str, current_user: User = Depends(get_current_user), property_id: str = Depends(get_property_id)):
+    maint = await repos.maintenance.find_one({"id": maint_id, "property_id": property_id})
     if not maint:
         raise HTTPException(status_code=404, detail="Laporan tidak ditemukan")
-    if isinstance(maint['created_at'], str):
-        maint['created_at'] = datetime.fromisoformat(maint['created_at'])
-    if isinstance(maint['updated_at'], str):
-        maint['updated_at'] = datetime.fromisoformat(maint['updated_at'])
-    return Maintenance(**maint)
+    return document_response(Maintenance, maint)
 
 @api_router.put("/maintenance/{maint_id}", response_model=Maintenance)
-async def update_maintenance(maint_id: str, maint_input: MaintenanceUpdate, current_user: User = Depends(require_admin)):
-    maint = await db.maintenance.find_one({"id": maint_id}, {"_id": 0})
+async def update_maintenance(
+    maint_id: str, maint_input: MaintenanceUpdate, current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)
+):
+    maint = await repos.maintenance.find_one({"id": maint_id, "property_id": property_id})
     if not maint:
         raise HTTPException(status_code=404, detail="Laporan tidak ditemukan")
     
@@ -808,70 +1415,85 @@ async def update_maintenance(maint_id: str, maint_input: MaintenanceUpdate, curr
     if maint_input.status == "selesai" and maint_input.biaya and maint_input.biaya > 0:
         lokasi_str = maint['lokasi']
         transaction = Transaction(
+            property_id=property_id,
             tipe="pengeluaran",
             jumlah=maint_input.biaya,
             sumber=f"Perbaikan {lokasi_str}",
             kategori="perbaikan"
         )
-        trans_doc = transaction.model_dump()
-        trans_doc['tanggal'] = trans_doc['tanggal'].isoformat()
-        await db.transactions.insert_one(trans_doc)
+        await record_transaction(transaction)
     
     if update_data:
-        await db.maintenance.update_one({"id": maint_id}, {"$set": update_data})
+        await repos.maintenance.update_one({"id": maint_id}, {"$set": update_data})
+    await event_bus.publish(
+        "maintenance.updated", property_id=property_id, maintenance_id=maint_id,
+        status=update_data.get('status', maint['status'])
+    )
     
-    updated_maint = await db.maintenance.find_one({"id": maint_id}, {"_id": 0})
-    if isinstance(updated_maint['created_at'], str):
-        updated_maint['created_at'] = datetime.fromisoformat(updated_maint['created_at'])
-    if isinstance(updated_maint['updated_at'], str):
-        updated_maint['updated_at'] = datetime.fromisoformat(updated_maint['updated_at'])
-    return Maintenance(**updated_maint)
+    updated_maint = await repos.maintenance.find_one({"id": maint_id})
+    return document_response(Maintenance, updated_maint)
 
 # ==================== TRANSACTION ENDPOINTS ====================
 
 @api_router.post("/transactions", response_model=Transaction)
-async def create_transaction(trans_input: TransactionCreate, current_user: User = Depends(require_admin)):
+async def create_transaction(trans_input: TransactionCreate, current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)):
     trans_dict = trans_input.model_dump()
-    trans_obj = Transaction(**trans_dict)
-    doc = trans_obj.model_dump()
-    doc['tanggal'] = doc['tanggal'].isoformat()
+    trans_obj = Transaction(**trans_dict, property_id=property_id)
     
-    await db.transactions.insert_one(doc)
-    return trans_obj
+    doc = await record_transaction(trans_obj)
+    await event_bus.publish(
+        "transaction.created", property_id=property_id, transaction_id=trans_obj.id, tipe=trans_obj.tipe,
+        jumlah=trans_obj.jumlah, kategori=trans_obj.kategori
+    )
+    return document_response(Transaction, doc)
 
 @api_router.get("/transactions", response_model=List[Transaction])
-async def get_transactions(current_user: User = Depends(get_current_user)):
-    transactions = await db.transactions.find({}, {"_id": 0}).sort("tanggal", -1).to_list(1000)
-    for trans in transactions:
-        if isinstance(trans['tanggal'], str):
-            trans['tanggal'] = datetime.fromisoformat(trans['tanggal'])
-    return transactions
+async def get_transactions(
+    include_archived: bool = False,
+    current_user: User = Depends(get_current_user),
+    property_id: str = Depends(get_property_id)
+):
+    # Archived transactions are all older than hot ones, so appending them keeps the newest-first order
+    transactions = await find_hot_and_archived(
+        "transactions", {"property_id": property_id}, model_projection(Transaction),
+        sort=[("tanggal", -1)], limit=1000, include_archived=include_archived
+    )
+    return documents_response(Transaction, transactions)
+
+@api_router.get("/transactions/export")
+async def export_transactions(
+    format: Literal["csv", "ndjson"] = "csv",
+    dari: Optional[datetime] = None,
+    sampai: Optional[datetime] = None,
+    include_archived: bool = False,
+    current_user: User = Depends(get_current_user),
+    property_id: str = Depends(get_property_id)
+):
+    query = {"property_id": property_id}
+    if dari or sampai:
+        query["tanggal"] = {}
+        if dari:
+            query["tanggal"]["$gte"] = to_utc_iso(dari)
+        if sampai:
+            query["tanggal"]["$lte"] = to_utc_iso(sampai)
+    projection = {"_id": 0, **{f: 1 for f in TRANSACTION_EXPORT_FIELDS}}
+    cursor = iterate_archived_then_hot("transactions", query, projection, "tanggal", include_archived)
+    return export_response(cursor, TRANSACTION_EXPORT_FIELDS, format, "transaksi")
 
 @api_router.get("/transactions/summary")
-async def get_transaction_summary(bulan: Optional[int] = None, tahun: Optional[int] = None, current_user: User = Depends(get_current_user)):
+async def get_transaction_summary(
+    bulan: Optional[int] = None,
+    tahun: Optional[int] = None,
+    current_user: User = Depends(get_current_user),
+    property_id: str = Depends(get_property_id)
+):
     now = datetime.now(timezone.utc)
     target_month = bulan or now.month
     target_year = tahun or now.year
     
-    start_date = datetime(target_year, target_month, 1, tzinfo=timezone.utc)
-    last_day = monthrange(target_year, target_month)[1]
-    end_date = datetime(target_year, target_month, last_day, 23, 59, 59, tzinfo=timezone.utc)
-    
-    transactions = await db.transactions.find({}, {"_id": 0}).to_list(1000)
-    
-    pemasukan = 0
-    pengeluaran = 0
-    
-    for trans in transactions:
-        trans_date = trans['tanggal']
-        if isinstance(trans_date, str):
-            trans_date = datetime.fromisoformat(trans_date)
-        
-        if start_date <= trans_date <= end_date:
-            if trans['tipe'] == "pemasukan":
-                pemasukan += trans['jumlah']
-            else:
-                pengeluaran += trans['jumlah']
+    totals = await get_ledger_totals(property_id, target_year, target_month)
+    pemasukan = totals['pemasukan']
+    pengeluaran = totals['pengeluaran']
     
     laba = pemasukan - pengeluaran
     
@@ -887,72 +1509,343 @@ async def get_transaction_summary(bulan: Optional[int] = None, tahun: Optional[i
 
 @api_router.post("/categories", response_model=Category)
 async def create_category(category_input: CategoryCreate, current_user: User = Depends(require_admin)):
-    existing = await db.categories.find_one({"nama": category_input.nama.lower()}, {"_id": 0})
+    existing = await repos.categories.find_one({"nama": category_input.nama.lower()})
     if existing:
         raise HTTPException(status_code=400, detail="Kategori sudah ada")
     
     category_dict = category_input.model_dump()
     category_dict['nama'] = category_dict['nama'].lower()
     category_obj = Category(**category_dict)
-    doc = category_obj.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
+    doc = to_document(category_obj)
     
-    await db.categories.insert_one(doc)
-    return category_obj
+    await repos.categories.insert_one(doc)
+    await reference_cache.invalidate("categories")
+    return document_response(Category, doc)
 
 @api_router.get("/categories", response_model=List[Category])
 async def get_categories(tipe: Optional[str] = None, current_user: User = Depends(get_current_user)):
-    query = {}
-    if tipe:
-        query = {"$or": [{"tipe": tipe}, {"tipe": "both"}]}
-    
-    categories = await db.categories.find(query, {"_id": 0}).to_list(1000)
-    for cat in categories:
-        if isinstance(cat['created_at'], str):
-            cat['created_at'] = datetime.fromisoformat(cat['created_at'])
-    return categories
+    by_tipe = await cached_categories()
+    if not tipe:
+        return documents_response(Category, by_tipe[None])
+    # An unknown tipe matches only the "both" categories, as the old $or query did
+    return documents_response(Category, by_tipe.get(tipe, by_tipe["both"]))
 
 @api_router.delete("/categories/{category_id}")
 async def delete_category(category_id: str, current_user: User = Depends(require_admin)):
-    result = await db.categories.delete_one({"id": category_id})
-    if result.deleted_count == 0:
+    if await repos.categories.delete_one({"id": category_id}) == 0:
         raise HTTPException(status_code=404, detail="Kategori tidak ditemukan")
+    await reference_cache.invalidate("categories")
     return {"message": "Kategori berhasil dihapus"}
 
+# ==================== REPORT ENDPOINTS ====================
+
+MAX_REPORT_MONTHS = 120
+
+# Closed months rarely change, so their ledger rows are cached per (property_id, tahun, bulan), least recently
+# used first. Entries carry the "ledger" version from reference_cache; back-dated transactions,
+# rebuild_ledger.py, generate_data.py and snapshot restores bump it.
+LEDGER_CACHE_KEY = "ledger"
+FINANCIAL_CACHE_MAX_MONTHS = int(os.environ.get('FINANCIAL_CACHE_MAX_MONTHS', '5000'))
+financial_month_cache: OrderedDict = OrderedDict()
+
+def cached_ledger_month(key: tuple, version: int) -> Optional[List[dict]]:
+    entry = financial_month_cache.get(key)
+    if entry is None or entry[0] != version:
+        return None
+    financial_month_cache.move_to_end(key)
+    return entry[1]
+
+def cache_ledger_month(key: tuple, version: int, rows: List[dict]):
+    financial_month_cache[key] = (version, rows)
+    financial_month_cache.move_to_end(key)
+    while len(financial_month_cache) > FINANCIAL_CACHE_MAX_MONTHS:
+        financial_month_cache.popitem(last=False)
+
+def iter_periods(dari_tahun: int, dari_bulan: int, sampai_tahun: int, sampai_bulan: int):
+    tahun, bulan = dari_tahun, dari_bulan
+    while (tahun, bulan) <= (sampai_tahun, sampai_bulan):
+        yield tahun, bulan
+        bulan += 1
+        if bulan > 12:
+            tahun, bulan = tahun + 1, 1
+
+async def get_ledger_rows(property_id: str, periods: List[tuple]) -> dict:
+    now = datetime.now(timezone.utc)
+    open_period = (now.year, now.month)
+    # Read before fetching: an invalidation during the fetch leaves what is cached below stale
+    version = reference_cache.version(LEDGER_CACHE_KEY)
+    rows_by_period = {}
+    for p in periods:
+        rows = cached_ledger_month((property_id, *p), version)
+        if rows is not None:
+            rows_by_period[p] = rows
+    missing = [p for p in periods if p not in rows_by_period]
+    
+    if missing:
+        query = {
+            "property_id": property_id,
+            **period_range_query(datetime(*missing[0], 1), datetime(*missing[-1], 1))
+        }
+        fetched = {p: [] for p in missing}
+        async for row in repos.ledger_monthly.iterate(query):
+            period = (row['tahun'], row['bulan'])
+            if period in fetched:
+                fetched[period].append(row)
+        for period, rows in fetched.items():
+            if period < open_period:
+                cache_ledger_month((property_id, *period), version, rows)
+            rows_by_period[period] = rows
+    
+    return rows_by_period
+
+def summarize_ledger_rows(rows: List[dict]) -> dict:
+    summary = {"pemasukan": {}, "pengeluaran": {}}
+    for row in rows:
+        per_tipe = summary[row['tipe']]
+        per_tipe[row['kategori']] = per_tipe.get(row['kategori'], 0) + row['total']
+    total_pemasukan = sum(summary['pemasukan'].values())
+    total_pengeluaran = sum(summary['pengeluaran'].values())
+    summary.update({
+        "total_pemasukan": total_pemasukan,
+        "total_pengeluaran": total_pengeluaran,
+        "laba": total_pemasukan - total_pengeluaran
+    })
+    return summary
+
+@api_router.get("/reports/financial")
+async def get_financial_report(
+    dari_tahun: int,
+    sampai_tahun: int,
+    dari_bulan: int = Query(1, ge=1, le=12),
+    sampai_bulan: int = Query(12, ge=1, le=12),
+    current_user: User = Depends(require_owner),
+    property_id: str = Depends(get_property_id)
+):
+    periods = list(iter_periods(dari_tahun, dari_bulan, sampai_tahun, sampai_bulan))
+    if not periods:
+        raise HTTPException(status_code=400, detail="Periode awal harus sebelum periode akhir")
+    if len(periods) > MAX_REPORT_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Rentang laporan maksimal {MAX_REPORT_MONTHS} bulan")
+    
+    rows_by_period = await get_ledger_rows(property_id, periods)
+    
+    kategori = {"pemasukan": set(), "pengeluaran": set()}
+    bulanan = []
+    rows_by_year = {}
+    for tahun, bulan in periods:
+        rows = rows_by_period[(tahun, bulan)]
+        for row in rows:
+            kategori[row['tipe']].add(row['kategori'])
+        rows_by_year.setdefault(tahun, []).extend(rows)
+        bulanan.append({"tahun": tahun, "bulan": bulan, **summarize_ledger_rows(rows)})
+    
+    tahunan = [{"tahun": tahun, **summarize_ledger_rows(rows)} for tahun, rows in rows_by_year.items()]
+    
+    return {
+        "dari": {"tahun": dari_tahun, "bulan": dari_bulan},
+        "sampai": {"tahun": sampai_tahun, "bulan": sampai_bulan},
+        "kategori": {tipe: sorted(names) for tipe, names in kategori.items()},
+        "bulanan": bulanan,
+        "tahunan": tahunan
+    }
+
+AGING_BUCKETS = [("0_30", 30), ("31_60", 60), ("61_90", 90), ("90_plus", None)]
+
+def aging_group_fields() -> dict:
+    fields = {
+        bucket: {"$sum": {"$cond": [{"$eq": ["$bucket", bucket]}, "$jumlah", 0]}}
+        for bucket, _ in AGING_BUCKETS
+    }
+    fields["total"] = {"$sum": "$jumlah"}
+    fields["jumlah_tagihan"] = {"$sum": 1}
+    return fields
+
+def aging_rollup_fields() -> dict:
+    fields = {bucket: {"$sum": f"${bucket}"} for bucket, _ in AGING_BUCKETS}
+    fields["total"] = {"$sum": "$total"}
+    fields["jumlah_tagihan"] = {"$sum": "$jumlah_tagihan"}
+    return fields
+
+@api_router.get("/reports/aging")
+async def get_aging_report(current_user: User = Depends(get_current_user), property_id: str = Depends(get_property_id)):
+    now = datetime.now(timezone.utc)
+    umur_hari = {"$floor": {"$divide": [
+        {"$subtract": [now, {"$dateFromParts": {"year": "$tahun", "month": "$bulan", "day": 1}}]},
+        86400000
+    ]}}
+    bucket_switch = {
+        "$switch": {
+            "branches": [
+                {"case": {"$lte": ["$umur_hari", limit]}, "then": bucket}
+                for bucket, limit in AGING_BUCKETS if limit is not None
+            ],
+            "default": AGING_BUCKETS[-1][0]
+        }
+    }
+    
+    # Bills are collapsed per rental before the $lookup stages so joins scale with rentals, not bills
+    pipeline = [
+        {"$match": {"property_id": property_id, "status": "belum_bayar"}},
+        {"$project": {"_id": 0, "rental_id": 1, "jumlah": 1, "umur_hari": umur_hari}},
+        {"$addFields": {"bucket": bucket_switch}},
+        {"$group": {"_id": "$rental_id", **aging_group_fields()}},
+        {"$lookup": {"from": "rentals", "localField": "_id", "foreignField": "id", "as": "rental"}},
+        {"$unwind": "$rental"},
+        {"$lookup": {"from": "tenants", "localField": "rental.tenant_id", "foreignField": "id", "as": "tenant"}},
+        {"$lookup": {"from": "rooms", "localField": "rental.room_id", "foreignField": "id", "as": "room"}},
+        {"$addFields": {
+            "tenant_id": "$rental.tenant_id",
+            "room_id": "$rental.room_id",
+            "tenant_nama": {"$arrayElemAt": ["$tenant.nama", 0]},
+            "room_nomor": {"$arrayElemAt": ["$room.nomor_kamar", 0]}
+        }},
+        {"$facet": {
+            "per_penghuni": [
+                {"$group": {"_id": "$tenant_id", "tenant_nama": {"$first": "$tenant_nama"}, **aging_rollup_fields()}},
+                {"$project": {"_id": 0, "tenant_id": "$_id", "tenant_nama": 1,
+                              **{k: 1 for k in aging_rollup_fields()}}},
+                {"$sort": {"total": -1}}
+            ],
+            "per_kamar": [
+                {"$group": {"_id": "$room_id", "room_nomor": {"$first": "$room_nomor"}, **aging_rollup_fields()}},
+                {"$project": {"_id": 0, "room_id": "$_id", "room_nomor": 1,
+                              **{k: 1 for k in aging_rollup_fields()}}},
+                {"$sort": {"total": -1}}
+            ],
+            "total": [
+                {"$group": {"_id": None, **aging_rollup_fields()}},
+                {"$project": {"_id": 0}}
+            ]
+        }}
+    ]
+    
+    result = (await repos.bills.aggregate(pipeline))[0]
+    empty_total = {k: 0 for k in aging_rollup_fields()}
+    
+    return {
+        "per_tanggal": now.isoformat(),
+        "buckets": [bucket for bucket, _ in AGING_BUCKETS],
+        "per_penghuni": result['per_penghuni'],
+        "per_kamar": result['per_kamar'],
+        "total": result['total'][0] if result['total'] else empty_total
+    }
+
+async def invalidate_occupancy_from(property_id: str, tanggal: datetime):
+    """Drop precomputed occupancy for months changed by a backdated rental."""
+    tanggal = tanggal.astimezone(timezone.utc) if tanggal.tzinfo else tanggal
+    await repos.occupancy_monthly.delete_many({"property_id": property_id, **period_range_query(tanggal, None)})
+
+async def store_occupancy_month(property_id: str, result: dict):
+    result = {"property_id": property_id, **result}
+    await repos.occupancy_monthly.replace_one(
+        {"property_id": property_id, "tahun": result['tahun'], "bulan": result['bulan']}, result, upsert=True
+    )
+
+async def snapshot_previous_month_occupancy() -> dict:
+    now = datetime.now(timezone.utc)
+    tahun, bulan = (now.year, now.month - 1) if now.month > 1 else (now.year - 1, 12)
+    tingkat_hunian = {}
+    async for prop in repos.properties.iterate({}, {"id": 1}):
+        rentals, rooms = await load_occupancy_inputs(prop['id'], datetime(tahun, bulan, 1, tzinfo=timezone.utc))
+        result = compute_month_occupancy(rentals, rooms, tahun, bulan, now.date())
+        await store_occupancy_month(prop['id'], result)
+        tingkat_hunian[prop['id']] = result['tingkat_hunian']
+    return {"tahun": tahun, "bulan": bulan, "tingkat_hunian": tingkat_hunian}
+
+async def load_occupancy_inputs(property_id: str, dari: datetime) -> tuple:
+    rentals = await repos.rentals.find(
+        {"property_id": property_id,
+         "$or": [{"tanggal_selesai": None}, {"tanggal_selesai": {"$gte": dari.isoformat()}}]},
+        {"room_id": 1, "tanggal_mulai": 1, "tanggal_selesai": 1}
+    )
+    rooms = await repos.rooms.find({"property_id": property_id}, {"id": 1, "nomor_kamar": 1, "created_at": 1})
+    return rentals, rooms
+
+@api_router.get("/reports/occupancy")
+async def get_occupancy_report(
+    dari_tahun: int,
+    sampai_tahun: int,
+    dari_bulan: int = Query(1, ge=1, le=12),
+    sampai_bulan: int = Query(12, ge=1, le=12),
+    harian: bool = False,
+    current_user: User = Depends(get_current_user),
+    property_id: str = Depends(get_property_id)
+):
+    now = datetime.now(timezone.utc)
+    open_period = (now.year, now.month)
+    periods = [p for p in iter_periods(dari_tahun, dari_bulan, sampai_tahun, sampai_bulan) if p <= open_period]
+    if not periods:
+        raise HTTPException(status_code=400, detail="Periode tidak valid")
+    if len(periods) > MAX_REPORT_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Rentang laporan maksimal {MAX_REPORT_MONTHS} bulan")
+    
+    query = {"property_id": property_id, **period_range_query(datetime(*periods[0], 1), datetime(*periods[-1], 1))}
+    stored = {
+        (doc['tahun'], doc['bulan']): doc
+        async for doc in repos.occupancy_monthly.iterate(query)
+    }
+    missing = [p for p in periods if p not in stored or p == open_period]
+    
+    if missing:
+        rentals, rooms = await load_occupancy_inputs(property_id, datetime(*missing[0], 1, tzinfo=timezone.utc))
+        for tahun, bulan in missing:
+            result = compute_month_occupancy(rentals, rooms, tahun, bulan, now.date())
+            if (tahun, bulan) < open_period:
+                await store_occupancy_month(property_id, result)
+            stored[(tahun, bulan)] = result
+    
+    bulanan = [stored[p] for p in periods]
+    kamar_hari_terisi = sum(m['kamar_hari_terisi'] for m in bulanan)
+    kamar_hari_tersedia = sum(m['kamar_hari_tersedia'] for m in bulanan)
+    sewa_selesai = sum(m['sewa_selesai'] for m in bulanan)
+    total_lama_sewa_hari = sum(m['total_lama_sewa_hari'] for m in bulanan)
+    
+    hari_kosong_per_kamar = {}
+    for month in bulanan:
+        for kamar in month['per_kamar']:
+            entry = hari_kosong_per_kamar.setdefault(kamar['room_id'], {
+                "room_id": kamar['room_id'],
+                "nomor_kamar": kamar['nomor_kamar'],
+                "hari_terisi": 0,
+                "hari_kosong": 0
+            })
+            entry['hari_terisi'] += kamar['hari_terisi']
+            entry['hari_kosong'] += kamar['hari_kosong']
+    
+    return {
+        "tingkat_hunian": round(kamar_hari_terisi / kamar_hari_tersedia, 4) if kamar_hari_tersedia else 0,
+        "rata_rata_lama_sewa_hari": round(total_lama_sewa_hari / sewa_selesai, 1) if sewa_selesai else None,
+        "per_kamar": sorted(hari_kosong_per_kamar.values(), key=lambda k: -k['hari_kosong']),
+        "bulanan": [
+            {k: v for k, v in month.items() if k not in ("per_kamar", "property_id") and (harian or k != "harian")}
+            for month in bulanan
+        ]
+    }
+
 # ==================== DASHBOARD ENDPOINTS ====================
 
 @api_router.get("/dashboard", response_model=DashboardStats)
-async def get_dashboard(current_user: User = Depends(get_current_user)):
-    rooms = await db.rooms.find({}, {"_id": 0}).to_list(1000)
+async def get_dashboard(current_user: User = Depends(get_current_user), property_id: str = Depends(get_property_id)):
+    rooms = await cached_rooms(property_id)
     jumlah_kamar_terisi = sum(1 for r in rooms if r['status'] == 'terisi')
     jumlah_kamar_kosong = sum(1 for r in rooms if r['status'] == 'kosong')
     
-    bills = await db.bills.find({"status": "belum_bayar"}, {"_id": 0}).to_list(1000)
+    bills = await repos.bills.find({"property_id": property_id, "status": "belum_bayar"}, limit=1000)
     jumlah_tagihan_belum_bayar = len(bills)
     
     now = datetime.now(timezone.utc)
-    start_date = datetime(now.year, now.month, 1, tzinfo=timezone.utc)
-    last_day = monthrange(now.year, now.month)[1]
-    end_date = datetime(now.year, now.month, last_day, 23, 59, 59, tzinfo=timezone.utc)
-    
-    transactions = await db.transactions.find({"tipe": "pemasukan"}, {"_id": 0}).to_list(1000)
-    pemasukan_bulan_ini = 0
-    for trans in transactions:
-        trans_date = trans['tanggal']
-        if isinstance(trans_date, str):
-            trans_date = datetime.fromisoformat(trans_date)
-        if start_date <= trans_date <= end_date:
-            pemasukan_bulan_ini += trans['jumlah']
-    
-    maintenances = await db.maintenance.find({"status": {"$ne": "selesai"}}, {"_id": 0}).to_list(1000)
+    totals = await get_ledger_totals(property_id, now.year, now.month)
+    pemasukan_bulan_ini = totals['pemasukan']
+    
+    maintenances = await repos.maintenance.find({"property_id": property_id, "status": {"$ne": "selesai"}}, limit=1000)
     jumlah_laporan_kerusakan = len(maintenances)
     
     tagihan_belum_bayar_list = []
     for bill in bills[:10]:
-        rental = await db.rentals.find_one({"id": bill['rental_id']}, {"_id": 0})
+        rental = await repos.rentals.find_one({"id": bill['rental_id']})
         if rental:
-            tenant = await db.tenants.find_one({"id": rental['tenant_id']}, {"_id": 0})
-            room = await db.rooms.find_one({"id": rental['room_id']}, {"_id": 0})
+            tenant = await repos.tenants.find_one({"id": rental['tenant_id']})
+            room = await repos.rooms.find_one({"id": rental['room_id']})
             if tenant and room:
                 tagihan_belum_bayar_list.append({
                     "bill_id": bill['id'],
@@ -983,6 +1876,307 @@ async def get_dashboard(current_user: User = Depends(get_current_user)):
         kamar_kosong=kamar_kosong_list
     )
 
+# ==================== SCHEDULER ENDPOINTS ====================
+
+async def scheduled_monthly_bills() -> dict:
+    return {"count": await create_monthly_bills()}
+
+scheduler.add_job("generate_monthly_bills", SCHEDULE_MONTHLY_BILLS, scheduled_monthly_bills)
+scheduler.add_job("snapshot_occupancy", SCHEDULE_OCCUPANCY_SNAPSHOT, snapshot_previous_month_occupancy)
+if ARCHIVE_HORIZON_MONTHS > 0:
+    scheduler.add_job("archive_settled_records", SCHEDULE_ARCHIVE, archive_settled_records)
+
+@api_router.get("/scheduler/jobs")
+async def get_scheduler_jobs(current_user: User = Depends(require_super_admin)):
+    return scheduler.describe()
+
+@api_router.get("/scheduler/runs")
+async def get_scheduler_runs(
+    job: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(require_super_admin)
+):
+    query = {"job": job} if job else {}
+    return await repos.scheduler_runs.find(query, sort=[("started_at", -1)], limit=limit)
+
+@api_router.post("/scheduler/jobs/{job_name}/run")
+async def run_scheduler_job(job_name: str, current_user: User = Depends(require_super_admin)):
+    job = scheduler.jobs.get(job_name)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job tidak ditemukan")
+    run = await scheduler.run_if_due(job, force=True)
+    if run is None:
+        raise HTTPException(status_code=409, detail="Job sedang berjalan di worker lain")
+    return run
+
+# ==================== JOB ENDPOINTS ====================
+
+async def job_generate_monthly_bills(ctx, payload: dict) -> dict:
+    return {"count": await create_monthly_bills(payload.get('property_id'), progress=ctx.progress)}
+
+async def job_kwitansi_batch(ctx, payload: dict) -> dict:
+    bulan, tahun = payload['bulan'], payload['tahun']
+    entries = await load_paid_bills_for_period(payload['property_id'], bulan, tahun)
+    filename = f"kwitansi_{tahun}_{bulan:02d}_{ctx.id[:8]}.zip"
+    # Written under a private name and renamed when complete, so a partial archive is never served
+    handle, partial = tempfile.mkstemp(suffix=".part", dir=JOB_RESULTS_DIR)
+    try:
+        with os.fdopen(handle, "wb") as f, zipfile.ZipFile(f, "w", zipfile.ZIP_STORED) as archive:
+            index = 0
+            async for (bill, room, tenant), pdf in render_kwitansi_parallel(entries):
+                archive.writestr(kwitansi_archive_name(bill, tenant), pdf)
+                index += 1
+                await ctx.progress(index, len(entries))
+        os.replace(partial, JOB_RESULTS_DIR / filename)
+    except BaseException:
+        os.unlink(partial)
+        raise
+    
+    return {"file": filename, "count": len(entries)}
+
+job_queue.register("generate_monthly_bills", job_generate_monthly_bills)
+job_queue.register("kwitansi_batch", job_kwitansi_batch)
+
+@api_router.post("/jobs/generate-monthly-bills", dependencies=[Depends(rate_limit_user("generate_monthly"))])
+async def enqueue_generate_monthly_bills(current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)):
+    job = await job_queue.enqueue("generate_monthly_bills", {"property_id": property_id}, created_by=current_user.id)
+    return {"job_id": job['id'], "status": job['status']}
+
+@api_router.post("/jobs/kwitansi-batch", dependencies=[Depends(rate_limit_user("kwitansi"))])
+async def enqueue_kwitansi_batch(
+    bulan: int = Query(..., ge=1, le=12),
+    tahun: int = Query(...),
+    current_user: User = Depends(require_admin),
+    property_id: str = Depends(get_property_id)
+):
+    job = await job_queue.enqueue(
+        "kwitansi_batch", {"property_id": property_id, "bulan": bulan, "tahun": tahun}, created_by=current_user.id
+    )
+    return {"job_id": job['id'], "status": job['status']}
+
+async def get_property_job(job_id: str, property_id: str) -> dict:
+    """The job, if it was enqueued for ``property_id``; another property's job is reported as missing."""
+    job = await job_queue.get(job_id)
+    if not job or job['payload'].get('property_id') != property_id:
+        raise HTTPException(status_code=404, detail="Job tidak ditemukan")
+    return job
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str, current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)):
+    return await get_property_job(job_id, property_id)
+
+@api_router.get("/jobs/{job_id}/download")
+async def download_job_result(
+    job_id: str, current_user: User = Depends(require_admin), property_id: str = Depends(get_property_id)
+):
+    job = await get_property_job(job_id, property_id)
+    if job['status'] != "success" or not (job.get('result') or {}).get('file'):
+        raise HTTPException(status_code=400, detail="Job belum selesai atau tidak menghasilkan file")
+    path = JOB_RESULTS_DIR / Path(job['result']['file']).name
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="File hasil job sudah dihapus")
+    return FileResponse(path=str(path), filename=path.name)
+
+# ==================== EVENT STREAM ENDPOINTS ====================
+
+def format_sse(event: dict) -> str:
+    return f"id: {event.get('id', '')}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+def event_visible_to(event: dict, user: User) -> bool:
+    property_id = event.get('data', {}).get('property_id')
+    return user.role == "super_admin" or property_id is None or property_id in user.property_ids
+
+async def stream_events(request: Request, user: User):
+    subscriber = event_bus.subscribe()
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=EVENT_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+            if event_visible_to(event, user):
+                yield format_sse(event)
+            if subscriber.dropped and subscriber.queue.empty():
+                break
+    finally:
+        event_bus.unsubscribe(subscriber)
+
+@api_router.get("/events/stream")
+async def get_event_stream(request: Request, token: str):
+    # EventSource cannot send an Authorization header, so the token comes as a query parameter
+    user = await get_user_from_token(token)
+    return StreamingResponse(
+        stream_events(request, user),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ==================== SYNC ENDPOINTS ====================
+
+SYNC_MODELS = {
+    "users": User, "properties": Property, "rooms": Room, "tenants": Tenant, "rentals": Rental,
+    "bills": Bill, "maintenance": Maintenance, "transactions": Transaction, "categories": Category,
+}
+# Synced collections whose documents belong to one property
+SYNC_SCOPED = {"rooms", "tenants", "rentals", "bills", "maintenance", "transactions"}
+
+def sync_scopes(current_user: User, property_id: str) -> dict:
+    """Query per synced collection limited to what the user may read; collections they cannot read are left out."""
+    scopes = {name: {"property_id": property_id} for name in SYNC_SCOPED}
+    scopes["categories"] = {}
+    if current_user.role == "super_admin":
+        scopes["users"] = {}
+        scopes["properties"] = {}
+    else:
+        scopes["properties"] = {"id": {"$in": current_user.property_ids}}
+    return scopes
+
+async def find_sync_page(repo, query: dict, projection: dict) -> tuple:
+    """Oldest SYNC_PAGE_SIZE changes, rounded up to whole rev groups; returns (docs, truncated)."""
+    docs = await repo.find(query, projection, sort=[("rev", 1)], limit=SYNC_PAGE_SIZE)
+    if len(docs) < SYNC_PAGE_SIZE:
+        return docs, False
+    # update_many stamps one rev on many documents; a page never splits them, or the cursor would skip the rest
+    last = docs[-1]['rev']
+    docs = [doc for doc in docs if doc['rev'] != last]
+    docs += await repo.find({**query, "rev": last}, projection)
+    return docs, True
+
+@api_router.get("/sync")
+async def sync(
+    since: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+    property_id: str = Depends(get_property_id)
+):
+    """Documents changed and deleted after ``since``, plus the ``rev`` to send as ``since`` next time.
+
+    Without ``since`` (or with one older than the tombstone horizon, flagged by ``reset``) every
+    readable document is returned and the client should replace its cache. While ``has_more`` is
+    true the client calls again with the returned ``rev``.
+    """
+    now = revision_clock.next()
+    horizon = now - SYNC_TOMBSTONE_DAYS * 86400 * 1_000_000
+    reset = 0 < since < horizon
+    if reset:
+        since = 0
+    cursor = max(since, now - int(SYNC_SETTLE_SECONDS * 1_000_000))
+    has_more = False
+
+    changes = {}
+    scopes = sync_scopes(current_user, property_id)
+    for name, scope in scopes.items():
+        model = SYNC_MODELS[name]
+        query = {**scope, "rev": {"$gt": since}} if since else scope
+        docs, truncated = await find_sync_page(repos.all[name], query, {**model_projection(model), "rev": 1})
+        if truncated:
+            has_more = True
+            cursor = min(cursor, docs[-1]['rev'])
+        changes[name] = [shape_document(model, doc) for doc in docs]
+
+    deleted = {}
+    if since:
+        unscoped = [name for name in scopes if name not in SYNC_SCOPED]
+        tombstones, truncated = await find_sync_page(repos.tombstones, {
+            "rev": {"$gt": since},
+            "$or": [{"property_id": property_id, "collection": {"$in": list(SYNC_SCOPED)}},
+                    {"collection": {"$in": unscoped}}]
+        }, {"collection": 1, "id": 1, "rev": 1})
+        if truncated:
+            has_more = True
+            cursor = min(cursor, tombstones[-1]['rev'])
+        for tombstone in tombstones:
+            deleted.setdefault(tombstone['collection'], []).append(tombstone['id'])
+
+    return DocumentResponse({
+        "rev": cursor, "reset": reset or not since, "has_more": has_more, "changes": changes, "deleted": deleted
+    })
+
+# ==================== SYSTEM ENDPOINTS ====================
+
+@api_router.get("/system/pool")
+async def get_pool_stats(current_user: User = Depends(require_super_admin)):
+    return pool_stats.snapshot()
+
+@api_router.post("/system/profiler")
+async def start_profiler(profiler_input: ProfilerStart, current_user: User = Depends(require_super_admin)):
+    if profiler_input.max_requests is None and profiler_input.duration_seconds is None:
+        raise HTTPException(status_code=400, detail="Isi max_requests atau duration_seconds")
+    try:
+        session = profiler.start(
+            profiler_input.mode, profiler_input.path_pattern,
+            profiler_input.max_requests, profiler_input.duration_seconds
+        )
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return session.describe()
+
+@api_router.get("/system/profiler")
+async def get_profiler_status(current_user: User = Depends(require_super_admin)):
+    return {
+        "session": profiler.session.describe() if profiler.session else None,
+        "profiles": profiler.list_profiles()
+    }
+
+@api_router.delete("/system/profiler")
+async def stop_profiler(current_user: User = Depends(require_super_admin)):
+    filename = profiler.finish()
+    if filename is None:
+        raise HTTPException(status_code=404, detail="Tidak ada sesi profiling yang berjalan")
+    return {"file": filename}
+
+@api_router.get("/system/profiler/profiles/{name}")
+async def download_profile(name: str, current_user: User = Depends(require_super_admin)):
+    path = PROFILES_DIR / Path(name).name
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Profil tidak ditemukan")
+    return FileResponse(path=str(path), filename=path.name)
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    checks = {"indexes": indexes_ready}
+    if STORAGE_BACKEND != "memory":
+        checks["mongo"] = False
+        try:
+            await asyncio.wait_for(client.admin.command("ping"), timeout=READINESS_PING_TIMEOUT_SECONDS)
+            checks["mongo"] = True
+        except Exception as exc:
+            logger.warning("Readiness ping failed: %s", exc)
+    
+    ready = all(checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "checks": checks, "pool": pool_stats.snapshot()}
+    )
+
+@app.get("/metrics")
+async def metrics():
+    pool = pool_stats.snapshot()
+    gauges = {
+        "siskosan_mongo_pool_open_connections": pool['open_connections'],
+        "siskosan_mongo_pool_checked_out": pool['checked_out'],
+        "siskosan_mongo_pool_waiting": pool['waiting'],
+        "siskosan_mongo_pool_checkouts_total": pool['checkouts_total'],
+        "siskosan_mongo_pool_checkout_failures_total": sum(pool['checkout_failures'].values()),
+        "siskosan_mongo_pool_wait_seconds_total": pool['wait_seconds_total'],
+        "siskosan_mongo_pool_wait_seconds_max": pool['wait_seconds_max'],
+        "siskosan_sse_subscribers": len(event_bus.subscribers),
+        "siskosan_sse_dropped_total": event_bus.dropped_count,
+        "siskosan_reference_cache_hits_total": reference_cache.hits,
+        "siskosan_reference_cache_misses_total": reference_cache.misses,
+    }
+    for route_class, cap in limiter.caps.items():
+        gauges[f"siskosan_limiter_{route_class}_in_flight"] = cap.in_flight
+        gauges[f"siskosan_limiter_{route_class}_waiting"] = cap.waiting
+    return PlainTextResponse(metrics_registry.render(gauges), media_type="text/plain; version=0.0.4")
+
 app.include_router(api_router)
 
 app.add_middleware(
@@ -993,12 +2187,127 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(ProfilerMiddleware, profiler=profiler)
+
+# Added last so it is the outermost middleware and times every request
+app.add_middleware(MetricsMiddleware)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
+async def ensure_indexes():
+    # Every scoped query filters on property_id first, so it leads each compound index
+    await repos.properties.create_index("id", unique=True)
+    await repos.transactions.create_index([("property_id", 1), ("tanggal", 1)])
+    await repos.bills.create_index([("property_id", 1), ("tahun", 1), ("bulan", 1)])
+    await repos.bills.create_index([("property_id", 1), ("status", 1), ("tahun", 1), ("bulan", 1)])
+    await repos.bills.create_index("rental_id")
+    await repos.rentals.create_index("id")
+    await repos.rentals.create_index([("property_id", 1), ("status", 1)])
+    await repos.tenants.create_index("id")
+    await repos.rooms.create_index("id")
+    await repos.rooms.create_index([("property_id", 1), ("nomor_kamar", 1)])
+    await repos.maintenance.create_index([("property_id", 1), ("status", 1)])
+    await repos.tenants.create_index([("property_id", 1), ("nama", "text")], default_language="none")
+    await repos.tenants.create_index([("property_id", 1), ("nama_norm", 1)])
+    await repos.tenants.create_index([("property_id", 1), ("telepon_norm", 1)])
+    await repos.tenants.create_index([("property_id", 1), ("ktp_norm", 1)])
+    await repos.occupancy_monthly.create_index([("property_id", 1), ("tahun", 1), ("bulan", 1)], unique=True)
+    await repos.ledger_monthly.create_index(
+        [("property_id", 1), ("tahun", 1), ("bulan", 1), ("tipe", 1), ("kategori", 1)], unique=True
+    )
+    await repos.bills_archive.create_index("id")
+    await repos.bills_archive.create_index([("property_id", 1), ("tahun", 1), ("bulan", 1)])
+    await repos.transactions_archive.create_index("id")
+    await repos.transactions_archive.create_index([("property_id", 1), ("tanggal", 1)])
+    await repos.cache_versions.create_index("key", unique=True)
+    for name in SYNCED_COLLECTIONS:
+        await repos.all[name].create_index([("property_id", 1), ("rev", 1)] if name in SYNC_SCOPED else "rev")
+    await repos.tombstones.create_index("rev")
+    await repos.tombstones.create_index("deleted_at", expireAfterSeconds=SYNC_TOMBSTONE_DAYS * 86400)
+
+async def startup_indexes():
+    global indexes_ready
+    await ensure_indexes()
+    await ensure_default_property()
+    await backfill_tenant_search_keys()
+    await backfill_revisions()
+    indexes_ready = True
+
+async def startup_event_source():
+    global event_source
+    if EVENT_CHANGE_STREAM == "off" or STORAGE_BACKEND == "memory":
+        return
+    hello = await client.admin.command("hello")
+    if "setName" not in hello:
+        logger.info("No replica set detected, live events stay in-process")
+        return
+    event_source = MongoChangeStreamSource(db.events, event_bus)
+    await event_source.start()
+
+async def startup_slow_log():
+    if SLOW_LOG_ENABLED:
+        slow_log.start()
+
+async def shutdown_slow_log():
+    if SLOW_LOG_ENABLED:
+        slow_log.stop()
+
+async def startup_scheduler():
+    if SCHEDULER_ENABLED and STORAGE_BACKEND != "memory":
+        await scheduler.start()
+
+async def startup_job_queue():
+    if STORAGE_BACKEND != "memory":
+        await job_queue.start()
+
+async def startup_limiter():
+    if use_mongo_buckets:
+        await limiter.store.start()
+
+async def startup_reference_cache():
+    # A single in-memory process invalidates locally; polling is only for other workers' writes
+    if STORAGE_BACKEND != "memory":
+        await reference_cache.start()
+
+async def shutdown_reference_cache():
+    await reference_cache.stop()
+
+async def shutdown_job_queue():
+    await job_queue.stop()
+
+async def shutdown_scheduler():
+    await scheduler.stop()
+
+async def shutdown_event_source():
+    if event_source:
+        await event_source.stop()
+
+async def shutdown_kwitansi_executor():
+    if kwitansi_executor:
+        kwitansi_executor.shutdown(cancel_futures=True)
+
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    client.close()
+
+STARTUP_STEPS = [
+    startup_indexes,
+    startup_event_source,
+    startup_slow_log,
+    startup_scheduler,
+    startup_job_queue,
+    startup_limiter,
+    startup_reference_cache,
+]
+SHUTDOWN_STEPS = [
+    shutdown_slow_log,
+    shutdown_reference_cache,
+    shutdown_job_queue,
+    shutdown_scheduler,
+    shutdown_event_source,
+    shutdown_kwitansi_executor,
+    shutdown_db_client,
+]
\ No newline at end of file
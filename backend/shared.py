@@ -0,0 +1,34 @@
+"""Constants and helpers used by both server.py and the offline scripts.
+
+Importing this module creates no Mongo client, executor or log handler, so
+scripts such as generate_data.py can use it without starting the API.
+"""
+import os
+import re
+
+# Data written before properties existed, and super admin requests without X-Property-Id, use this property
+DEFAULT_PROPERTY_ID = os.environ.get('DEFAULT_PROPERTY_ID', 'default')
+DEFAULT_PROPERTY_NAME = os.environ.get('DEFAULT_PROPERTY_NAME', 'Kos Utama')
+
+
+def normalize_digits(value: str) -> str:
+    return re.sub(r"\D", "", value or "")
+
+
+def normalize_phone(value: str) -> str:
+    digits = normalize_digits(value)
+    if digits.startswith("62"):
+        digits = "0" + digits[2:]
+    return digits
+
+
+def tenant_search_keys(tenant: dict) -> dict:
+    """Normalized keys stored on each tenant so prefix searches can use an index."""
+    keys = {}
+    if tenant.get('nama') is not None:
+        keys['nama_norm'] = " ".join(tenant['nama'].lower().split())
+    if tenant.get('telepon') is not None:
+        keys['telepon_norm'] = normalize_phone(tenant['telepon'])
+    if tenant.get('ktp') is not None:
+        keys['ktp_norm'] = normalize_digits(tenant['ktp'])
+    return keys
@@ -0,0 +1,200 @@
+"""Slow-request and slow-query log with route attribution.
+
+``SlowQueryListener`` records every Mongo command issued during a request
+(collection, redacted filter shape, duration, documents returned) on the
+request's ``RequestDBStats``. When the request finishes, ``SlowLog`` logs it
+if it exceeded the request threshold, together with its commands, and logs
+each command over the query threshold. A sample of slow reads is re-run with
+``explain`` in the background to flag collection scans.
+
+Records go through a ``QueueHandler``; a ``QueueListener`` thread does the
+actual I/O, so logging never blocks the event loop.
+"""
+import asyncio
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+from typing import Optional
+
+from pymongo import monitoring
+
+from metrics import RequestDBStats, current_request
+
+MAX_LOGGED_COMMANDS = 200
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# Session and cluster metadata pymongo adds to commands; explain rejects or does not need them
+COMMAND_METADATA_KEYS = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "autocommit", "startTransaction"}
+
+slow_logger = logging.getLogger("siskosan.slow")
+
+
+def redact(value):
+    """Keep keys and $operators, replace every literal with '?'."""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value[:3]]
+    return "?"
+
+
+def command_shape(command_name: str, command: dict):
+    if command_name in ("find", "count", "distinct"):
+        return redact(command.get("filter", command.get("query", {})))
+    if command_name == "aggregate":
+        return [
+            {name: redact(body) if name == "$match" else "..." for name, body in stage.items()}
+            for stage in command.get("pipeline", [])
+        ]
+    if command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes", [])
+        return redact(statements[0].get("q", {})) if statements else {}
+    if command_name == "findAndModify":
+        return redact(command.get("query", {}))
+    return None
+
+
+def docs_returned(reply: dict) -> Optional[int]:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        batch = cursor.get("firstBatch", cursor.get("nextBatch"))
+        if batch is not None:
+            return len(batch)
+    if "n" in reply:
+        return reply["n"]
+    return None
+
+
+def find_collscan(plan) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(find_collscan(v) for k, v in plan.items() if k != "rejectedPlans")
+    if isinstance(plan, list):
+        return any(find_collscan(item) for item in plan)
+    return False
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    def __init__(self, slow_query_ms: float, on_background_slow_query=None):
+        self.slow_query_ms = slow_query_ms
+        self.on_background_slow_query = on_background_slow_query
+        self.lock = threading.Lock()
+        self.pending = {}
+
+    def started(self, event):
+        with self.lock:
+            self.pending[(event.connection_id, event.request_id)] = (event.command, event.database_name)
+
+    def succeeded(self, event):
+        self.finish(event, event.reply)
+
+    def failed(self, event):
+        self.finish(event, None)
+
+    def finish(self, event, reply):
+        with self.lock:
+            command, database = self.pending.pop((event.connection_id, event.request_id), (None, None))
+        if command is None:
+            return
+
+        collection = command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = command.get("collection")
+        record = {
+            "command": event.command_name,
+            "collection": collection if isinstance(collection, str) else None,
+            "duration_ms": round(event.duration_micros / 1000, 2),
+            "docs": docs_returned(reply) if reply is not None else None,
+            "failed": reply is None,
+            "database": database,
+            "raw": command
+        }
+
+        stats: Optional[RequestDBStats] = current_request.get()
+        if stats is not None:
+            if len(stats.command_log) < MAX_LOGGED_COMMANDS:
+                stats.command_log.append(record)
+        elif record["duration_ms"] >= self.slow_query_ms and self.on_background_slow_query:
+            self.on_background_slow_query(record)
+
+
+class SlowLog:
+    def __init__(self, client, slow_request_ms: float, slow_query_ms: float,
+                 explain_sample_rate: float, log_file: Optional[str] = None):
+        self.client = client
+        self.slow_request_ms = slow_request_ms
+        self.slow_query_ms = slow_query_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.listener = SlowQueryListener(slow_query_ms, on_background_slow_query=self.log_background_query)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+        target = logging.FileHandler(log_file) if log_file else logging.StreamHandler()
+        target.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        slow_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        slow_logger.setLevel(logging.INFO)
+        slow_logger.propagate = False
+        self.queue_listener = logging.handlers.QueueListener(log_queue, target)
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue_listener.start()
+
+    def stop(self):
+        self.queue_listener.stop()
+
+    @staticmethod
+    def describe(record: dict) -> dict:
+        return {
+            "command": record["command"],
+            "collection": record["collection"],
+            "shape": command_shape(record["command"], record["raw"]),
+            "duration_ms": record["duration_ms"],
+            "docs": record["docs"],
+            "failed": record["failed"]
+        }
+
+    def on_request_end(self, method: str, route: str, status: int, seconds: float, stats: RequestDBStats):
+        duration_ms = seconds * 1000
+        if duration_ms >= self.slow_request_ms:
+            slow_logger.warning("slow request %s", json.dumps({
+                "method": method,
+                "route": route,
+                "status": status,
+                "duration_ms": round(duration_ms, 1),
+                "db_commands": stats.commands,
+                "db_time_ms": round(sum(r["duration_ms"] for r in stats.command_log), 1),
+                "commands": [self.describe(r) for r in stats.command_log]
+            }, default=str))
+        for record in stats.command_log:
+            if record["duration_ms"] >= self.slow_query_ms:
+                self.log_slow_query(record, route)
+
+    def log_background_query(self, record: dict):
+        # Called from a Motor executor thread; hop onto the loop to schedule any explain
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.log_slow_query, record, "background")
+
+    def log_slow_query(self, record: dict, route: str):
+        slow_logger.warning("slow query %s", json.dumps({"route": route, **self.describe(record)}, default=str))
+        if record["command"] in EXPLAINABLE_COMMANDS and random.random() < self.explain_sample_rate:
+            asyncio.get_running_loop().create_task(self.explain(record, route))
+
+    async def explain(self, record: dict, route: str):
+        current_request.set(None)
+        command = {k: v for k, v in record["raw"].items() if k not in COMMAND_METADATA_KEYS}
+        try:
+            plan = await self.client[record["database"]].command({"explain": command, "verbosity": "queryPlanner"})
+        except Exception as exc:
+            slow_logger.info("explain failed for %s on %s: %s", record["command"], record["collection"], exc)
+            return
+        if find_collscan(plan):
+            slow_logger.warning("collection scan %s", json.dumps({
+                "route": route,
+                "command": record["command"],
+                "collection": record["collection"],
+                "shape": command_shape(record["command"], record["raw"])
+            }, default=str))
@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import bson
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+UPLOADS_DIR = ROOT_DIR / "uploads"
+SNAPSHOTS_DIR = ROOT_DIR / "snapshots"
+MANIFEST_NAME = "manifest.json"
+
+# Reported by index_information() but chosen by the server, not by create_index
+SERVER_INDEX_OPTIONS = ("v", "ns", "textIndexVersion")
+
+
+def index_specs(index_information: dict) -> list:
+    """Index definitions from index_information(), in a form create_index accepts again."""
+    specs = []
+    for name, info in index_information.items():
+        if name == "_id_":
+            continue
+        options = {k: v for k, v in info.items() if k != "key" and k not in SERVER_INDEX_OPTIONS}
+        keys = []
+        for field, direction in info['key']:
+            if field == "_fts":
+                # A text index reports its fields as weights behind the synthetic _fts/_ftsx keys
+                keys.extend((text_field, "text") for text_field in options['weights'])
+            elif field != "_ftsx":
+                keys.append((field, direction))
+        specs.append({"name": name, "keys": keys, "options": options})
+    return specs
+
+
+def add_bytes(archive: tarfile.TarFile, name: str, data: bytes):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    archive.addfile(info, io.BytesIO(data))
+
+
+async def dump_collection(collection, path: Path, batch_size: int) -> int:
+    count = 0
+    with open(path, "wb") as f:
+        async for doc in collection.find({}, batch_size=batch_size):
+            f.write(bson.encode(doc))
+            count += 1
+    return count
+
+
+async def save(args):
+    client = AsyncIOMotorClient(args.mongo_url)
+    db = client[args.db_name]
+    started = time.perf_counter()
+
+    output = Path(args.output) if args.output else (
+        SNAPSHOTS_DIR / f"snapshot_{args.db_name}_{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}.tar.gz"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    names = sorted(n for n in await db.list_collection_names() if not n.startswith("system."))
+    manifest = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "db_name": args.db_name,
+        "collections": {}
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        # Each collection is dumped to a temp file first: tar needs a member's size before its data
+        for name in names:
+            path = Path(workdir) / f"{name}.bson"
+            count = await dump_collection(db[name], path, args.batch_size)
+            indexes = index_specs(await db[name].index_information())
+            manifest['collections'][name] = {"count": count, "indexes": indexes}
+            print(f"✓ Dumped {count} documents from {name}")
+
+        with tarfile.open(output, "w:gz", compresslevel=args.level) as archive:
+            # Manifest first, so restore can read the archive as a single forward stream
+            add_bytes(archive, MANIFEST_NAME, json.dumps(manifest, indent=2, default=str).encode())
+            for name in names:
+                archive.add(Path(workdir) / f"{name}.bson", arcname=f"collections/{name}.bson")
+            if UPLOADS_DIR.exists() and not args.skip_uploads:
+                archive.add(UPLOADS_DIR, arcname="uploads")
+
+    client.close()
+    size_mb = output.stat().st_size / 1024 / 1024
+    print(f"\n✓ Snapshot written to {output} ({size_mb:.1f} MB in {time.perf_counter() - started:.1f}s)")
+
+
+async def restore_collection(collection, stream, batch_size: int, parallel: int) -> int:
+    """insert_many the BSON stream in batches, with up to `parallel` batches in flight."""
+    semaphore = asyncio.Semaphore(parallel)
+    tasks = []
+
+    async def insert_batch(batch: list):
+        try:
+            await collection.insert_many(batch, ordered=False)
+        finally:
+            semaphore.release()
+
+    count = 0
+    batch = []
+    for doc in bson.decode_file_iter(stream):
+        batch.append(doc)
+        if len(batch) == batch_size:
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(insert_batch(batch)))
+            count += len(batch)
+            batch = []
+    if batch:
+        await semaphore.acquire()
+        tasks.append(asyncio.create_task(insert_batch(batch)))
+        count += len(batch)
+    await asyncio.gather(*tasks)
+    return count
+
+
+def restore_upload(archive: tarfile.TarFile, member: tarfile.TarInfo):
+    relative = Path(member.name).relative_to("uploads")
+    target = (UPLOADS_DIR / relative).resolve()
+    if UPLOADS_DIR.resolve() not in target.parents and target != UPLOADS_DIR.resolve():
+        raise ValueError(f"Refusing to write {member.name} outside the uploads directory")
+    if member.isdir():
+        target.mkdir(parents=True, exist_ok=True)
+    elif member.isfile():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with archive.extractfile(member) as src, open(target, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+
+
+async def restore(args):
+    if not args.yes:
+        answer = input(f"Replace every collection in '{args.db_name}' and the uploads directory? [y/N] ")
+        if answer.strip().lower() != "y":
+            print("Aborted")
+            return
+
+    client = AsyncIOMotorClient(args.mongo_url, maxPoolSize=max(args.parallel, 10))
+    db = client[args.db_name]
+    started = time.perf_counter()
+    manifest = None
+    uploads_cleared = False
+
+    # "r|gz" reads the archive as one forward stream: no seeking back into the gzip data
+    with tarfile.open(args.snapshot, "r|gz") as archive:
+        for member in archive:
+            if member.name == MANIFEST_NAME:
+                manifest = json.loads(archive.extractfile(member).read())
+            elif member.name.startswith("collections/"):
+                if manifest is None:
+                    raise ValueError("Snapshot has no manifest before its collections")
+                name = Path(member.name).stem
+                await db[name].drop()
+                count = await restore_collection(
+                    db[name], archive.extractfile(member), args.batch_size, args.parallel
+                )
+                # Indexes are built once over the full collection, not maintained per insert
+                for spec in manifest['collections'][name]['indexes']:
+                    await db[name].create_index(spec['keys'], name=spec['name'], **spec['options'])
+                print(f"✓ Restored {count} documents into {name}")
+            elif member.name == "uploads" or member.name.startswith("uploads/"):
+                if args.skip_uploads:
+                    continue
+                if not uploads_cleared:
+                    shutil.rmtree(UPLOADS_DIR, ignore_errors=True)
+                    UPLOADS_DIR.mkdir()
+                    uploads_cleared = True
+                restore_upload(archive, member)
+
+    # Collections created after the snapshot was taken would otherwise survive the reset
+    if manifest is not None:
+        for name in await db.list_collection_names():
+            if not name.startswith("system.") and name not in manifest['collections']:
+                await db[name].drop()
+                print(f"✓ Dropped {name} (not in snapshot)")
+
+    # Restored versions can equal the ones running workers hold for different data; move every one past them
+    await db.cache_versions.update_many({}, {"$inc": {"version": 1_000_000}})
+    await db.cache_versions.update_one({"key": "ledger"}, {"$setOnInsert": {"version": 1_000_000}}, upsert=True)
+
+    client.close()
+    print(f"\n✓ Restored {args.snapshot} in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot or restore all SISKOSAN collections and uploads")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL"))
+    parser.add_argument("--db-name", default=os.environ.get("DB_NAME"))
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--skip-uploads", action="store_true", help="leave the uploads directory out")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    save_parser = commands.add_parser("save", help="write a .tar.gz snapshot")
+    save_parser.add_argument("--output", help=f"archive path (default: {SNAPSHOTS_DIR.name}/snapshot_<db>_<time>.tar.gz)")
+    save_parser.add_argument("--level", type=int, default=1, help="gzip level; 1 keeps saving disk-bound")
+
+    restore_parser = commands.add_parser("restore", help="drop the collections and load a snapshot")
+    restore_parser.add_argument("snapshot")
+    restore_parser.add_argument("--parallel", type=int, default=8, help="insert_many batches in flight")
+    restore_parser.add_argument("--yes", action="store_true", help="do not ask for confirmation")
+
+    args = parser.parse_args()
+    asyncio.run(save(args) if args.command == "save" else restore(args))
+
+
+if __name__ == "__main__":
+    main()
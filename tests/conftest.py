@@ -0,0 +1,79 @@
+"""Fixtures driving the API in process, backed by the in-memory repositories (no MongoDB needed)."""
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# server reads its configuration at import time. The Motor client it creates connects lazily and is never used
+os.environ["MONGO_URL"] = "mongodb://localhost:27017"
+os.environ["DB_NAME"] = "siskosan_test"
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["SLOW_LOG_ENABLED"] = "false"
+os.environ["SYNC_SETTLE_SECONDS"] = "0"
+os.environ["RATE_LIMIT_LOGIN_USER"] = "3/60"
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from repositories import Repositories  # noqa: E402
+
+PASSWORD = "rahasia123"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def api(monkeypatch):
+    """HTTP client for the app, on empty repositories and fresh limiter buckets and caches."""
+    repos = Repositories.in_memory()
+    repos.track_revisions(server.SYNCED_COLLECTIONS, server.revision_clock)
+    monkeypatch.setattr(server, "repos", repos)
+    monkeypatch.setattr(server.reference_cache, "versions", repos.cache_versions)
+    monkeypatch.setattr(server.reference_cache, "entries", {})
+    monkeypatch.setattr(server.reference_cache, "known", {})
+    monkeypatch.setattr(server.limiter.store, "buckets", {})
+    server.financial_month_cache.clear()
+
+    await server.ensure_indexes()
+    await server.ensure_default_property()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def make_user(api):
+    """Insert a user and return the Authorization header for them."""
+    async def make(email: str, role: str, property_ids=None) -> dict:
+        await server.repos.users.insert_one({
+            "id": str(uuid.uuid4()),
+            "email": email,
+            "password": server.get_password_hash(PASSWORD),
+            "role": role,
+            "property_ids": property_ids or [],
+            "created_at": datetime.now(timezone.utc).isoformat()
+        })
+        return {"Authorization": f"Bearer {server.create_access_token({'sub': email})}"}
+    return make
+
+
+@pytest.fixture
+async def admin(make_user):
+    return await make_user("superadmin@siskosan.com", "super_admin")
+
+
+
+@pytest.fixture
+def kwitansi_pool():
+    """Shut the receipt render pool down after a test that used it."""
+    yield
+    if server.kwitansi_executor:
+        server.kwitansi_executor.shutdown()
+        server.kwitansi_executor = None
@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+TENANT = {"nama": "Joko Widodo", "telepon": "+62 812-0000-0006", "ktp": "3201010101900006", "alamat": "Solo"}
+
+
+@pytest.fixture
+async def settled(api, admin):
+    """A paid bill and a transaction from 2020, well past the archive horizon; returns (bill, transaction)."""
+    room = (await api.post("/api/rooms", headers=admin, json={"nomor_kamar": "E1", "harga": 600000, "fasilitas": "-"})).json()
+    await api.post("/api/rentals", headers=admin, json={
+        "room_id": room["id"], "harga": 600000, "tanggal_mulai": "2020-03-01T00:00:00+00:00", "tenant": TENANT
+    })
+    [bill] = (await api.get("/api/bills", headers=admin)).json()
+    await api.post(f"/api/bills/{bill['id']}/mark-paid", headers=admin, params={"cara_bayar": "tunai"})
+    transaction = await server.record_transaction(server.Transaction(
+        property_id="default", tipe="pengeluaran", jumlah=50000, sumber="Sapu", kategori="lainnya",
+        tanggal=datetime(2020, 3, 5, tzinfo=timezone.utc)
+    ))
+    return bill, transaction
+
+
+async def test_archive_moves_only_settled_old_records(api, admin, settled):
+    bill, transaction = settled
+    result = await server.archive_settled_records()
+    assert (result["bills"], result["transactions"]) == (1, 1)
+
+    assert await server.repos.bills.find_one({"id": bill["id"]}) is None
+    assert await server.repos.bills_archive.find_one({"id": bill["id"]}) is not None
+    # The payment made today is recent and stays hot
+    assert await server.repos.transactions.count({}) == 1
+    assert (await api.get(f"/api/bills/{bill['id']}", headers=admin)).status_code == 200
+
+    listed = await api.get("/api/transactions", headers=admin, params={"include_archived": True})
+    assert transaction["id"] in {t["id"] for t in listed.json()}
+
+    rerun = await server.archive_settled_records()
+    assert (rerun["bills"], rerun["transactions"]) == (0, 0)
+
+
+async def test_archived_records_are_not_sent_to_sync_as_deleted(api, admin, settled):
+    bill, transaction = settled
+    rev = (await api.get("/api/sync", headers=admin)).json()["rev"]
+
+    await server.archive_settled_records()
+    body = (await api.get("/api/sync", headers=admin, params={"since": rev})).json()
+    assert body["deleted"] == {}
+    assert await server.repos.tombstones.count({}) == 0
+
+    # A real delete still leaves a tombstone
+    room = (await api.post("/api/rooms", headers=admin, json={"nomor_kamar": "E2", "harga": 1, "fasilitas": "-"})).json()
+    await api.delete(f"/api/rooms/{room['id']}", headers=admin)
+    body = (await api.get("/api/sync", headers=admin, params={"since": rev})).json()
+    assert body["deleted"] == {"rooms": [room["id"]]}
@@ -0,0 +1,93 @@
+import pytest
+
+from tests.conftest import PASSWORD
+
+pytestmark = pytest.mark.anyio
+
+ROOM = {"nomor_kamar": "A1", "harga": 1500000, "fasilitas": "AC, kamar mandi dalam"}
+TENANT = {"nama": "Budi Santoso", "telepon": "+62 812-3456-7890", "ktp": "3201010101900001", "alamat": "Bandung"}
+
+
+async def test_login_returns_token_for_valid_credentials(api, admin):
+    response = await api.post("/api/auth/login", json={"email": "superadmin@siskosan.com", "password": PASSWORD})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["token_type"] == "bearer"
+    assert body["user"]["role"] == "super_admin"
+    assert "password" not in body["user"]
+
+    me = await api.get("/api/auth/me", headers={"Authorization": f"Bearer {body['access_token']}"})
+    assert me.status_code == 200
+    assert me.json()["email"] == "superadmin@siskosan.com"
+
+
+async def test_login_rejects_wrong_password_and_unknown_email(api, admin):
+    wrong = await api.post("/api/auth/login", json={"email": "superadmin@siskosan.com", "password": "salah"})
+    unknown = await api.post("/api/auth/login", json={"email": "siapa@siskosan.com", "password": PASSWORD})
+    assert wrong.status_code == 401
+    assert unknown.status_code == 401
+
+
+async def test_requests_without_valid_token_are_rejected(api):
+    assert (await api.get("/api/rooms")).status_code in (401, 403)
+    assert (await api.get("/api/rooms", headers={"Authorization": "Bearer bukan-token"})).status_code == 401
+
+
+async def test_owner_cannot_write_rooms(api, make_user):
+    headers = await make_user("owner@siskosan.com", "owner", ["default"])
+    assert (await api.post("/api/rooms", headers=headers, json=ROOM)).status_code == 403
+    assert (await api.get("/api/rooms", headers=headers)).status_code == 200
+
+
+async def test_room_crud(api, admin):
+    created = await api.post("/api/rooms", headers=admin, json=ROOM)
+    assert created.status_code == 200
+    room = created.json()
+    assert room["status"] == "kosong"
+    assert room["property_id"] == "default"
+
+    duplicate = await api.post("/api/rooms", headers=admin, json=ROOM)
+    assert duplicate.status_code == 400
+
+    updated = await api.put(f"/api/rooms/{room['id']}", headers=admin, json={"harga": 1750000})
+    assert updated.status_code == 200
+    assert updated.json()["harga"] == 1750000
+
+    listed = await api.get("/api/rooms", headers=admin)
+    assert [r["harga"] for r in listed.json()] == [1750000]
+
+    assert (await api.delete(f"/api/rooms/{room['id']}", headers=admin)).status_code == 200
+    assert (await api.get(f"/api/rooms/{room['id']}", headers=admin)).status_code == 404
+    assert (await api.get("/api/rooms", headers=admin)).json() == []
+
+
+async def test_rental_occupies_room_and_blocks_deletes(api, admin):
+    room = (await api.post("/api/rooms", headers=admin, json=ROOM)).json()
+    rental = await api.post("/api/rentals", headers=admin, json={
+        "room_id": room["id"], "harga": 1500000, "tanggal_mulai": "2025-01-10T00:00:00+00:00", "tenant": TENANT
+    })
+    assert rental.status_code == 200
+    rental = rental.json()
+
+    assert (await api.get(f"/api/rooms/{room['id']}", headers=admin)).json()["status"] == "terisi"
+    assert (await api.delete(f"/api/rooms/{room['id']}", headers=admin)).status_code == 400
+    assert (await api.delete(f"/api/tenants/{rental['tenant_id']}", headers=admin)).status_code == 400
+
+    ended = await api.post(f"/api/rentals/{rental['id']}/end", headers=admin)
+    assert ended.status_code == 200
+    assert (await api.get(f"/api/rooms/{room['id']}", headers=admin)).json()["status"] == "kosong"
+    assert (await api.delete(f"/api/rooms/{room['id']}", headers=admin)).status_code == 200
+
+
+async def test_tenant_crud(api, admin):
+    tenant = (await api.post("/api/tenants", headers=admin, json=TENANT)).json()
+
+    updated = await api.put(f"/api/tenants/{tenant['id']}", headers=admin, json={"telepon": "+62 813-0000-0000"})
+    assert updated.status_code == 200
+    assert updated.json()["telepon"] == "+62 813-0000-0000"
+
+    found = await api.get("/api/tenants/search", headers=admin, params={"q": "santoso"})
+    assert [t["id"] for t in found.json()] == [tenant["id"]]
+
+    assert (await api.delete(f"/api/tenants/{tenant['id']}", headers=admin)).status_code == 200
+    assert (await api.get(f"/api/tenants/{tenant['id']}", headers=admin)).status_code == 404
@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+import pytest
+
+import server
+from events import DROPPED, EventBus
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeRequest:
+    def __init__(self):
+        self.disconnected = False
+
+    async def is_disconnected(self) -> bool:
+        return self.disconnected
+
+
+def user(role: str, property_ids=()) -> server.User:
+    return server.User(email=f"{role}@siskosan.com", role=role, property_ids=list(property_ids))
+
+
+def test_events_are_visible_within_the_users_properties():
+    own = {"type": "bill.paid", "data": {"property_id": "melati"}}
+    other = {"type": "bill.paid", "data": {"property_id": "mawar"}}
+    everyone = {"type": "system.notice", "data": {}}
+    admin = user("admin", ["melati"])
+
+    assert [server.event_visible_to(e, admin) for e in (own, other, everyone)] == [True, False, True]
+    assert all(server.event_visible_to(e, user("super_admin")) for e in (own, other, everyone))
+
+
+def test_format_sse():
+    event = {"id": "e1", "type": "bill.paid", "data": {"bill_id": "b1"}}
+    chunk = server.format_sse(event)
+    assert chunk.endswith("\n\n")
+    lines = chunk.strip().split("\n")
+    assert lines[:2] == ["id: e1", "event: bill.paid"]
+    assert json.loads(lines[2].removeprefix("data: ")) == event
+
+
+async def test_full_subscriber_is_dropped_without_blocking_others():
+    bus = EventBus(queue_size=2)
+    slow, fast = bus.subscribe(), bus.subscribe()
+    for i in range(3):
+        await bus.publish("tick", n=i)
+        if i < 2:
+            await fast.queue.get()
+
+    assert slow.dropped and slow not in bus.subscribers
+    assert slow.queue.get_nowait() == DROPPED and slow.queue.empty()
+    assert (await fast.queue.get())["data"] == {"n": 2}
+    assert bus.dropped_count == 1
+
+
+async def test_stream_sends_visible_events_then_ends_when_dropped(monkeypatch):
+    bus = EventBus(queue_size=3)
+    monkeypatch.setattr(server, "event_bus", bus)
+    stream = server.stream_events(FakeRequest(), user("admin", ["melati"]))
+    assert await anext(stream) == "retry: 3000\n\n"
+
+    await bus.publish("bill.paid", property_id="mawar", bill_id="lain")
+    await bus.publish("bill.paid", property_id="melati", bill_id="b1")
+    chunk = await anext(stream)
+    assert json.loads(chunk.split("data: ", 1)[1])["data"]["bill_id"] == "b1"
+
+    for i in range(4):
+        await bus.publish("tick", n=i)
+    assert "event: dropped" in await anext(stream)
+    with pytest.raises(StopAsyncIteration):
+        await anext(stream)
+    assert not bus.subscribers
+
+
+async def test_stream_keeps_alive_until_the_client_leaves(monkeypatch):
+    bus = EventBus()
+    monkeypatch.setattr(server, "event_bus", bus)
+    monkeypatch.setattr(server, "EVENT_KEEPALIVE_SECONDS", 0.01)
+    request = FakeRequest()
+    stream = server.stream_events(request, user("super_admin"))
+    await anext(stream)
+
+    assert await anext(stream) == ": keepalive\n\n"
+    request.disconnected = True
+    with pytest.raises(StopAsyncIteration):
+        await asyncio.wait_for(anext(stream), timeout=1)
+    assert not bus.subscribers
+
+
+async def test_api_writes_publish_events(api, admin, monkeypatch):
+    bus = EventBus()
+    monkeypatch.setattr(server, "event_bus", bus)
+    subscriber = bus.subscribe()
+    transaction = {"tipe": "pemasukan", "jumlah": 50000, "sumber": "Parkir", "kategori": "lainnya"}
+    created = (await api.post("/api/transactions", headers=admin, json=transaction)).json()
+
+    event = subscriber.queue.get_nowait()
+    assert event["type"] == "transaction.created"
+    assert event["data"] == {"property_id": "default", "transaction_id": created["id"], "tipe": "pemasukan",
+                             "jumlah": 50000, "kategori": "lainnya"}
+
+
+async def test_event_stream_requires_a_valid_token(api):
+    assert (await api.get("/api/events/stream", params={"token": "bukan-token"})).status_code == 401
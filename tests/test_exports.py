@@ -0,0 +1,79 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+TENANT = {"nama": "Hadi Susanto", "telepon": "+62 812-0000-0007", "ktp": "3201010101900007", "alamat": "Garut"}
+
+
+async def record(tahun: int, bulan: int, jumlah: float, sumber: str, property_id: str = "default"):
+    await server.record_transaction(server.Transaction(
+        property_id=property_id, tipe="pemasukan", jumlah=jumlah, sumber=sumber, kategori="lainnya",
+        tanggal=datetime(tahun, bulan, 10, tzinfo=timezone.utc)
+    ))
+
+
+@pytest.fixture
+async def history(api, admin):
+    """Transactions in three months of 2024, one in another property, and a bill from 2023."""
+    await record(2024, 1, 100000, "Januari")
+    await record(2024, 2, 200000, "Februari, \"lunas\"")
+    await record(2024, 3, 300000, "Maret")
+    other = (await api.post("/api/properties", headers=admin, json={"nama": "Kos Mawar"})).json()["id"]
+    await record(2024, 2, 999000, "Milik properti lain", other)
+
+    room = (await api.post("/api/rooms", headers=admin, json={"nomor_kamar": "F1", "harga": 500000, "fasilitas": "-"})).json()
+    await api.post("/api/rentals", headers=admin, json={
+        "room_id": room["id"], "harga": 500000, "tanggal_mulai": "2023-05-01T00:00:00+00:00", "tenant": TENANT
+    })
+
+
+async def test_transactions_export_csv_is_scoped_and_ordered(api, admin, history):
+    response = await api.get("/api/transactions/export", headers=admin)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="transaksi.csv"' in response.headers["content-disposition"]
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert list(rows[0]) == server.TRANSACTION_EXPORT_FIELDS
+    assert [r["sumber"] for r in rows] == ["Januari", "Februari, \"lunas\"", "Maret"]
+    assert [float(r["jumlah"]) for r in rows] == [100000, 200000, 300000]
+
+
+async def test_transactions_export_ndjson_with_date_range(api, admin, history):
+    params = {"format": "ndjson", "dari": "2024-02-01T00:00:00Z", "sampai": "2024-02-29T23:59:59Z"}
+    response = await api.get("/api/transactions/export", headers=admin, params=params)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    [row] = [json.loads(line) for line in response.text.splitlines()]
+    assert set(row) == set(server.TRANSACTION_EXPORT_FIELDS)
+    assert (row["sumber"], row["jumlah"]) == ("Februari, \"lunas\"", 200000)
+
+
+async def test_export_is_written_in_batches(api, admin, history, monkeypatch):
+    monkeypatch.setattr(server, "EXPORT_BATCH_SIZE", 2)
+    cursor = server.iterate_archived_then_hot("transactions", {"property_id": "default"}, {"_id": 0}, "tanggal")
+    chunks = [chunk async for chunk in server.stream_export_rows(cursor, ["sumber"], "csv")]
+    assert chunks == ["sumber\r\nJanuari\r\n\"Februari, \"\"lunas\"\"\"\r\n", "Maret\r\n"]
+
+
+async def test_bills_export_includes_archived_on_request(api, admin, history):
+    [bill] = (await api.get("/api/bills", headers=admin)).json()
+    await api.post(f"/api/bills/{bill['id']}/mark-paid", headers=admin, params={"cara_bayar": "tunai"})
+    await server.archive_settled_records()
+
+    hot = await api.get("/api/bills/export", headers=admin, params={"format": "ndjson"})
+    assert hot.text == ""
+    archived = await api.get("/api/bills/export", headers=admin, params={"format": "ndjson", "include_archived": True})
+    [row] = [json.loads(line) for line in archived.text.splitlines()]
+    assert (row["id"], row["status"], row["tahun"], row["bulan"]) == (bill["id"], "lunas", 2023, 5)
+
+    later = await api.get("/api/bills/export", headers=admin,
+                          params={"format": "ndjson", "include_archived": True, "dari": "2023-06-01T00:00:00Z"})
+    assert later.text == ""
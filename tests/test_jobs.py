@@ -0,0 +1,169 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import AutoReconnect
+
+import server
+from jobs import JobQueue
+from repositories import InMemoryRepository
+
+pytestmark = pytest.mark.anyio
+
+TENANT = {"nama": "Rina Wati", "telepon": "+62 812-0000-0005", "ktp": "3201010101900005", "alamat": "Cimahi"}
+
+
+class JobsCollection:
+    """The part of a Motor collection JobQueue uses, over an in-memory repository."""
+
+    def __init__(self):
+        self.repo = InMemoryRepository("jobs", {})
+        self.failing = False
+
+    async def create_index(self, keys, **options):
+        await self.repo.create_index(keys, **options)
+
+    async def insert_one(self, doc):
+        await self.repo.insert_one(doc)
+
+    async def find_one(self, query, projection=None):
+        return await self.repo.find_one(query, projection)
+
+    async def find_one_and_update(self, query, update, sort=None, projection=None, return_document=None):
+        doc = await self.repo.find_one(query, sort=sort)
+        if doc is None:
+            return None
+        await self.repo.update_one({"id": doc["id"]}, update)
+        return await self.repo.find_one({"id": doc["id"]}, projection)
+
+    async def update_one(self, query, update):
+        if self.failing:
+            raise AutoReconnect("connection reset")
+        return SimpleNamespace(matched_count=await self.repo.update_one(query, update))
+
+    async def delete_many(self, query):
+        return SimpleNamespace(deleted_count=await self.repo.delete_many(query))
+
+
+def make_queue(collection: JobsCollection, **options) -> JobQueue:
+    return JobQueue(SimpleNamespace(jobs=collection), lease_seconds=0.3, **options)
+
+
+async def expire_lease(collection: JobsCollection, job_id: str):
+    past = (datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat()
+    await collection.repo.update_one({"id": job_id}, {"$set": {"lease_expires_at": past}})
+
+
+async def test_worker_that_lost_its_lease_stops_the_handler():
+    collection = JobsCollection()
+    first, second = make_queue(collection), make_queue(collection)
+    started, cancelled, release = asyncio.Event(), asyncio.Event(), asyncio.Event()
+
+    async def slow(ctx, payload):
+        started.set()
+        try:
+            await release.wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return {"by": ctx.queue.worker_id}
+
+    for queue in (first, second):
+        queue.register("slow", slow)
+    job = await first.enqueue("slow", {"property_id": "default"})
+    running = asyncio.create_task(first.execute(await first.claim()))
+    await started.wait()
+
+    # Mongo drops out long enough for the lease to lapse, and another worker takes the job
+    collection.failing = True
+    await expire_lease(collection, job["id"])
+    taken = await second.claim()
+    assert taken["worker"] == second.worker_id
+    collection.failing = False
+
+    await asyncio.wait_for(cancelled.wait(), timeout=2)
+    await asyncio.wait_for(running, timeout=2)
+    stored = await second.get(job["id"])
+    assert stored["status"] == "running"
+    assert stored["worker"] == second.worker_id
+    assert stored["attempts"] == 2
+
+
+async def test_heartbeat_survives_transient_errors():
+    collection = JobsCollection()
+    queue = make_queue(collection)
+
+    async def steady(ctx, payload):
+        collection.failing = True
+        await asyncio.sleep(0.25)  # two missed beats
+        collection.failing = False
+        await asyncio.sleep(0.35)  # longer than the lease, so only working beats keep it
+        return {"ok": True}
+
+    queue.register("steady", steady)
+    job = await queue.enqueue("steady", {})
+    execution = asyncio.create_task(queue.execute(await queue.claim()))
+    await asyncio.sleep(0.5)
+    # A worker polling now must not see an expired lease
+    assert await make_queue(collection).claim() is None
+    await execution
+    stored = await queue.get(job["id"])
+    assert stored["status"] == "success"
+    assert stored["attempts"] == 1
+
+
+async def test_purge_removes_expired_jobs_and_result_files(tmp_path):
+    collection = JobsCollection()
+    queue = make_queue(collection, results_dir=tmp_path, retention_seconds=3600)
+    queue.register("noop", lambda ctx, payload: None)
+    old, recent, queued = [await queue.enqueue("noop", {}) for _ in range(3)]
+    long_ago = (datetime.now(timezone.utc) - timedelta(hours=2)).isoformat()
+    await collection.repo.update_one({"id": old["id"]}, {"$set": {"status": "success", "finished_at": long_ago}})
+    await collection.repo.update_one(
+        {"id": recent["id"]}, {"$set": {"status": "failed", "finished_at": datetime.now(timezone.utc).isoformat()}}
+    )
+    stale, fresh = tmp_path / "kwitansi_old.zip", tmp_path / "kwitansi_new.zip"
+    stale.write_bytes(b"x")
+    fresh.write_bytes(b"x")
+    os.utime(stale, (time.time() - 7200, time.time() - 7200))
+
+    assert await queue.purge() == 1
+    assert await queue.get(old["id"]) is None
+    assert await queue.get(recent["id"]) is not None
+    assert await queue.get(queued["id"]) is not None
+    assert not stale.exists()
+    assert fresh.exists()
+
+
+async def test_kwitansi_batch_result_is_private_and_scoped(api, admin, tmp_path, monkeypatch, kwitansi_pool):
+    monkeypatch.setattr(server, "JOB_RESULTS_DIR", tmp_path)
+    room = (await api.post("/api/rooms", headers=admin, json={"nomor_kamar": "D1", "harga": 700000, "fasilitas": "-"})).json()
+    await api.post("/api/rentals", headers=admin, json={"room_id": room["id"], "harga": 700000, "tenant": TENANT})
+    [bill] = (await api.get("/api/bills", headers=admin)).json()
+    await api.post(f"/api/bills/{bill['id']}/mark-paid", headers=admin, params={"cara_bayar": "tunai"})
+
+    progress = []
+    ctx = SimpleNamespace(id="0123456789abcdef", progress=lambda done, total: asyncio.sleep(0, progress.append(done)))
+    payload = {"property_id": "default", "bulan": bill["bulan"], "tahun": bill["tahun"]}
+    result = await server.job_kwitansi_batch(ctx, payload)
+
+    assert result["count"] == 1
+    assert progress == [1]
+    assert [p.name for p in tmp_path.iterdir()] == [result["file"]]
+    assert not (server.UPLOADS_DIR / result["file"]).exists()
+    assert (await api.get(f"/uploads/{result['file']}")).status_code == 404
+
+    job = {"id": "job-1", "kind": "kwitansi_batch", "status": "success", "payload": payload, "result": result}
+    monkeypatch.setattr(server.job_queue, "get", lambda job_id: asyncio.sleep(0, job if job_id == "job-1" else None))
+    download = await api.get("/api/jobs/job-1/download", headers=admin)
+    assert download.status_code == 200
+    assert download.content[:2] == b"PK"
+
+    other = await api.post("/api/properties", headers=admin, json={"nama": "Kos Mawar"})
+    assert (await api.get("/api/jobs/job-1/download", headers={**admin, "X-Property-Id": other.json()["id"]})).status_code == 404
+
+    (tmp_path / result["file"]).unlink()
+    assert (await api.get("/api/jobs/job-1/download", headers=admin)).status_code == 404
@@ -0,0 +1,118 @@
+import io
+import os
+import re
+import tempfile
+import zipfile
+
+import pytest
+from reportlab import rl_config
+from reportlab.pdfgen import canvas
+
+import kwitansi
+import server
+from kwitansi import RecordedTemplate, render_kwitansi
+
+BILL = {"id": "0a1b2c3d-bill", "bulan": 6, "tahun": 2025, "jumlah": 1500000, "cara_bayar": "tunai",
+        "tanggal_bayar": "2025-06-02T08:00:00+00:00", "keterangan": None}
+ROOM = {"nomor_kamar": "A1"}
+TENANT = {"nama": "Sri Mulyani", "alamat": "Jl. Contoh No. 1", "telepon": "081234567890"}
+TENANTS = [
+    {"nama": "Yanti Kusuma", "telepon": "+62 812-0000-0010", "ktp": "3201010101900010", "alamat": "Ciamis"},
+    {"nama": "Ömer Faruk", "telepon": "+62 812-0000-0011", "ktp": "3201010101900011", "alamat": "Tasikmalaya"},
+    {"nama": "Belum Bayar", "telepon": "+62 812-0000-0012", "ktp": "3201010101900012", "alamat": "Banjar"},
+]
+
+
+def body(pdf: bytes) -> bytes:
+    """Everything after the %PDF-1.x header; inline drawing sets a fill alpha, which bumps it to 1.4."""
+    return pdf.split(b"\n", 1)[1]
+
+
+@pytest.mark.parametrize("keterangan", [None, "Listrik"])
+def test_recorded_static_parts_render_like_inline(monkeypatch, keterangan):
+    monkeypatch.setattr(rl_config, "invariant", 1)
+    bill = {**BILL, "keterangan": keterangan}
+    assert body(render_kwitansi(bill, ROOM, TENANT)) == body(render_kwitansi(bill, ROOM, TENANT, use_template=False))
+
+
+def test_recorded_template_falls_back_when_font_names_differ():
+    c = canvas.Canvas(io.BytesIO())
+    c.setFont("Courier", 10)  # takes /F2, the internal name the recording gave Helvetica-Bold
+    start = len(c._code)
+    RecordedTemplate(c).draw(False)
+    operators, _ = kwitansi.static_operators(False)
+    assert "\n".join(c._code[start:]) != operators
+    assert any("(KWITANSI PEMBAYARAN)" in line for line in c._code[start:])
+
+
+@pytest.fixture
+async def paid_bills(api, admin, kwitansi_pool):
+    """Three rentals this month, the first two paid; returns their bills keyed by tenant name."""
+    for i, tenant in enumerate(TENANTS):
+        room = {"nomor_kamar": f"L{i}", "harga": 800000 + i, "fasilitas": "-"}
+        room_id = (await api.post("/api/rooms", headers=admin, json=room)).json()["id"]
+        await api.post("/api/rentals", headers=admin, json={"room_id": room_id, "harga": 800000 + i, "tenant": tenant})
+    bills = {}
+    for bill in (await api.get("/api/bills", headers=admin)).json():
+        rental = await server.repos.rentals.find_one({"id": bill["rental_id"]})
+        tenant = await server.repos.tenants.find_one({"id": rental["tenant_id"]})
+        if tenant["nama"] != "Belum Bayar":
+            await api.post(f"/api/bills/{bill['id']}/mark-paid", headers=admin, params={"cara_bayar": "tunai"})
+        bills[tenant["nama"]] = bill
+    return bills
+
+
+@pytest.mark.anyio
+async def test_single_kwitansi_only_for_paid_bills(api, admin, paid_bills):
+    unpaid = await api.get(f"/api/bills/{paid_bills['Belum Bayar']['id']}/kwitansi", headers=admin)
+    assert unpaid.status_code == 400
+
+    response = await api.get(f"/api/bills/{paid_bills['Yanti Kusuma']['id']}/kwitansi", headers=admin)
+    assert response.status_code == 200
+    assert response.content.startswith(b"%PDF")
+    assert response.headers["content-disposition"].startswith('attachment; filename="kwitansi_Yanti_Kusuma_')
+
+    # Names outside ASCII are sent RFC 5987-encoded
+    response = await api.get(f"/api/bills/{paid_bills['Ömer Faruk']['id']}/kwitansi", headers=admin)
+    assert "filename*=utf-8''kwitansi_%C3%96mer_Faruk_" in response.headers["content-disposition"]
+
+
+@pytest.mark.anyio
+async def test_batch_zip_has_one_receipt_per_paid_bill(api, admin, paid_bills):
+    bill = paid_bills["Yanti Kusuma"]
+    params = {"bulan": bill["bulan"], "tahun": bill["tahun"]}
+    response = await api.get("/api/kwitansi/batch", headers=admin, params=params)
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == f'attachment; filename="kwitansi_{bill["tahun"]}_{bill["bulan"]:02d}.zip"'
+
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert set(archive.namelist()) == {
+            server.kwitansi_archive_name(paid_bills[nama], {"nama": nama}) for nama in ("Yanti Kusuma", "Ömer Faruk")
+        }
+        assert all(archive.read(name).startswith(b"%PDF") for name in archive.namelist())
+
+    empty = await api.get("/api/kwitansi/batch", headers=admin, params={"bulan": 1, "tahun": 2000})
+    assert empty.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_batch_pdf_is_one_document_rendered_outside_uploads(api, admin, paid_bills, monkeypatch):
+    rendered = []
+    mkstemp = tempfile.mkstemp
+
+    def recording_mkstemp(*args, **kwargs):
+        handle, path = mkstemp(*args, **kwargs)
+        rendered.append(path)
+        return handle, path
+    monkeypatch.setattr(server.tempfile, "mkstemp", recording_mkstemp)
+
+    bill = paid_bills["Yanti Kusuma"]
+    params = {"bulan": bill["bulan"], "tahun": bill["tahun"], "format": "pdf"}
+    response = await api.get("/api/kwitansi/batch", headers=admin, params=params)
+    assert response.headers["content-type"] == "application/pdf"
+    assert len(re.findall(rb"/Type /Page\b", response.content)) == 2
+
+    # /uploads is served publicly, so the merged receipts must never sit there, even briefly
+    [path] = rendered
+    assert os.path.dirname(path) == tempfile.gettempdir()
+    assert not os.path.exists(path)
@@ -0,0 +1,134 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+TENANT = {"nama": "Agus Salim", "telepon": "+62 812-0000-0004", "ktp": "3201010101900004", "alamat": "Bekasi"}
+TRANSACTIONS = [
+    {"tipe": "pemasukan", "jumlah": 250000, "sumber": "Laundry", "kategori": "lainnya"},
+    {"tipe": "pengeluaran", "jumlah": 400000, "sumber": "Token listrik", "kategori": "listrik"},
+    {"tipe": "pengeluaran", "jumlah": 125000.5, "sumber": "PDAM", "kategori": "air"},
+    {"tipe": "pengeluaran", "jumlah": 75000, "sumber": "Token listrik", "kategori": "listrik"},
+]
+
+
+async def record_back_dated(tahun: int, bulan: int, tipe: str, kategori: str, jumlah: float):
+    await server.record_transaction(server.Transaction(
+        property_id="default", tipe=tipe, jumlah=jumlah, sumber="Impor", kategori=kategori,
+        tanggal=datetime(tahun, bulan, 15, tzinfo=timezone.utc)
+    ))
+
+
+async def raw_totals() -> dict:
+    """(tahun, bulan, tipe, kategori) -> [total, count], summed from the transactions themselves."""
+    totals = {}
+    for doc in await server.repos.transactions.find({"property_id": "default"}):
+        tanggal = datetime.fromisoformat(doc["tanggal"]) if isinstance(doc["tanggal"], str) else doc["tanggal"]
+        tanggal = tanggal.astimezone(timezone.utc)
+        entry = totals.setdefault((tanggal.year, tanggal.month, doc["tipe"], doc["kategori"]), [0, 0])
+        entry[0] += doc["jumlah"]
+        entry[1] += 1
+    return totals
+
+
+@pytest.fixture
+async def ledger(api, admin):
+    """Transactions through the API, a paid bill, and back-dated imports in earlier months; returns now."""
+    for transaction in TRANSACTIONS:
+        assert (await api.post("/api/transactions", headers=admin, json=transaction)).status_code == 200
+
+    room = (await api.post("/api/rooms", headers=admin, json={"nomor_kamar": "C1", "harga": 900000, "fasilitas": "-"})).json()
+    await api.post("/api/rentals", headers=admin, json={"room_id": room["id"], "harga": 900000, "tenant": TENANT})
+    # The rental issues its first month's bill itself
+    [bill] = (await api.get("/api/bills", headers=admin)).json()
+    response = await api.post(f"/api/bills/{bill['id']}/mark-paid", headers=admin, params={"cara_bayar": "tunai"})
+    assert response.status_code == 200
+
+    await record_back_dated(2024, 11, "pemasukan", "sewa", 800000)
+    await record_back_dated(2024, 11, "pemasukan", "sewa", 850000)
+    await record_back_dated(2024, 12, "pengeluaran", "perbaikan", 300000)
+    return datetime.now(timezone.utc)
+
+
+async def test_monthly_rollup_matches_raw_transactions(api, ledger):
+    rollup = {
+        (row["tahun"], row["bulan"], row["tipe"], row["kategori"]): [row["total"], row["jumlah_transaksi"]]
+        for row in await server.repos.ledger_monthly.find({"property_id": "default"})
+    }
+    assert rollup == await raw_totals()
+
+
+async def test_summary_matches_raw_transactions(api, admin, ledger):
+    totals = await raw_totals()
+    body = (await api.get("/api/transactions/summary", headers=admin)).json()
+    pemasukan = sum(t for (tahun, bulan, tipe, _), (t, _) in totals.items()
+                    if (tahun, bulan, tipe) == (ledger.year, ledger.month, "pemasukan"))
+    pengeluaran = sum(t for (tahun, bulan, tipe, _), (t, _) in totals.items()
+                      if (tahun, bulan, tipe) == (ledger.year, ledger.month, "pengeluaran"))
+    assert body["pemasukan"] == pemasukan == 1150000
+    assert body["pengeluaran"] == pengeluaran == 600000.5
+    assert body["laba"] == pemasukan - pengeluaran
+
+
+async def test_financial_report_matches_raw_transactions(api, admin, ledger):
+    totals = await raw_totals()
+    params = {"dari_tahun": 2024, "dari_bulan": 11, "sampai_tahun": ledger.year, "sampai_bulan": ledger.month}
+    body = (await api.get("/api/reports/financial", headers=admin, params=params)).json()
+
+    for month in body["bulanan"]:
+        for tipe in ("pemasukan", "pengeluaran"):
+            expected = {k: t for (tahun, bulan, tp, k), (t, _) in totals.items()
+                        if (tahun, bulan, tp) == (month["tahun"], month["bulan"], tipe)}
+            assert month[tipe] == expected
+    by_year = {y["tahun"]: y for y in body["tahunan"]}
+    assert by_year[2024]["total_pemasukan"] == 1650000
+    assert by_year[2024]["total_pengeluaran"] == 300000
+    assert sum(m["laba"] for m in body["bulanan"]) == sum(y["laba"] for y in body["tahunan"])
+
+
+async def test_back_dated_transaction_refreshes_cached_closed_month(api, admin, ledger):
+    params = {"dari_tahun": 2024, "dari_bulan": 11, "sampai_tahun": 2024, "sampai_bulan": 12}
+    before = (await api.get("/api/reports/financial", headers=admin, params=params)).json()
+    assert before["bulanan"][0]["total_pemasukan"] == 1650000
+
+    await record_back_dated(2024, 11, "pemasukan", "sewa", 100000)
+    after = (await api.get("/api/reports/financial", headers=admin, params=params)).json()
+    assert after["bulanan"][0]["total_pemasukan"] == 1750000
+
+
+async def test_closed_month_cache_is_bounded(api, admin, ledger, monkeypatch):
+    monkeypatch.setattr(server, "FINANCIAL_CACHE_MAX_MONTHS", 3)
+    params = {"dari_tahun": 2023, "dari_bulan": 1, "sampai_tahun": 2024, "sampai_bulan": 12}
+    body = (await api.get("/api/reports/financial", headers=admin, params=params)).json()
+    assert len(server.financial_month_cache) == 3
+    # The most recently read months are the ones kept
+    assert [key[1:] for key in server.financial_month_cache] == [(2024, 10), (2024, 11), (2024, 12)]
+    assert body["tahunan"][1]["total_pemasukan"] == 1650000
+
+
+async def test_concurrent_mark_paid_counts_the_payment_once(api, admin, monkeypatch):
+    room = (await api.post("/api/rooms", headers=admin, json={"nomor_kamar": "C2", "harga": 900000, "fasilitas": "-"})).json()
+    await api.post("/api/rentals", headers=admin, json={"room_id": room["id"], "harga": 900000, "tenant": TENANT})
+    [bill] = (await api.get("/api/bills", headers=admin)).json()
+
+    # Both requests read the bill as unpaid before either writes, as two workers can
+    bills = server.repos.bills
+    find_one = bills.find_one
+
+    async def slow_find_one(*args, **kwargs):
+        doc = await find_one(*args, **kwargs)
+        await asyncio.sleep(0.05)
+        return doc
+    monkeypatch.setattr(bills, "find_one", slow_find_one)
+
+    url = f"/api/bills/{bill['id']}/mark-paid"
+    responses = await asyncio.gather(*(api.post(url, headers=admin, params={"cara_bayar": "tunai"}) for _ in range(2)))
+    assert sorted(r.status_code for r in responses) == [200, 400]
+
+    assert await server.repos.transactions.count({"property_id": "default"}) == 1
+    [row] = await server.repos.ledger_monthly.find({"property_id": "default"})
+    assert (row["total"], row["jumlah_transaksi"]) == (900000, 1)
@@ -0,0 +1,24 @@
+from types import SimpleNamespace
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_lifespan_runs_startup_and_shutdown_steps(api, monkeypatch):
+    closed = []
+    monkeypatch.setattr(server, "client", SimpleNamespace(close=lambda: closed.append(True)))
+    monkeypatch.setattr(server, "indexes_ready", False)
+    # As a script or an older version wrote it: no search keys and no rev
+    await server.repos.untracked("tenants").insert_one({"id": "t1", "property_id": "default", "nama": "Tanpa Kunci",
+                                                        "telepon": "0812", "ktp": "3201"})
+
+    async with server.app.router.lifespan_context(server.app):
+        assert server.indexes_ready
+        tenant = await server.repos.tenants.find_one({"id": "t1"})
+        assert tenant["nama_norm"] == "tanpa kunci"
+        assert tenant["rev"] > 0
+        assert closed == []
+    assert closed == [True]
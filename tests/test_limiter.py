@@ -0,0 +1,107 @@
+import asyncio
+
+import httpx
+import pytest
+
+import limiter
+import server
+from limiter import Limiter, MemoryBucketStore, Overloaded, RateLimited, Rate, parse_rate
+from tests.conftest import PASSWORD
+
+pytestmark = pytest.mark.anyio
+
+
+def client_from(ip: str) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app, client=(ip, 40000)), base_url="http://test")
+
+
+async def test_login_is_limited_per_address_and_email(api, admin):
+    # conftest sets RATE_LIMIT_LOGIN_USER to 3/60
+    attempt = {"email": "superadmin@siskosan.com", "password": "salah"}
+    codes = [(await api.post("/api/auth/login", json=attempt)).status_code for _ in range(3)]
+    assert codes == [401, 401, 401]
+
+    limited = await api.post("/api/auth/login", json={**attempt, "password": PASSWORD})
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 1
+
+    # Someone else's address, and another email from the same address, have their own buckets
+    async with client_from("203.0.113.9") as other:
+        assert (await other.post("/api/auth/login", json={**attempt, "password": PASSWORD})).status_code == 200
+    other_email = await api.post("/api/auth/login", json={"email": "lain@siskosan.com", "password": "salah"})
+    assert other_email.status_code == 401
+
+
+async def test_generate_monthly_is_limited_per_user(api, admin):
+    codes = [(await api.post("/api/bills/generate-monthly", headers=admin)).status_code for _ in range(4)]
+    assert codes == [200, 200, 200, 429]
+
+
+async def test_disabled_rate_limit_lets_everything_through(api, admin, monkeypatch):
+    monkeypatch.setattr(server.limiter, "rates", {})
+    attempt = {"email": "superadmin@siskosan.com", "password": "salah"}
+    codes = {(await api.post("/api/auth/login", json=attempt)).status_code for _ in range(6)}
+    assert codes == {401}
+
+
+def test_parse_rate():
+    assert parse_rate("5/60") == Rate(5, 60)
+    assert parse_rate("10") == Rate(10, 1)
+    assert parse_rate("0") is None
+    assert parse_rate("") is None
+
+
+async def test_bucket_refills_over_time(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(limiter.time, "monotonic", lambda: clock[0])
+    store = MemoryBucketStore()
+    rate = Rate(2, 10)
+
+    assert await store.take("k", rate) == 0
+    assert await store.take("k", rate) == 0
+    assert await store.take("k", rate) == pytest.approx(5)
+    clock[0] += 5
+    assert await store.take("k", rate) == 0
+    assert await store.take("k", rate) > 0
+
+
+async def test_memory_store_evicts_oldest_bucket():
+    store = MemoryBucketStore(max_buckets=2)
+    for key in ("a", "b", "c"):
+        await store.take(key, Rate(1, 60))
+    assert list(store.buckets) == ["b", "c"]
+
+
+async def test_limiter_records_decisions():
+    decisions = []
+    rate_limiter = Limiter(MemoryBucketStore(), on_decision=lambda *d: decisions.append(d))
+    rate_limiter.add_rate("login", "ip", Rate(1, 60))
+
+    await rate_limiter.hit("login", "ip", "10.0.0.1")
+    with pytest.raises(RateLimited) as limited:
+        await rate_limiter.hit("login", "ip", "10.0.0.1")
+    assert limited.value.retry_after == pytest.approx(60, rel=0.01)
+    await rate_limiter.hit("kwitansi", "ip", "10.0.0.1")  # no rule configured
+    assert decisions == [("login", "ip", "allowed"), ("login", "ip", "limited")]
+
+
+async def test_concurrency_cap_sheds_after_queue_timeout():
+    rate_limiter = Limiter(MemoryBucketStore())
+    rate_limiter.add_cap("pdf", 1, queue_timeout=0.05)
+    release = asyncio.Event()
+
+    async def hold():
+        async with rate_limiter.slot("pdf"):
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    with pytest.raises(Overloaded):
+        async with rate_limiter.slot("pdf"):
+            pass
+    release.set()
+    await holder
+
+    async with rate_limiter.slot("pdf"):
+        assert rate_limiter.caps["pdf"].in_flight == 1
+    assert rate_limiter.caps["pdf"].in_flight == 0
@@ -0,0 +1,79 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+TENANT = {"nama": "Siti Aminah", "telepon": "+62 812-0000-0001", "ktp": "3201010101900002", "alamat": "Bogor"}
+
+
+@pytest.fixture
+async def properties(api, admin):
+    """Two properties with one room each; returns {name: property id}."""
+    ids = {}
+    for nama in ("Kos Melati", "Kos Mawar"):
+        ids[nama] = (await api.post("/api/properties", headers=admin, json={"nama": nama})).json()["id"]
+        room = {"nomor_kamar": "101", "harga": 1000000, "fasilitas": nama}
+        response = await api.post("/api/rooms", headers={**admin, "X-Property-Id": ids[nama]}, json=room)
+        assert response.status_code == 200
+    return ids
+
+
+async def test_admin_only_sees_assigned_property(api, make_user, properties):
+    melati, mawar = properties["Kos Melati"], properties["Kos Mawar"]
+    headers = await make_user("admin.melati@siskosan.com", "admin", [melati])
+
+    rooms = (await api.get("/api/rooms", headers=headers)).json()
+    assert [r["fasilitas"] for r in rooms] == ["Kos Melati"]
+    assert (await api.get("/api/rooms", headers={**headers, "X-Property-Id": mawar})).status_code == 403
+    assert [p["id"] for p in (await api.get("/api/properties", headers=headers)).json()] == [melati]
+
+
+async def test_super_admin_switches_property_by_header(api, admin, properties):
+    mawar = properties["Kos Mawar"]
+    rooms = (await api.get("/api/rooms", headers={**admin, "X-Property-Id": mawar})).json()
+    assert [r["fasilitas"] for r in rooms] == ["Kos Mawar"]
+    assert (await api.get("/api/rooms", headers=admin)).json() == []
+    assert (await api.get("/api/rooms", headers={**admin, "X-Property-Id": "tidak-ada"})).status_code == 404
+
+
+async def test_unassigned_admin_is_forbidden(api, make_user):
+    headers = await make_user("baru@siskosan.com", "admin")
+    assert (await api.get("/api/rooms", headers=headers)).status_code == 403
+
+
+async def test_other_property_documents_are_not_found(api, admin, make_user, properties):
+    melati, mawar = properties["Kos Melati"], properties["Kos Mawar"]
+    headers = await make_user("admin.melati@siskosan.com", "admin", [melati])
+    mawar_headers = {**admin, "X-Property-Id": mawar}
+    room = (await api.get("/api/rooms", headers=mawar_headers)).json()[0]
+    tenant = (await api.post("/api/tenants", headers=mawar_headers, json=TENANT)).json()
+
+    assert (await api.get(f"/api/rooms/{room['id']}", headers=headers)).status_code == 404
+    assert (await api.put(f"/api/rooms/{room['id']}", headers=headers, json={"harga": 1})).status_code == 404
+    assert (await api.delete(f"/api/rooms/{room['id']}", headers=headers)).status_code == 404
+    assert (await api.get(f"/api/tenants/{tenant['id']}", headers=headers)).status_code == 404
+    assert (await api.delete(f"/api/tenants/{tenant['id']}", headers=headers)).status_code == 404
+    assert (await api.get(f"/api/rooms/{room['id']}", headers=mawar_headers)).json()["harga"] == 1000000
+
+
+async def test_same_room_number_allowed_in_each_property(api, admin, properties):
+    # The fixture already created room 101 in both properties; a second 101 in one of them is refused
+    duplicate = {"nomor_kamar": "101", "harga": 1, "fasilitas": "x"}
+    response = await api.post("/api/rooms", headers={**admin, "X-Property-Id": properties["Kos Melati"]}, json=duplicate)
+    assert response.status_code == 400
+
+
+async def test_jobs_of_other_property_are_not_found(api, make_user, properties, monkeypatch):
+    melati, mawar = properties["Kos Melati"], properties["Kos Mawar"]
+    job = {"id": "job-1", "type": "kwitansi_batch", "status": "done", "payload": {"property_id": mawar}}
+
+    async def get(job_id):
+        return job if job_id == job["id"] else None
+    monkeypatch.setattr(server.job_queue, "get", get)
+
+    melati_admin = await make_user("admin.melati@siskosan.com", "admin", [melati])
+    mawar_admin = await make_user("admin.mawar@siskosan.com", "admin", [mawar])
+    assert (await api.get("/api/jobs/job-1", headers=melati_admin)).status_code == 404
+    assert (await api.get("/api/jobs/job-1/download", headers=melati_admin)).status_code == 404
+    assert (await api.get("/api/jobs/job-1", headers=mawar_admin)).json()["id"] == "job-1"
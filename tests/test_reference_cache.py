@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+import reference_cache
+import server
+from reference_cache import ReferenceCache
+from repositories import InMemoryRepository
+
+pytestmark = pytest.mark.anyio
+
+
+class Source:
+    """A value standing in for a collection, counting how often the cache loads it."""
+
+    def __init__(self, value):
+        self.value = value
+        self.loads = 0
+
+    async def load(self):
+        self.loads += 1
+        await asyncio.sleep(0)
+        return self.value
+
+
+@pytest.fixture
+def versions():
+    return InMemoryRepository("cache_versions", {})
+
+
+async def test_invalidate_reloads_here_and_in_other_workers_after_their_poll(versions):
+    source = Source(["sewa"])
+    here, there = ReferenceCache(versions), ReferenceCache(versions)
+    assert await here.get("categories", source.load) == ["sewa"]
+    assert await there.get("categories", source.load) == ["sewa"]
+
+    source.value = ["sewa", "listrik"]
+    await here.invalidate("categories")
+    assert await here.get("categories", source.load) == ["sewa", "listrik"]
+    # Until it polls, the other worker keeps serving its copy without a query
+    assert await there.get("categories", source.load) == ["sewa"]
+    await there.sync()
+    assert await there.get("categories", source.load) == ["sewa", "listrik"]
+    assert source.loads == 4
+    assert (here.hits, here.misses) == (0, 2)
+
+
+async def test_concurrent_readers_share_one_load(versions):
+    source = Source(["A1"])
+    cache = ReferenceCache(versions)
+    results = await asyncio.gather(*(cache.get("rooms:default", source.load) for _ in range(5)))
+    assert results == [["A1"]] * 5
+    assert source.loads == 1
+    assert (cache.hits, cache.misses) == (4, 1)
+
+
+async def test_invalidate_during_a_load_leaves_the_entry_stale(versions):
+    cache = ReferenceCache(versions)
+    values = iter([["lama"], ["baru"]])
+
+    async def load():
+        value = next(values)
+        if value == ["lama"]:
+            await cache.invalidate("categories")  # a write lands while the old rows are in flight
+        return value
+
+    assert await cache.get("categories", load) == ["lama"]
+    assert await cache.get("categories", load) == ["baru"]
+
+
+async def test_entries_expire_after_max_age(versions, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(reference_cache.time, "monotonic", lambda: clock[0])
+    source = Source(["A1"])
+    cache = ReferenceCache(versions, max_age_seconds=60)
+    await cache.get("rooms:default", source.load)
+    clock[0] += 59
+    await cache.get("rooms:default", source.load)
+    clock[0] += 1
+    await cache.get("rooms:default", source.load)
+    assert source.loads == 2
+
+
+async def test_api_writes_invalidate_cached_categories_and_rooms(api, admin):
+    assert (await api.get("/api/categories", headers=admin)).json() == []
+    # Written behind the API's back, so only visible once something invalidates the entry
+    await server.repos.categories.insert_one({"id": "c0", "nama": "impor", "tipe": "pengeluaran",
+                                              "created_at": "2024-01-01T00:00:00+00:00"})
+    assert (await api.get("/api/categories", headers=admin)).json() == []
+
+    await api.post("/api/categories", headers=admin, json={"nama": "Listrik", "tipe": "pengeluaran"})
+    categories = (await api.get("/api/categories", headers=admin, params={"tipe": "pengeluaran"})).json()
+    assert sorted(c["nama"] for c in categories) == ["impor", "listrik"]
+    assert (await api.get("/api/categories", headers=admin, params={"tipe": "pemasukan"})).json() == []
+
+    room = (await api.post("/api/rooms", headers=admin, json={"nomor_kamar": "K1", "harga": 1, "fasilitas": "-"})).json()
+    assert (await api.get("/api/dashboard", headers=admin)).json()["jumlah_kamar_kosong"] == 1
+    await api.delete(f"/api/rooms/{room['id']}", headers=admin)
+    assert (await api.get("/api/dashboard", headers=admin)).json()["jumlah_kamar_kosong"] == 0
@@ -0,0 +1,137 @@
+from datetime import date, datetime, timezone
+
+import pytest
+
+import server
+from occupancy import compute_month_occupancy
+
+pytestmark = pytest.mark.anyio
+
+TENANTS = [
+    {"nama": "Lina Marlina", "telepon": "+62 812-0000-0008", "ktp": "3201010101900008", "alamat": "Sumedang"},
+    {"nama": "Rudi Hartono", "telepon": "+62 812-0000-0009", "ktp": "3201010101900009", "alamat": "Subang"},
+]
+
+
+def months_back(count: int) -> tuple:
+    now = datetime.now(timezone.utc)
+    index = now.year * 12 + now.month - 1 - count
+    return index // 12, index % 12 + 1
+
+
+def expected_bucket(tahun: int, bulan: int) -> str:
+    umur_hari = (datetime.now(timezone.utc) - datetime(tahun, bulan, 1, tzinfo=timezone.utc)).days
+    return next(bucket for bucket, limit in server.AGING_BUCKETS if limit is None or umur_hari <= limit)
+
+
+async def rent(api, admin, nomor: str, tenant: dict, tanggal_mulai: str = None) -> dict:
+    room = (await api.post("/api/rooms", headers=admin, json={"nomor_kamar": nomor, "harga": 1000000, "fasilitas": "-"})).json()
+    body = {"room_id": room["id"], "harga": 1000000, "tenant": tenant}
+    if tanggal_mulai:
+        body["tanggal_mulai"] = tanggal_mulai
+    return (await api.post("/api/rentals", headers=admin, json=body)).json()
+
+
+async def test_aging_report_buckets_unpaid_bills(api, admin):
+    lina = await rent(api, admin, "G1", TENANTS[0])
+    rudi = await rent(api, admin, "G2", TENANTS[1])
+    bills = {(lina["id"], *months_back(0)): 1000000, (rudi["id"], *months_back(0)): 1000000}
+    for rental, back, jumlah in ((lina, 1, 400000), (lina, 2, 300000), (lina, 12, 200000), (rudi, 3, 100000)):
+        tahun, bulan = months_back(back)
+        await api.post("/api/bills", headers=admin, json={
+            "rental_id": rental["id"], "bulan": bulan, "tahun": tahun, "jumlah": jumlah, "tipe": "sewa"
+        })
+        bills[(rental["id"], tahun, bulan)] = jumlah
+    # Paid bills are not owed
+    paid = (await api.get("/api/bills", headers=admin)).json()[0]
+    await api.post(f"/api/bills/{paid['id']}/mark-paid", headers=admin, params={"cara_bayar": "tunai"})
+    del bills[(paid["rental_id"], paid["tahun"], paid["bulan"])]
+
+    body = (await api.get("/api/reports/aging", headers=admin)).json()
+    assert body["buckets"] == [bucket for bucket, _ in server.AGING_BUCKETS]
+
+    expected = {}
+    for (rental_id, tahun, bulan), jumlah in bills.items():
+        nama = TENANTS[0]["nama"] if rental_id == lina["id"] else TENANTS[1]["nama"]
+        row = expected.setdefault(nama, {bucket: 0 for bucket in body["buckets"]} | {"total": 0, "jumlah_tagihan": 0})
+        row[expected_bucket(tahun, bulan)] += jumlah
+        row["total"] += jumlah
+        row["jumlah_tagihan"] += 1
+    per_penghuni = {row.pop("tenant_nama"): row for row in body["per_penghuni"]}
+    assert {nama: {k: v for k, v in row.items() if k != "tenant_id"} for nama, row in per_penghuni.items()} == expected
+    assert [row["total"] for row in body["per_penghuni"]] == sorted((r["total"] for r in expected.values()), reverse=True)
+    assert {row["room_nomor"] for row in body["per_kamar"]} == {"G1", "G2"}
+    assert body["total"]["total"] == sum(bills.values())
+    assert body["total"]["jumlah_tagihan"] == len(bills)
+
+
+async def test_aging_report_of_empty_property(api, admin):
+    body = (await api.get("/api/reports/aging", headers=admin)).json()
+    assert body["per_penghuni"] == body["per_kamar"] == []
+    assert body["total"] == {"0_30": 0, "31_60": 0, "61_90": 0, "90_plus": 0, "total": 0, "jumlah_tagihan": 0}
+
+
+def test_month_occupancy_merges_overlapping_rentals():
+    rooms = [
+        {"id": "a", "nomor_kamar": "A", "created_at": "2024-01-01T00:00:00+00:00"},
+        {"id": "b", "nomor_kamar": "B", "created_at": "2024-03-10T00:00:00+00:00"},
+    ]
+    rentals = [
+        {"room_id": "a", "tanggal_mulai": "2024-03-01T00:00:00+00:00", "tanggal_selesai": "2024-03-11T00:00:00+00:00"},
+        {"room_id": "a", "tanggal_mulai": "2024-03-05T00:00:00+00:00", "tanggal_selesai": "2024-03-20T00:00:00+00:00"},
+        {"room_id": "b", "tanggal_mulai": "2024-03-15T00:00:00+00:00", "tanggal_selesai": None},
+        {"room_id": "dihapus", "tanggal_mulai": "2024-03-01T00:00:00+00:00", "tanggal_selesai": None},
+    ]
+    month = compute_month_occupancy(rentals, rooms, 2024, 3, date(2024, 6, 1))
+
+    assert month["jumlah_hari"] == 31
+    assert {k["nomor_kamar"]: (k["hari_terisi"], k["hari_kosong"]) for k in month["per_kamar"]} == {"A": (19, 12), "B": (17, 5)}
+    assert (month["kamar_hari_terisi"], month["kamar_hari_tersedia"]) == (36, 53)
+    assert month["tingkat_hunian"] == round(36 / 53, 4)
+    assert (month["sewa_selesai"], month["total_lama_sewa_hari"]) == (2, 25)
+    assert (month["harian"][0]["terisi"], month["harian"][0]["tersedia"]) == (1, 1)
+    assert (month["harian"][14]["terisi"], month["harian"][14]["tersedia"]) == (2, 2)
+
+    # The open month counts up to and including today
+    assert compute_month_occupancy(rentals, rooms, 2024, 3, date(2024, 3, 10))["jumlah_hari"] == 10
+
+
+async def test_occupancy_report_stores_closed_months_until_a_backdated_rental(api, admin):
+    await rent(api, admin, "H1", TENANTS[0], "2024-01-15T00:00:00+00:00")
+    params = {"dari_tahun": 2024, "dari_bulan": 1, "sampai_tahun": 2024, "sampai_bulan": 3}
+    body = (await api.get("/api/reports/occupancy", headers=admin, params=params)).json()
+    assert [m["tingkat_hunian"] for m in body["bulanan"]] == [1.0, 1.0, 1.0]
+    assert "harian" not in body["bulanan"][0]
+    assert await server.repos.occupancy_monthly.count({"property_id": "default"}) == 3
+
+    # Stored months are served as they are; only those from the rental's start are recomputed
+    await server.repos.occupancy_monthly.update_one({"bulan": 1}, {"$set": {"tingkat_hunian": 0.5}})
+    await rent(api, admin, "H2", TENANTS[1], "2024-02-16T00:00:00+00:00")
+    assert await server.repos.occupancy_monthly.count({"property_id": "default"}) == 1
+
+    body = (await api.get("/api/reports/occupancy", headers=admin, params={**params, "harian": True})).json()
+    assert [m["tingkat_hunian"] for m in body["bulanan"]] == [0.5, 1.0, 1.0]
+    assert len(body["bulanan"][1]["harian"]) == 29
+    assert {k["nomor_kamar"]: k["hari_kosong"] for k in body["per_kamar"]} == {"H1": 0, "H2": 0}
+
+
+async def test_occupancy_report_rejects_future_and_oversized_ranges(api, admin):
+    future = {"dari_tahun": 2999, "sampai_tahun": 2999}
+    assert (await api.get("/api/reports/occupancy", headers=admin, params=future)).status_code == 400
+    too_long = {"dari_tahun": 2000, "sampai_tahun": 2024}
+    assert (await api.get("/api/reports/occupancy", headers=admin, params=too_long)).status_code == 400
+
+
+async def test_monthly_sweep_snapshots_previous_month_of_every_property(api, admin):
+    await rent(api, admin, "J1", TENANTS[0], "2020-01-01T00:00:00+00:00")
+    other = (await api.post("/api/properties", headers=admin, json={"nama": "Kos Mawar"})).json()["id"]
+
+    result = await server.snapshot_previous_month_occupancy()
+    assert (result["tahun"], result["bulan"]) == months_back(1)
+    assert result["tingkat_hunian"] == {"default": 1.0, other: 0}
+    stored = await server.repos.occupancy_monthly.find({"tahun": result["tahun"], "bulan": result["bulan"]})
+    assert {doc["property_id"] for doc in stored} == {"default", other}
+
+    # Running it again replaces the snapshot instead of adding another
+    await server.snapshot_previous_month_occupancy()
+    assert await server.repos.occupancy_monthly.count({}) == 2
@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from repositories import InMemoryRepository
+from scheduler import Scheduler, parse_schedule
+
+pytestmark = pytest.mark.anyio
+
+
+class Leases:
+    """scheduler_leases: one document per job, keyed by _id, which an upsert cannot take twice."""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def create_index(self, keys, **options):
+        pass
+
+    async def update_one(self, query, update, upsert=False):
+        lease = self.docs.get(query["_id"])
+        if lease and lease["owner"] != update["$set"]["owner"] and lease["expires_at"] > datetime.now(timezone.utc):
+            raise DuplicateKeyError("E11000 duplicate key error collection: scheduler_leases index: _id_")
+        self.docs[query["_id"]] = dict(update["$set"])
+
+    async def delete_one(self, query):
+        if self.docs.get(query["_id"], {}).get("owner") == query["owner"]:
+            del self.docs[query["_id"]]
+
+
+class Cursor:
+    def __init__(self, repo, query, projection):
+        self.repo, self.query, self.projection, self.order = repo, query, projection, None
+
+    def sort(self, field, direction):
+        self.order = [(field, direction)]
+        return self
+
+    async def to_list(self, length):
+        return await self.repo.find(self.query, self.projection, sort=self.order)
+
+
+class Runs:
+    """The part of the scheduler_runs collection the scheduler uses, over an in-memory repository."""
+
+    def __init__(self):
+        self.repo = InMemoryRepository("scheduler_runs", {})
+
+    async def create_index(self, keys, **options):
+        await self.repo.create_index(keys, **options)
+
+    async def insert_one(self, doc):
+        await self.repo.insert_one(doc)
+
+    async def update_one(self, query, update):
+        await self.repo.update_one(query, update)
+
+    def find(self, query, projection=None):
+        return Cursor(self.repo, query, projection)
+
+
+@pytest.fixture
+async def db():
+    db = SimpleNamespace(scheduler_leases=Leases(), scheduler_runs=Runs())
+    # What start() sets up, without its tick loop; the tests tick by hand
+    await db.scheduler_runs.create_index([("job", 1), ("run_key", 1)], unique=True)
+    return db
+
+
+def flaky(failures: int):
+    calls = []
+
+    async def func():
+        calls.append(len(calls) + 1)
+        if len(calls) <= failures:
+            raise RuntimeError(f"gagal ke-{len(calls)}")
+        return {"calls": len(calls)}
+    return func, calls
+
+
+async def runs(db) -> list:
+    return await db.scheduler_runs.repo.find({}, sort=[("started_at", 1)])
+
+
+async def test_failed_slot_is_retried_after_backoff(db):
+    scheduler = Scheduler(db, retry_backoff_seconds=60)
+    func, calls = flaky(1)
+    scheduler.add_job("tagihan", "daily@00:00", func)
+    job = scheduler.jobs["tagihan"]
+    slot = job.last_slot(datetime.now(timezone.utc)).isoformat()
+
+    first = await scheduler.run_if_due(job)
+    assert (first["status"], first["error"]) == ("failed", "gagal ke-1")
+    assert await scheduler.run_if_due(job) is None  # backing off
+
+    scheduler.retry_backoff_seconds = 0
+    second = await scheduler.run_if_due(job)
+    assert (second["run_key"], second["status"], second["result"]) == (f"{slot}:attempt2", "success", {"calls": 2})
+    assert await scheduler.run_if_due(job) is None
+    assert calls == [1, 2]
+    assert [r["run_key"] for r in await runs(db)] == [slot, f"{slot}:attempt2"]
+    assert db.scheduler_leases.docs == {}
+
+
+async def test_slot_is_given_up_after_max_attempts(db):
+    scheduler = Scheduler(db, max_attempts=2, retry_backoff_seconds=0)
+    func, calls = flaky(10)
+    scheduler.add_job("tagihan", "daily@00:00", func)
+    job = scheduler.jobs["tagihan"]
+
+    for _ in range(4):
+        await scheduler.run_if_due(job)
+    assert calls == [1, 2]
+    assert [r["status"] for r in await runs(db)] == ["failed", "failed"]
+    assert job.handled_slot == job.last_slot(datetime.now(timezone.utc))
+
+
+async def test_crashed_attempt_counts_as_failed_once_its_lease_is_over(db):
+    scheduler = Scheduler(db, lease_seconds=600, retry_backoff_seconds=0)
+    func, calls = flaky(0)
+    scheduler.add_job("tagihan", "daily@00:00", func)
+    job = scheduler.jobs["tagihan"]
+    slot = job.last_slot(datetime.now(timezone.utc)).isoformat()
+    started = datetime.now(timezone.utc) - timedelta(seconds=60)
+    await db.scheduler_runs.insert_one({"job": "tagihan", "run_key": slot, "status": "running",
+                                        "started_at": started.isoformat()})
+
+    assert await scheduler.run_if_due(job) is None  # another worker may still be on it
+    scheduler.lease_seconds = 30
+    assert (await scheduler.run_if_due(job))["run_key"] == f"{slot}:attempt2"
+    assert calls == [1]
+
+
+async def test_job_leased_by_another_worker_is_skipped(db):
+    first, second = Scheduler(db), Scheduler(db)
+    func, calls = flaky(0)
+    for scheduler in (first, second):
+        scheduler.add_job("tagihan", "daily@00:00", func)
+    await first.acquire_lease(first.jobs["tagihan"])
+
+    assert await second.run_if_due(second.jobs["tagihan"]) is None
+    assert calls == []
+    await first.release_lease(first.jobs["tagihan"])
+    assert (await second.run_if_due(second.jobs["tagihan"]))["status"] == "success"
+
+
+def test_parse_schedule():
+    daily = parse_schedule("daily@02:30")
+    assert daily(datetime(2024, 3, 10, 3, 0, tzinfo=timezone.utc)) == datetime(2024, 3, 10, 2, 30, tzinfo=timezone.utc)
+    assert daily(datetime(2024, 3, 10, 1, 0, tzinfo=timezone.utc)) == datetime(2024, 3, 9, 2, 30, tzinfo=timezone.utc)
+
+    # Day 31 falls on the last day of shorter months
+    monthly = parse_schedule("monthly@31 00:05")
+    assert monthly(datetime(2024, 3, 1, tzinfo=timezone.utc)) == datetime(2024, 2, 29, 0, 5, tzinfo=timezone.utc)
+    assert monthly(datetime(2024, 1, 1, tzinfo=timezone.utc)) == datetime(2023, 12, 31, 0, 5, tzinfo=timezone.utc)
+    with pytest.raises(ValueError):
+        parse_schedule("weekly@1")
@@ -0,0 +1,53 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+TENANTS = [
+    {"nama": "Siti Rahmawati", "telepon": "+62 812-1111-2222", "ktp": "3273010101900001", "alamat": "Bandung"},
+    {"nama": "Sitompul Hasan", "telepon": "0813 3333 4444", "ktp": "3273010101900002", "alamat": "Medan"},
+    {"nama": "Ahmad Siti Nur", "telepon": "0857-5555-6666", "ktp": "3174020202900003", "alamat": "Jakarta"},
+]
+
+
+@pytest.fixture
+async def tenants(api, admin):
+    for tenant in TENANTS:
+        assert (await api.post("/api/tenants", headers=admin, json=tenant)).status_code == 200
+
+
+async def search(api, headers, q: str, **params) -> list:
+    response = await api.get("/api/tenants/search", headers=headers, params={"q": q, **params})
+    assert response.status_code == 200
+    return [t["nama"] for t in response.json()]
+
+
+async def test_name_prefix_then_whole_word_matches(api, admin, tenants):
+    assert await search(api, admin, "sit") == ["Siti Rahmawati", "Sitompul Hasan"]
+    # A prefix match ranks first; the text index adds names with the word elsewhere
+    assert await search(api, admin, "Siti") == ["Siti Rahmawati", "Ahmad Siti Nur"]
+    assert await search(api, admin, "  SITOMPUL   has ") == ["Sitompul Hasan"]
+    assert await search(api, admin, "sit", limit=1) == ["Siti Rahmawati"]
+
+
+async def test_phone_prefix_ignores_formatting(api, admin, tenants):
+    assert await search(api, admin, "0812 1111") == ["Siti Rahmawati"]
+    assert await search(api, admin, "+62813-3333") == ["Sitompul Hasan"]
+    assert await search(api, admin, "62857") == ["Ahmad Siti Nur"]
+
+
+async def test_ktp_prefix(api, admin, tenants):
+    assert sorted(await search(api, admin, "3273")) == ["Siti Rahmawati", "Sitompul Hasan"]
+    assert await search(api, admin, "3174 0202") == ["Ahmad Siti Nur"]
+
+
+async def test_search_keys_follow_updates_and_stay_in_property(api, admin, tenants):
+    [tenant] = await server.repos.tenants.find({"nama": "Sitompul Hasan"})
+    await api.put(f"/api/tenants/{tenant['id']}", headers=admin, json={"nama": "Bambang Hasan", "telepon": "0819 0000"})
+    assert await search(api, admin, "bamb") == ["Bambang Hasan"]
+    assert await search(api, admin, "0819") == ["Bambang Hasan"]
+    assert await search(api, admin, "0813") == []
+
+    other = (await api.post("/api/properties", headers=admin, json={"nama": "Kos Mawar"})).json()["id"]
+    assert await search(api, {**admin, "X-Property-Id": other}, "sit") == []
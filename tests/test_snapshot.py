@@ -0,0 +1,80 @@
+import asyncio
+import io
+import tarfile
+
+import bson
+import pytest
+
+import snapshot
+from snapshot import add_bytes, index_specs, restore_collection, restore_upload
+
+pytestmark = pytest.mark.anyio
+
+
+class Collection:
+    """Records insert_many batches and how many were in flight at once."""
+
+    def __init__(self):
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def insert_many(self, docs, ordered=True):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.batches.append(docs)
+        self.in_flight -= 1
+
+
+def test_index_specs_round_trip_index_information():
+    information = {
+        "_id_": {"v": 2, "key": [("_id", 1)]},
+        "id_1": {"v": 2, "key": [("id", 1)], "unique": True},
+        "expires_at_1": {"v": 2, "key": [("expires_at", 1)], "expireAfterSeconds": 0},
+        "nama_text_alamat_text": {
+            "v": 2, "key": [("_fts", "text"), ("_ftsx", 1)], "weights": {"nama": 1, "alamat": 1},
+            "default_language": "english", "language_override": "language", "textIndexVersion": 3
+        },
+    }
+    assert index_specs(information) == [
+        {"name": "id_1", "keys": [("id", 1)], "options": {"unique": True}},
+        {"name": "expires_at_1", "keys": [("expires_at", 1)], "options": {"expireAfterSeconds": 0}},
+        {"name": "nama_text_alamat_text", "keys": [("nama", "text"), ("alamat", "text")], "options": {
+            "weights": {"nama": 1, "alamat": 1}, "default_language": "english", "language_override": "language"
+        }},
+    ]
+
+
+async def test_restore_collection_inserts_the_stream_in_parallel_batches():
+    docs = [{"id": str(i), "n": i} for i in range(25)]
+    stream = io.BytesIO(b"".join(bson.encode(doc) for doc in docs))
+    collection = Collection()
+
+    assert await restore_collection(collection, stream, batch_size=10, parallel=2) == 25
+    assert sorted(len(batch) for batch in collection.batches) == [5, 10, 10]
+    assert sorted(doc["n"] for batch in collection.batches for doc in batch) == list(range(25))
+    assert collection.max_in_flight == 2
+
+
+def archive_with(*names: str) -> tarfile.TarFile:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        for name in names:
+            add_bytes(archive, name, b"bukti")
+    buffer.seek(0)
+    return tarfile.open(fileobj=buffer, mode="r")
+
+
+def test_restore_upload_stays_inside_the_uploads_directory(tmp_path, monkeypatch):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    monkeypatch.setattr(snapshot, "UPLOADS_DIR", uploads)
+    archive = archive_with("uploads/bukti/transfer.jpg", "uploads/../../jahat.txt")
+    safe, escaping = archive.getmembers()
+
+    restore_upload(archive, safe)
+    assert (uploads / "bukti" / "transfer.jpg").read_bytes() == b"bukti"
+    with pytest.raises(ValueError):
+        restore_upload(archive, escaping)
+    assert not (tmp_path.parent / "jahat.txt").exists()
@@ -0,0 +1,90 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+TENANT = {"nama": "Dewi Lestari", "telepon": "+62 812-0000-0003", "ktp": "3201010101900003", "alamat": "Depok"}
+
+
+def room(nomor: str) -> dict:
+    return {"nomor_kamar": nomor, "harga": 1200000, "fasilitas": "Kipas"}
+
+
+async def test_first_sync_returns_everything_and_resets(api, admin):
+    created = (await api.post("/api/rooms", headers=admin, json=room("A1"))).json()
+
+    body = (await api.get("/api/sync", headers=admin)).json()
+    assert body["reset"] is True
+    assert body["has_more"] is False
+    assert [r["id"] for r in body["changes"]["rooms"]] == [created["id"]]
+    assert [p["id"] for p in body["changes"]["properties"]] == ["default"]
+    assert body["deleted"] == {}
+
+
+async def test_delta_has_only_documents_written_since(api, admin):
+    kept = (await api.post("/api/rooms", headers=admin, json=room("A1"))).json()
+    changed = (await api.post("/api/rooms", headers=admin, json=room("A2"))).json()
+    rev = (await api.get("/api/sync", headers=admin)).json()["rev"]
+
+    await api.put(f"/api/rooms/{changed['id']}", headers=admin, json={"harga": 1300000})
+    body = (await api.get("/api/sync", headers=admin, params={"since": rev})).json()
+
+    assert body["reset"] is False
+    assert body["rev"] > rev
+    assert [(r["id"], r["harga"]) for r in body["changes"]["rooms"]] == [(changed["id"], 1300000)]
+    assert kept["id"] not in {r["id"] for r in body["changes"]["rooms"]}
+    assert body["changes"]["tenants"] == []
+
+    again = (await api.get("/api/sync", headers=admin, params={"since": body["rev"]})).json()
+    assert again["changes"]["rooms"] == []
+
+
+async def test_deletes_come_back_as_tombstones(api, admin):
+    doomed = (await api.post("/api/rooms", headers=admin, json=room("A1"))).json()
+    tenant = (await api.post("/api/tenants", headers=admin, json=TENANT)).json()
+    rev = (await api.get("/api/sync", headers=admin)).json()["rev"]
+
+    await api.delete(f"/api/rooms/{doomed['id']}", headers=admin)
+    await api.delete(f"/api/tenants/{tenant['id']}", headers=admin)
+    body = (await api.get("/api/sync", headers=admin, params={"since": rev})).json()
+
+    assert body["deleted"] == {"rooms": [doomed["id"]], "tenants": [tenant["id"]]}
+    assert body["changes"]["rooms"] == []
+
+
+async def test_other_property_changes_and_tombstones_are_left_out(api, admin, make_user):
+    mawar = (await api.post("/api/properties", headers=admin, json={"nama": "Kos Mawar"})).json()["id"]
+    mawar_headers = {**admin, "X-Property-Id": mawar}
+    headers = await make_user("admin.utama@siskosan.com", "admin", ["default"])
+    other = (await api.post("/api/rooms", headers=mawar_headers, json=room("B1"))).json()
+    rev = (await api.get("/api/sync", headers=headers)).json()["rev"]
+
+    await api.put(f"/api/rooms/{other['id']}", headers=mawar_headers, json={"harga": 1})
+    await api.delete(f"/api/rooms/{other['id']}", headers=mawar_headers)
+    body = (await api.get("/api/sync", headers=headers, params={"since": rev})).json()
+
+    assert body["changes"]["rooms"] == []
+    assert body["deleted"] == {}
+    assert "users" not in body["changes"]
+
+
+async def test_pages_cover_every_change(api, admin, monkeypatch):
+    monkeypatch.setattr(server, "SYNC_PAGE_SIZE", 2)
+    created = {(await api.post("/api/rooms", headers=admin, json=room(f"A{i}"))).json()["id"] for i in range(5)}
+
+    seen, since = set(), 0
+    for _ in range(10):
+        body = (await api.get("/api/sync", headers=admin, params={"since": since})).json()
+        seen |= {r["id"] for r in body["changes"]["rooms"]}
+        since = body["rev"]
+        if not body["has_more"]:
+            break
+    assert seen == created
+
+
+async def test_cursor_older_than_tombstones_forces_reset(api, admin):
+    (await api.post("/api/rooms", headers=admin, json=room("A1"))).json()
+    body = (await api.get("/api/sync", headers=admin, params={"since": 1})).json()
+    assert body["reset"] is True
+    assert len(body["changes"]["rooms"]) == 1